@@ -5,4 +5,7 @@ from .utils import typing
 from .ml import keras
 from .datasets.sqlalchemy import RedshiftDataSet
 from .datasets.sqlalchemy import RedshiftFullDataSet
-from .datasets.vaex import VaexDataSet
\ No newline at end of file
+from .datasets.sqlalchemy import RedshiftSQLDataSet
+from .datasets.vaex import VaexDataSet
+from .datasets.vaex import SharedVaexDataSet
+from .datasets.sparse import SparseMatrixDataSet
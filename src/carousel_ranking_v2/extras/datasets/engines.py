@@ -0,0 +1,210 @@
+import os
+import json
+import time
+import hashlib
+import logging
+import threading
+import sqlalchemy as db
+from sqlalchemy.pool import QueuePool
+from contextlib import contextmanager
+
+from .queries import QueryInstrumentation
+from typing import Any, Dict, Iterator, Tuple
+
+log = logging.getLogger(__name__)
+
+# host, user, search_path and a digest of the dialect and engine arguments
+EngineKey = Tuple[str, str, str, str]
+
+# ------------------------- #
+
+_default_engine_args = dict(
+
+    pool_recycle=3600,
+    pool_size=5,
+    max_overflow=5,
+    pool_pre_ping=True,
+    encoding='utf8',
+    echo=False # statements, timings and plans go to the structured query log
+
+)
+
+# ------------------------- #
+
+def sqlite_path(host: str, schema: str) -> str:
+
+    # local stand-in for redshift, `host` is a directory
+    # holding one database file per schema
+
+    return os.path.join(host, f'{schema}.db')
+
+# ------------------------- #
+
+class PoolStats:
+
+    def __init__(self) -> None:
+
+        # time spent in engine.connect(): pool wait, new connections, pre-ping
+
+        self.checkouts = 0
+        self.connect_time = 0.
+        self.peak_checked_out = 0
+        self.peak_overflow = 0
+
+# ------------------------- #
+
+class EngineRegistry:
+
+    """Process-wide registry sharing one engine (and its connection pool)
+    per host, user, search_path and engine configuration"""
+
+    def __init__(self) -> None:
+
+        self._engines: Dict[EngineKey, db.engine.Engine] = dict()
+        self._stats: Dict[EngineKey, PoolStats] = dict()
+        self._lock = threading.Lock()
+
+    # ......................... #
+
+    def get_engine(
+
+            self,
+            host: str,
+            user: str,
+            password: str,
+            schema: str,
+            engine_args: Dict[str, Any] = None,
+            dialect: str = 'redshift',
+            query_log: Dict[str, Any] = None
+
+        ) -> EngineKey:
+
+        # entries with different pool settings get their own engine
+
+        kwargs = {**_default_engine_args, **(engine_args or dict())}
+        config = json.dumps(dict(dialect=dialect, **kwargs), sort_keys=True, default=str)
+        key = (host, user, schema, hashlib.sha1(config.encode()).hexdigest()[:12])
+
+        with self._lock:
+
+            if key not in self._engines:
+
+                if dialect == 'sqlite':
+
+                    # sqlite has no search_path, every schema is its own file;
+                    # QueuePool keeps pool_size / max_overflow meaningful
+
+                    self._engines[key] = db.create_engine(
+                        f'sqlite:///{sqlite_path(host, schema)}',
+                        connect_args={'check_same_thread': False},
+                        poolclass=QueuePool,
+                        **kwargs
+                    )
+
+                elif dialect == 'redshift':
+
+                    self._engines[key] = db.create_engine(
+                        f'redshift://{user}:{password}@{host}',
+                        connect_args={'options': f'-csearch_path={schema}'},
+                        **kwargs
+                    )
+
+                else:
+                    raise ValueError(f'unknown {dialect=}, expected "redshift" or "sqlite"')
+
+                QueryInstrumentation(
+                    label=f'{host}/{schema}', 
+                    **(query_log or dict())
+                ).attach(self._engines[key])
+
+                self._stats[key] = PoolStats()
+
+                log.info(f'created shared engine for {host}/{schema} ({user})')
+
+        return key
+
+    # ......................... #
+
+    def engine(self, key: EngineKey) -> db.engine.Engine:
+        return self._engines[key]
+
+    # ......................... #
+
+    def checkout(self, key: EngineKey) -> db.engine.base.Connection:
+
+        engine = self._engines[key]
+
+        start = time.perf_counter()
+        conn = engine.connect()
+        elapsed = time.perf_counter() - start
+
+        with self._lock:
+
+            stats = self._stats[key]
+            stats.checkouts += 1
+            stats.connect_time += elapsed
+            stats.peak_checked_out = max(stats.peak_checked_out, engine.pool.checkedout())
+            stats.peak_overflow = max(stats.peak_overflow, engine.pool.overflow())
+
+        return conn
+
+    # ......................... #
+
+    @contextmanager
+    def connect(self, key: EngineKey) -> Iterator[db.engine.base.Connection]:
+
+        conn = self.checkout(key)
+
+        try:
+            yield conn
+
+        finally:
+            conn.close()
+
+    # ......................... #
+
+    def stats(self) -> Dict[str, Dict[str, Any]]:
+
+        report = dict()
+
+        for key, engine in self._engines.items():
+
+            host, user, schema, config = key
+            stats = self._stats[key]
+
+            report[f'{host}/{schema} ({user}, {config})'] = dict(
+                checked_out=engine.pool.checkedout(),
+                overflow=engine.pool.overflow(),
+                peak_checked_out=stats.peak_checked_out,
+                peak_overflow=stats.peak_overflow,
+                checkouts=stats.checkouts,
+                connect_time=round(stats.connect_time, 4)
+            )
+
+        return report
+
+    # ......................... #
+
+    def reset_stats(self) -> None:
+
+        with self._lock:
+            for key in self._stats:
+                self._stats[key] = PoolStats()
+
+    # ......................... #
+
+    def dispose(self) -> None:
+
+        with self._lock:
+
+            for engine in self._engines.values():
+                engine.dispose()
+
+            self._engines.clear()
+            self._stats.clear()
+
+# ------------------------- #
+
+registry = EngineRegistry()
+
+# ------------------------- #
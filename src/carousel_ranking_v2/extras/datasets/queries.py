@@ -0,0 +1,262 @@
+import time
+import hashlib
+import logging
+import threading
+import sqlalchemy as db
+from typing import Any, Dict, List, Optional
+
+# structured records (json fields via `extra`), see conf/base/logging.yml
+
+log = logging.getLogger(__name__)
+
+_SAMPLE = 100 # rows per fetched batch used to estimate transferred bytes
+
+# ------------------------- #
+
+def _value_size(value: Any) -> int:
+
+    if value is None:
+        return 0
+
+    if isinstance(value, (str, bytes, bytearray)):
+        return len(value)
+
+    return 8
+
+# ------------------------- #
+
+def _batch_bytes(rows: List[Any]) -> int:
+
+    # exact for small batches, extrapolated from a sample otherwise
+
+    sample = rows[:_SAMPLE]
+
+    if not sample:
+        return 0
+
+    size = sum(_value_size(v) for row in sample for v in row)
+
+    return size * len(rows) // len(sample)
+
+# ------------------------- #
+
+class CursorProbe:
+
+    """DBAPI cursor proxy timing the first row and the full fetch,
+    a record is emitted once the cursor is closed"""
+
+    def __init__(
+
+            self,
+            cursor: Any,
+            record: Dict[str, Any],
+            started: float
+
+        ) -> None:
+
+        self._cursor = cursor
+        self._record = record
+        self._started = started
+        self._first = None
+        self._rows = 0
+        self._bytes = 0
+        self._closed = False
+
+    # ......................... #
+
+    def __getattr__(self, name: str) -> Any:
+        return getattr(self._cursor, name)
+
+    # ......................... #
+
+    def __iter__(self) -> Any:
+        return iter(self.fetchone, None)
+
+    # ......................... #
+
+    def _count(self, rows: List[Any]) -> List[Any]:
+
+        if rows:
+
+            if self._first is None:
+                self._first = time.perf_counter()
+
+            self._rows += len(rows)
+            self._bytes += _batch_bytes(rows)
+
+        return rows
+
+    # ......................... #
+
+    def fetchone(self) -> Any:
+
+        row = self._cursor.fetchone()
+
+        if row is not None:
+            self._count([row])
+
+        return row
+
+    # ......................... #
+
+    def fetchmany(self, *args: Any, **kwargs: Any) -> List[Any]:
+        return self._count(self._cursor.fetchmany(*args, **kwargs))
+
+    # ......................... #
+
+    def fetchall(self) -> List[Any]:
+        return self._count(self._cursor.fetchall())
+
+    # ......................... #
+
+    def close(self) -> None:
+
+        if not self._closed:
+
+            self._closed = True
+            end = time.perf_counter()
+
+            record = dict(
+                self._record,
+                time_to_first_row=None if self._first is None else round(self._first - self._started, 4),
+                fetch_time=round(end - self._started, 4),
+                rows=self._rows,
+                bytes=self._bytes
+            )
+
+            log.info(
+                f'query {record["query_id"]}: {record["rows"]} rows, '
+                f'{record["bytes"] / 2 ** 20:.1f} MB in {record["fetch_time"]:.2f}s '
+                f'(first row after {record["time_to_first_row"]}s)',
+                extra=record
+            )
+
+        self._cursor.close()
+
+# ------------------------- #
+
+class QueryInstrumentation:
+
+    """Engine event listeners recording per-query timings and
+    optionally the EXPLAIN plan of every distinct SELECT"""
+
+    def __init__(
+
+            self,
+            label: str,
+            explain: bool = False,
+            max_statement: int = 2000
+
+        ) -> None:
+
+        self.label = label
+        self.explain = explain
+        self.max_statement = max_statement
+        self._plans: Dict[str, List[str]] = dict()
+        self._lock = threading.Lock()
+
+    # ......................... #
+
+    def attach(self, engine: db.engine.Engine) -> None:
+
+        db.event.listen(engine, 'before_cursor_execute', self._before)
+        db.event.listen(engine, 'after_cursor_execute', self._after)
+
+    # ......................... #
+
+    def _plan(
+
+            self,
+            conn: db.engine.base.Connection,
+            statement: str,
+            parameters: Any,
+            query_id: str
+
+        ) -> Optional[List[str]]:
+
+        with self._lock:
+            if query_id in self._plans:
+                return self._plans[query_id]
+
+        prefix = 'EXPLAIN QUERY PLAN ' if conn.dialect.name == 'sqlite' else 'EXPLAIN '
+        cursor = conn.connection.cursor()
+
+        try:
+            cursor.execute(prefix + statement, parameters)
+            plan = [ ' '.join(str(x) for x in row) for row in cursor.fetchall() ]
+
+        except Exception as exc:
+            log.warning(f'query {query_id}: EXPLAIN failed ({exc})')
+            plan = None
+
+        finally:
+            cursor.close()
+
+        with self._lock:
+            self._plans[query_id] = plan
+
+        return plan
+
+    # ......................... #
+
+    def _before(
+
+            self,
+            conn: db.engine.base.Connection,
+            cursor: Any,
+            statement: str,
+            parameters: Any,
+            context: Any,
+            executemany: bool
+
+        ) -> None:
+
+        query_id = hashlib.sha1(statement.encode()).hexdigest()[:12]
+        select = not executemany and statement.lstrip().upper().startswith('SELECT')
+
+        context._query_record = dict(
+            engine=self.label,
+            query_id=query_id,
+            statement=statement[:self.max_statement],
+            parameters=str(parameters)[:self.max_statement]
+        )
+
+        if self.explain and select:
+            context._query_record['plan'] = self._plan(conn, statement, parameters, query_id)
+
+        context._query_select = select
+        context._query_started = time.perf_counter()
+
+    # ......................... #
+
+    def _after(
+
+            self,
+            conn: db.engine.base.Connection,
+            cursor: Any,
+            statement: str,
+            parameters: Any,
+            context: Any,
+            executemany: bool
+
+        ) -> None:
+
+        started = getattr(context, '_query_started', None)
+
+        if started is None:
+            return
+
+        record = dict(
+            context._query_record,
+            execute_time=round(time.perf_counter() - started, 4)
+        )
+
+        if not context._query_select:
+            log.info(f'query {record["query_id"]}: executed in {record["execute_time"]:.2f}s', extra=record)
+            return
+
+        # rows are fetched after this event, the result reads from the probe
+
+        context.cursor = CursorProbe(cursor, record, started)
+
+# ------------------------- #
@@ -0,0 +1,129 @@
+import os
+import time
+import pickle
+import hashlib
+import logging
+import sqlalchemy as db
+from typing import Any, Dict, List, Optional
+
+log = logging.getLogger(__name__)
+
+# ------------------------- #
+
+def is_column_mismatch(exc: Exception) -> bool:
+
+    # KeyError comes from selecting a configured column missing from a
+    # cached table, ProgrammingError from the database itself
+
+    if isinstance(exc, (KeyError, db.exc.NoSuchColumnError)):
+        return True
+
+    return isinstance(exc, db.exc.ProgrammingError) and 'column' in str(exc).lower()
+
+# ------------------------- #
+
+class SchemaCache:
+
+    """Local cache of reflected column definitions keyed by host/schema/table,
+    entries expire after ``ttl`` seconds"""
+
+    def __init__(
+
+            self,
+            path: str = 'data/.schema_cache',
+            ttl: int = 86400
+
+        ) -> None:
+
+        self.path = path
+        self.ttl = ttl
+
+    # ......................... #
+
+    def _filepath(self, key: str) -> str:
+        return os.path.join(self.path, hashlib.sha1(key.encode()).hexdigest() + '.pkl')
+
+    # ......................... #
+
+    def get(self, key: str) -> Optional[List[Dict[str, Any]]]:
+
+        filepath = self._filepath(key)
+
+        if not os.path.exists(filepath):
+            return None
+
+        if time.time() - os.path.getmtime(filepath) > self.ttl:
+            log.info(f'schema cache expired for {key}')
+            return None
+
+        try:
+            with open(filepath, 'rb') as f:
+                return pickle.load(f)
+
+        except Exception as exc:
+            log.warning(f'unreadable schema cache for {key}: {exc}')
+            return None
+
+    # ......................... #
+
+    def put(self, key: str, table: db.Table) -> None:
+
+        columns = [ dict(
+                        name=c.name,
+                        type=c.type,
+                        nullable=c.nullable,
+                        primary_key=c.primary_key
+                    ) for c in table.columns ]
+
+        os.makedirs(self.path, exist_ok=True)
+        tmp = self._filepath(key) + '.tmp'
+
+        with open(tmp, 'wb') as f:
+            pickle.dump(columns, f)
+
+        os.replace(tmp, self._filepath(key))
+
+    # ......................... #
+
+    def invalidate(self, key: str) -> None:
+
+        filepath = self._filepath(key)
+
+        if os.path.exists(filepath):
+            os.remove(filepath)
+            log.info(f'schema cache invalidated for {key}')
+
+    # ......................... #
+
+    def table(
+
+            self,
+            key: str,
+            name: str,
+            metadata: db.MetaData,
+            engine: db.engine.Engine
+
+        ) -> db.Table:
+
+        columns = self.get(key)
+
+        if columns is None:
+
+            tb = db.Table(name, metadata, autoload=True, autoload_with=engine)
+            self.put(key, tb)
+
+            return tb
+
+        return db.Table(
+            name,
+            metadata,
+            *[ db.Column(
+                   c['name'],
+                   c['type'],
+                   nullable=c['nullable'],
+                   primary_key=c['primary_key']
+               ) for c in columns ],
+            extend_existing=True
+        )
+
+# ------------------------- #
@@ -0,0 +1,112 @@
+import os
+import numpy as np
+import scipy.sparse as sp
+from typing import Any, Dict
+from kedro.io import AbstractDataSet
+
+from ..df.sparse import SparseFrame
+from ..utils.io import safe_rm
+
+# ------------------------- #
+
+class SparseMatrixDataSet(AbstractDataSet):
+
+    """SparseFrame stored as one .npz archive (CSR arrays, columns, index)"""
+
+    def __init__(
+
+            self,
+            filepath: str,
+            save_args: Dict[str, Any] = None
+
+        ):
+
+        self.filepath = filepath
+
+        # compressed by default, {compressed: false} for faster loads
+        self._save_args = save_args or dict()
+
+    # ......................... #
+
+    def _load(self) -> SparseFrame:
+
+        with np.load(self.filepath, allow_pickle=False) as f:
+
+            matrix = sp.csr_matrix(
+                (f['data'], f['indices'], f['indptr']),
+                shape=tuple(f['shape'])
+            )
+
+            index = f['index'] if 'index' in f else None
+
+            if 'index_missing' in f:
+                index = index.astype(object)
+                index[f['index_missing']] = None
+
+            return SparseFrame(matrix, f['columns'].tolist(), index)
+
+    # ......................... #
+
+    def _save(self, data: SparseFrame) -> None:
+
+        _dir, _name = os.path.split(self.filepath)
+
+        if _dir:
+            os.makedirs(_dir, exist_ok=True)
+
+        m = data.matrix
+        arrays = dict(
+            data=m.data,
+            indices=m.indices,
+            indptr=m.indptr,
+            shape=np.array(m.shape),
+            columns=np.array(data.columns, dtype=str)
+        )
+
+        if data.index is not None:
+
+            # object keys (strings from arrow) are stored as unicode, missing
+            # keys (masked or None) as a separate mask rather than 'None'
+
+            index = data.index
+            missing = np.ma.getmaskarray(index) if np.ma.isMaskedArray(index) else None
+            index = np.asarray(np.ma.getdata(index))
+
+            if index.dtype == object:
+                nulls = np.array([ x is None for x in index.tolist() ], dtype=bool)
+                missing = nulls if missing is None else missing | nulls
+                index = np.where(missing, '', index).astype(str)
+
+            arrays['index'] = index
+
+            if missing is not None and missing.any():
+                arrays['index_missing'] = missing
+
+        save = np.savez_compressed if self._save_args.get('compressed', True) else np.savez
+
+        # written next to the target and renamed, a crash mid-write keeps
+        # the previous archive; a file object, np.savez would otherwise
+        # append .npz to the path
+
+        tmp = os.path.join(_dir, f'.{_name}.tmp-{os.getpid()}')
+
+        try:
+            with open(tmp, 'wb') as f:
+                save(f, **arrays)
+
+            os.replace(tmp, self.filepath)
+
+        finally:
+            safe_rm(tmp)
+
+    # ......................... #
+
+    def _describe(self) -> Dict[str, Any]:
+        return dict(filepath=self.filepath, save_args=self._save_args)
+
+    # ......................... #
+
+    def _exists(self) -> bool:
+        return os.path.exists(self.filepath)
+
+# ------------------------- #
@@ -1,9 +1,148 @@
+import logging
 import sqlalchemy as db
 import pandas as pd
-from typing import Any, Dict, List
+import pyarrow as pa
+from functools import partial
+from typing import Any, Callable, Dict, Iterator, List, Optional, Union
 from sqlalchemy import text
 from kedro.io import AbstractDataSet
 
+from .engines import registry
+from ..utils import arrow
+from .schema_cache import SchemaCache, is_column_mismatch
+
+log = logging.getLogger(__name__)
+
+Batch = Union[pd.DataFrame, pa.RecordBatch]
+
+# ------------------------- #
+
+_pandas_types = {
+
+    pa.int32() : pd.Int32Dtype(),
+    pa.int64() : pd.Int64Dtype(),
+    pa.bool_() : pd.BooleanDtype()
+
+}
+
+# ------------------------- #
+
+def _batch_types(
+
+        res: Any,
+        query: Any,
+        names: List[str],
+        dtypes: Dict[str, Any]
+
+    ) -> Dict[str, Optional[pa.DataType]]:
+
+    # catalog dtypes, else the selected sql column types, else the PEP 249
+    # type objects of the cursor description (numbers are left to the data,
+    # int and float share NUMBER)
+
+    selected = getattr(query, 'selected_columns', None)
+    sql_types = dict() if selected is None else dict((c.name, c.type) for c in reversed(list(selected)))
+    types = arrow.column_types(names, dtypes, sql_types)
+
+    dbapi = res.context.dialect.dbapi
+    kinds = [ (getattr(dbapi, 'STRING', None), pa.string()), (getattr(dbapi, 'DATETIME', None), pa.timestamp('us')) ]
+
+    for name, code, *_ in (res.cursor.description or []) if res.cursor is not None else []:
+
+        if types.get(name) is not None or code is None:
+            continue
+
+        types[name] = next((t for kind, t in kinds if kind is not None and code == kind), None)
+
+    return types
+
+# ------------------------- #
+
+def _to_batch(
+
+        part: List[Any],
+        names: List[str],
+        types: Dict[str, Optional[pa.DataType]],
+        output: str = 'pandas'
+
+    ) -> Batch:
+
+    # every batch gets the same column types, a column without a known type
+    # takes the one of its first non-null batch
+
+    columns = list(zip(*part)) if part else [ [] for _ in names ]
+    arrays = list()
+
+    for name, values in zip(names, columns):
+
+        arr = arrow.to_arrow(list(values), patype=types.get(name))
+
+        if types.get(name) is None and arr.type != pa.null():
+            types[name] = arr.type
+
+        arrays.append(arr)
+
+    batch = pa.RecordBatch.from_arrays(arrays, names=names)
+
+    if output == 'arrow':
+        return batch
+
+    # nullable pandas dtypes, ints with missing values stay ints
+    return batch.to_pandas(types_mapper=_pandas_types.get)
+
+# ------------------------- #
+
+def _batches(
+
+        conn: db.engine.base.Connection,
+        res: Any,
+        query: Any,
+        column_names: List[str],
+        dtypes: Dict[str, Any],
+        chunksize: int,
+        output: str = 'pandas'
+
+    ) -> Iterator[Batch]:
+
+    # the connection is released once the iterator is exhausted
+
+    try:
+        names = column_names or list(res.keys())
+        types = _batch_types(res, query, names, dtypes)
+
+        for part in res.partitions(chunksize):
+            yield _to_batch(part, names, types, output)
+
+    finally:
+        conn.close()
+
+# ------------------------- #
+
+def _iter_batches(
+
+        checkout: Callable[[], db.engine.base.Connection],
+        query: Any,
+        column_names: List[str],
+        chunksize: int,
+        output: str = 'pandas',
+        dtypes: Dict[str, Any] = None
+
+    ) -> Iterator[Batch]:
+
+    # server-side cursor, the query runs before the iterator is returned
+    # so execution errors (e.g. a stale column) reach the caller
+
+    conn = checkout()
+
+    try:
+        res = conn.execution_options(stream_results=True).execute(query)
+
+    except Exception:
+        conn.close()
+        raise
+
+    return _batches(conn, res, query, column_names, dtypes or dict(), chunksize, output)
+
 # ------------------------- #
 
 class TableWithConn:
@@ -12,14 +151,77 @@ class TableWithConn:
         
             self, 
             tb: db.Table, 
-            conn: db.engine.base.Connection,
-            columns: Dict[str, Any]
+            checkout: Callable[[], db.engine.base.Connection],
+            columns: Dict[str, Any],
+            invalidate: Callable[[], None] = None,
+            reflect: Callable[[], db.Table] = None
         
         ) -> None:
 
         self.table = tb
-        self.conn = conn
         self.columns = columns
+        self._checkout = checkout
+        self._invalidate = invalidate
+        self._reflect = reflect
+        self._conn = None
+    
+    # ......................... #
+
+    @property
+    def conn(self) -> db.engine.base.Connection:
+
+        # checked out from the shared pool on first use
+
+        if self._conn is None or self._conn.closed:
+            self._conn = self._checkout()
+
+        return self._conn
+    
+    # ......................... #
+
+    def checkout(self) -> db.engine.base.Connection:
+
+        # separate pooled connection, closing it is up to the caller
+
+        return self._checkout()
+    
+    # ......................... #
+
+    def close(self) -> None:
+
+        if self._conn is not None:
+            self._conn.close()
+            self._conn = None
+    
+    # ......................... #
+
+    def invalidate_schema(self) -> None:
+
+        # drop cached table metadata, e.g. after a column mismatch
+
+        if self._invalidate is not None:
+            self._invalidate()
+    
+    # ......................... #
+
+    def resolve(self, names: List[str]) -> List[db.Column]:
+
+        # columns of the table, a name missing from cached metadata
+        # invalidates it and resolves every name against a fresh reflection
+
+        try:
+            return [ self.table.columns[k] for k in names ]
+
+        except KeyError:
+            if self._reflect is None:
+                raise
+
+        log.warning(f'{self.table.name}: columns {names} not in cached metadata, reflecting again')
+
+        self.invalidate_schema()
+        self.table = self._reflect()
+
+        return [ self.table.columns[k] for k in names ]
 
 # ------------------------- #
 
@@ -31,7 +233,12 @@ class RedshiftDataSet(AbstractDataSet):
             host: str,
             credentials: Dict[str, Any] = None,
             table: str = None,
-            columns: List[str] = None
+            columns: List[str] = None,
+            load_args: Dict[str, Any] = None,
+            engine_args: Dict[str, Any] = None,
+            schema_cache: Dict[str, Any] = None,
+            dialect: str = 'redshift',
+            query_log: Dict[str, Any] = None
         
         ):
 
@@ -48,80 +255,147 @@ class RedshiftDataSet(AbstractDataSet):
 
         _password = credentials['password']
 
-        self.redshift_connection(_password)
+        self._dialect = dialect
+        self._query_log = query_log
+        self.redshift_connection(_password, engine_args)
         self._metadata = db.MetaData()
         self._columns = columns
+        self._load_args = load_args or dict()
         self.filepath = f'{self._host}/{self._schema}/{self._table}'
+        self._schema_cache = None if schema_cache is None else SchemaCache(**schema_cache)
 
     # ......................... #
 
     def _load(self) -> TableWithConn:
 
-        tb = db.Table(
+        return TableWithConn(
+            tb=self._reflect(), 
+            checkout=partial(registry.checkout, self._key), 
+            columns=self._columns,
+            invalidate=self.invalidate_schema,
+            reflect=self._reflect
+        )
+    
+    # ......................... #
+
+    def _save(self) -> None:
+        pass
+    
+    # ......................... #
+
+    def _describe(self) -> Dict[str, Any]:
+        return dict(filepath=self.filepath, load_args=self._load_args)
+    
+    # ......................... #
 
+    def _reflect(self) -> db.Table:
+
+        engine = registry.engine(self._key)
+
+        if self._schema_cache is None:
+            return db.Table(
                 self._table, 
                 self._metadata, 
                 autoload=True, 
-                autoload_with=self._engine
-
+                autoload_with=engine
             )
 
-        return TableWithConn(
-            tb=tb, 
-            conn=self._connection, 
-            columns=self._columns
+        return self._schema_cache.table(
+            self.filepath, 
+            self._table, 
+            self._metadata, 
+            engine
         )
     
     # ......................... #
 
-    def _save(self) -> None:
-        pass
+    def invalidate_schema(self) -> None:
+
+        self._metadata = db.MetaData()
+
+        if self._schema_cache is not None:
+            self._schema_cache.invalidate(self.filepath)
     
     # ......................... #
 
-    def _describe(self) -> Dict[str, Any]:
-        return dict(filepath=self.filepath)
+    def _fetch(self, query: Any) -> Union[pd.DataFrame, Iterator[Batch]]:
+
+        chunksize = self._load_args.get('chunksize')
+
+        # `columns` is a list of names or a {name: dtype} mapping
+        column_names = list(self._columns) if self._columns else None
+        dtypes = self._columns if isinstance(self._columns, dict) else dict()
+
+        if chunksize:
+            return _iter_batches(
+                partial(registry.checkout, self._key),
+                query,
+                column_names=column_names,
+                chunksize=chunksize,
+                output=self._load_args.get('output', 'pandas'),
+                dtypes=dtypes
+            )
+
+        with registry.connect(self._key) as conn:
+            res = conn.execute(query)
+            names = column_names or list(res.keys())
+            types = _batch_types(res, query, names, dtypes)
+            df = _to_batch(res.fetchall(), names, types)
+
+        return df
     
     # ......................... #
 
-    def redshift_connection(self, pwd: str) -> None:
-        
-        self._engine = db.create_engine(
-                f'redshift://{self._user}:{pwd}@{self._host}',
-                connect_args={'options': f'-csearch_path={self._schema}'},
-                pool_recycle=3600,
-                pool_size=20,
-                max_overflow=20,
-                encoding='utf8',
-                echo=True
-            )
+    def redshift_connection(
+
+            self, 
+            pwd: str, 
+            engine_args: Dict[str, Any] = None
 
-        self._connection = self._engine.connect()
+        ) -> None:
+
+        # engines are shared per host, user and search_path,
+        # connections are only checked out for the duration of a load
+        
+        self._key = registry.get_engine(
+            host=self._host,
+            user=self._user,
+            password=pwd,
+            schema=self._schema,
+            engine_args=engine_args,
+            dialect=self._dialect,
+            query_log=self._query_log
+        )
 
 # ------------------------- #
 
 class RedshiftFullDataSet(RedshiftDataSet):
 
-    def _load(self) -> pd.DataFrame:
+    def _load(self) -> Union[pd.DataFrame, Iterator[Batch]]:
 
-        tb = db.Table(
-                self._table, 
-                self._metadata, 
-                autoload=True, 
-                autoload_with=self._engine
-            )
+        try:
+            return self._fetch(self._query())
+        
+        except Exception as exc:
+            if self._schema_cache is None or not is_column_mismatch(exc):
+                raise
 
-        if self._columns:
-            query = db.select([tb.columns[x] for x in self._columns])
+        # cached metadata is stale, reflect again and retry once
 
-        else:
-            query = db.select([tb])
+        self.invalidate_schema()
 
-        data = self._connection.execute(query).fetchall()
-        df = pd.DataFrame(data=data, columns=self._columns or tb.columns.keys())
-        self._connection.close()
+        return self._fetch(self._query())
+    
+    # ......................... #
 
-        return df
+    def _query(self) -> Any:
+
+        tb = self._reflect()
+
+        if self._columns:
+            return db.select([tb.columns[x] for x in self._columns])
+
+        return db.select([tb])
 
 # ------------------------- #
 
@@ -133,12 +407,7 @@ class RedshiftSQLDataSet(RedshiftDataSet):
 
         self._sql = sql
 
-    def _load(self) -> pd.DataFrame:
-
-        data = self._connection.execute(text(self._sql)).fetchall()
-        df = pd.DataFrame(data=data, columns=self._columns)
-        self._connection.close()
-
-        return df
+    def _load(self) -> Union[pd.DataFrame, Iterator[Batch]]:
+        return self._fetch(text(self._sql))
 
 # ------------------------- #
\ No newline at end of file
@@ -1,55 +1,469 @@
 import vaex
 import os
 import gc
+import json
+import time
 import logging
-from typing import Any, Dict
-from kedro.io import AbstractDataSet
+import weakref
+import threading
+import pyarrow as pa
+import pyarrow.compute as pc
+import pyarrow.parquet as pq
+from typing import Any, Dict, List, Optional, Tuple
+from kedro.io import AbstractDataSet, DataSetError
 from vaex.legacy import SubspaceLocal, Subspace
 
-from ..utils.io import safe_rmtree, safe_rm, _TEMPDIR
+from ..utils.io import safe_rmtree, safe_rm, spool_path, _TEMPDIR
+from ..utils.categories import CategoryDictionary, CATEGORY
 from ..utils.typing import VaexDataFrame
 
 log = logging.getLogger(__name__)
 
+_ops = {
+
+    '=' : pc.equal,
+    '==' : pc.equal,
+    '!=' : pc.not_equal,
+    '<' : pc.less,
+    '<=' : pc.less_equal,
+    '>' : pc.greater,
+    '>=' : pc.greater_equal,
+    'in' : lambda x, v: pc.is_in(x, value_set=pa.array(v)),
+    'not in' : lambda x, v: pc.invert(pc.is_in(x, value_set=pa.array(v)))
+
+}
+
+# ------------------------- #
+
+def _as_dnf(filters: List[Any] = None) -> Optional[List[Any]]:
+
+    # yaml lists to pyarrow DNF: [[col, op, val], ...] is a conjunction,
+    # [[[col, op, val], ...], ...] a disjunction of conjunctions
+
+    if not filters:
+        return None
+
+    if isinstance(filters[0][0], (list, tuple)):
+        return [ [ tuple(f) for f in conj ] for conj in filters ]
+
+    return [ tuple(f) for f in filters ]
+
+# ------------------------- #
+
+def _dnf_mask(table: pa.Table, filters: List[Any]) -> pa.Array:
+
+    dnf = _as_dnf(filters)
+
+    if not isinstance(dnf[0], list):
+        dnf = [dnf]
+
+    mask = None
+
+    for conj in dnf:
+
+        cmask = None
+
+        for col, op, val in conj:
+            m = _ops[op](table[col], val)
+            cmask = m if cmask is None else pc.and_kleene(cmask, m)
+
+        mask = cmask if mask is None else pc.or_kleene(mask, cmask)
+
+    return pc.fill_null(mask, False)
+
+# ------------------------- #
+
+def _unify_dictionaries(table: pa.Table, dictionaries: Dict[str, pa.Array]) -> pa.Table:
+
+    # an ipc file holds one dictionary per column: chunks encoded against an
+    # earlier (prefix) state of the append-only vocabulary keep their codes,
+    # others are re-encoded, dictionary columns without a vocabulary decoded
+
+    for i, field in enumerate(table.schema):
+
+        if not pa.types.is_dictionary(field.type):
+            continue
+
+        final = dictionaries.get(field.name)
+        chunks = list()
+
+        for arr in table.column(i).chunks:
+
+            if final is None:
+                chunks.append(arr.dictionary_decode())
+
+            elif len(arr.dictionary) <= len(final) and final.slice(0, len(arr.dictionary)).equals(arr.dictionary):
+                chunks.append(pa.DictionaryArray.from_arrays(arr.indices, final))
+
+            else:
+                indices = pc.index_in(arr.dictionary_decode(), value_set=final).cast(arr.indices.type)
+
+                if indices.null_count != arr.null_count:
+                    raise DataSetError(f'{field.name}: values missing from the category dictionary')
+
+                chunks.append(pa.DictionaryArray.from_arrays(indices, final))
+
+        dtype = field.type.value_type if final is None else pa.dictionary(field.type.index_type, field.type.value_type)
+        table = table.set_column(i, field.name, pa.chunked_array(chunks, type=dtype))
+
+    return table
+
 # ------------------------- #
 
 class VaexDataSet(AbstractDataSet):
 
-    def __init__(self, filepath: str):
+    def __init__(
+        
+            self, 
+            filepath: str,
+            columns: Dict[str, str] = None,
+            dictionary: str = None,
+            cache: bool = False,
+            load_args: Dict[str, Any] = None,
+            save_args: Dict[str, Any] = None
+        
+        ):
 
         self.filepath = filepath
         _dir, _ = os.path.split(filepath)
         self._tempdir = os.path.join(_dir, _TEMPDIR)
+
+        # columns declared as category are stored dictionary-encoded
+        # against a persisted dictionary (sidecar file by default)
+
+        self._categories = [ c for c, d in (columns or dict()).items() if d == CATEGORY ]
+        self._dictionary = dictionary or f'{filepath}.dictionary.json'
+
+        # opt-in content fingerprint stored next to the artifact,
+        # used by the node cache hook to skip unchanged nodes
+
+        self.cache = cache
+        self._fingerprint_path = f'{filepath}.fingerprint.json'
+        self._pending_fingerprint = None
+        self._loaded = None
+
+        # column projection and row-group filters applied by the parquet
+        # reader, aliases of one file may declare different projections
+
+        self._load_args = load_args or dict()
+        self._projected = bool(self._load_args.get('columns') or self._load_args.get('filters'))
+
+        # parquet codec, level and row group size
+        self._save_args = save_args or dict()
     
     # ......................... #
 
     def _load(self) -> VaexDataFrame:
-        return vaex.open(self.filepath)
+
+        if self._projected:
+
+            table = pq.read_table(
+                self.filepath,
+                columns=self._load_args.get('columns'),
+                filters=_as_dnf(self._load_args.get('filters')),
+                memory_map=True
+            )
+
+            return vaex.from_arrow_table(table)
+
+        df = vaex.open(self.filepath)
+        self._loaded = weakref.ref(df)
+
+        return df
     
     # ......................... #
 
     def _save(self, data: VaexDataFrame) -> None:
 
-        safe_rm(self.filepath)
+        if self._projected:
+            raise DataSetError(f'projected alias of {self.filepath} is read-only')
+
+        if (self._loaded is not None 
+            and self._loaded() is data
+            and os.path.exists(self.filepath)):
+
+            # the artifact itself is being saved back, e.g. a reused node output
+            log.info(f'{self.filepath} is unchanged, skipping export')
+            self._write_fingerprint()
+
+            return
+
+        if self._categories:
+            data = self._encode_categories(data)
+
+        df = data.df if isinstance(data, (Subspace, SubspaceLocal)) else data
+        spool = None if df is not data else spool_path(df)
+
+        safe_rm(self._fingerprint_path)
+        start = time.perf_counter()
+
+        if spool is not None and spool.endswith(os.path.splitext(self.filepath)[1]):
+
+            # unmodified extraction output is already a single file
+            log.info(f'moving spooled extraction {spool} to {self.filepath}')
+            os.replace(spool, self.filepath)
 
-        if isinstance(data, (Subspace, SubspaceLocal)):
-            data.df.export(
-                path=self.filepath, 
-                progress=True
-            )
-            
         else:
-            data.export(
-                path=self.filepath, 
-                progress=True
-            )
+
+            # written next to the target and renamed, a crash mid-write
+            # keeps the previous artifact intact
+
+            _dir, _name = os.path.split(self.filepath)
+            _, ext = os.path.splitext(_name)
+            tmp = os.path.join(_dir, f'.{_name}.tmp-{os.getpid()}{ext}')
+
+            try:
+                self._export(df, tmp)
+                os.replace(tmp, self.filepath)
+
+            finally:
+                safe_rm(tmp)
+
+            elapsed = time.perf_counter() - start
+            size = os.path.getsize(self.filepath) / 2 ** 20
+
+            log.info(f'exported {self.filepath}: {size:.1f} MB in {elapsed:.2f}s '
+                     f'({size / max(elapsed, 1e-9):.1f} MB/s)')
             
         safe_rmtree(self._tempdir)
+        self._write_fingerprint()
         gc.collect(generation=2)
+
+    # ......................... #
+
+    def _export(self, df: VaexDataFrame, path: str) -> None:
+
+        if path.endswith('.arrow'):
+
+            # uncompressed arrow ipc file, can be memory-mapped without copies
+
+            chunk_size = self._save_args.get('row_group_size', 1_048_576)
+            writer = None
+            dictionaries = None
+
+            with pa.OSFile(path, 'wb') as sink:
+
+                for _, _, table in df.to_arrow_table(chunk_size=chunk_size, parallel=True):
+
+                    if dictionaries is None:
+
+                        # vocabularies as of now, a superset of every chunk's dictionary
+
+                        dictionary = CategoryDictionary.shared(self._dictionary) if self._categories else None
+                        dictionaries = { f.name : dictionary.values(f.name, f.type.value_type)
+                                         for f in table.schema
+                                         if dictionary is not None and f.name in self._categories
+                                         and pa.types.is_dictionary(f.type) }
+
+                    table = _unify_dictionaries(table, dictionaries)
+
+                    if writer is None:
+                        writer = pa.ipc.new_file(sink, table.schema)
+
+                    writer.write_table(table)
+
+                if writer is not None:
+                    writer.close()
+
+            return
+
+        if not path.endswith('.parquet'):
+            df.export(path=path, progress=True)
+            return
+
+        # chunks are evaluated in parallel on the vaex thread pool,
+        # every chunk becomes one row group
+
+        df.export_parquet(
+            path, 
+            progress=True,
+            chunk_size=self._save_args.get('row_group_size', 1_048_576),
+            parallel=True,
+            compression=self._save_args.get('compression', 'snappy'),
+            compression_level=self._save_args.get('compression_level')
+        )
     
     # ......................... #
 
     def _describe(self) -> Dict[str, Any]:
-        return dict(filepath=self.filepath)
+        return dict(
+            filepath=self.filepath, 
+            categories=self._categories, 
+            cache=self.cache,
+            load_args=self._load_args,
+            save_args=self._save_args
+        )
+    
+    # ......................... #
+
+    def _exists(self) -> bool:
+        return os.path.exists(self.filepath)
+    
+    # ......................... #
+
+    def fingerprint(self) -> Optional[str]:
+
+        if not os.path.exists(self._fingerprint_path):
+            return None
+
+        with open(self._fingerprint_path, 'r') as f:
+            return json.load(f)['fingerprint']
+    
+    # ......................... #
+
+    def expect_fingerprint(self, fingerprint: str) -> None:
+
+        # recorded with the next save
+        self._pending_fingerprint = fingerprint
+    
+    # ......................... #
+
+    def _write_fingerprint(self) -> None:
+
+        if not self.cache or self._pending_fingerprint is None:
+            return
+
+        with open(self._fingerprint_path, 'w') as f:
+            json.dump(dict(fingerprint=self._pending_fingerprint), f)
+
+        self._pending_fingerprint = None
+    
+    # ......................... #
+
+    def _encode_categories(self, data: VaexDataFrame) -> VaexDataFrame:
+
+        df = data.df if isinstance(data, (Subspace, SubspaceLocal)) else data
+        todo = [ c for c in self._categories
+                 if c in df.get_column_names() and not df.data_type(c).is_encoded ]
+
+        if not todo:
+            return data
+
+        df = df.extract() if df.filtered else df.copy()
+        dictionary = CategoryDictionary.shared(self._dictionary)
+
+        for col in todo:
+            df[col] = dictionary.encode(col, df[col].values)
+
+        dictionary.save()
+
+        return df
+
+# ------------------------- #
+
+class SharedVaexDataSet(VaexDataSet):
+
+    """Serves every consumer of an artifact from one in-process arrow table
+    per run: ``.arrow`` files are memory-mapped without copies, parquet
+    columns are decoded at most once and shared afterwards"""
+
+    _tables: Dict[str, Tuple[int, pa.Table]] = dict()
+    _stats: Dict[str, int] = dict(shared=0, copied=0)
+    _lock = threading.Lock()
+    
+    # ......................... #
+
+    @classmethod
+    def stats(cls) -> Dict[str, int]:
+        return dict(cls._stats)
+    
+    # ......................... #
+
+    @classmethod
+    def release(cls, filepath: str = None) -> None:
 
-# ------------------------- #
\ No newline at end of file
+        # one artifact once its last consumer ran, everything (and the
+        # counters) between runs
+
+        with cls._lock:
+
+            if filepath is not None:
+                cls._tables.pop(os.path.abspath(filepath), None)
+                return
+
+            cls._tables.clear()
+            cls._stats.update(shared=0, copied=0)
+    
+    # ......................... #
+
+    def _shared_table(self, columns: List[str] = None) -> pa.Table:
+
+        key = os.path.abspath(self.filepath)
+        mtime = os.stat(key).st_mtime_ns
+
+        with self._lock:
+
+            stamp, table = self._tables.get(key, (None, None))
+
+            if stamp != mtime:
+                table = None
+
+            if self.filepath.endswith('.arrow'):
+
+                if table is None:
+                    start = pa.total_allocated_bytes()
+                    table = pa.ipc.open_file(pa.memory_map(key, 'r')).read_all()
+                    self._stats['copied'] += pa.total_allocated_bytes() - start
+                    self._stats['shared'] += table.nbytes
+
+                else:
+                    served = table.select(columns) if columns else table
+                    self._stats['shared'] += served.nbytes
+
+            else:
+
+                needed = columns or pq.read_schema(key).names
+                present = [] if table is None else table.column_names
+                missing = [ c for c in needed if c not in present ]
+
+                if missing:
+                    part = pq.read_table(key, columns=missing, memory_map=True)
+                    self._stats['copied'] += part.nbytes
+
+                    if table is None:
+                        table = part
+
+                    else:
+                        for name in missing:
+                            table = table.append_column(name, part[name])
+
+                shared = [ c for c in needed if c in present ]
+
+                if shared:
+                    self._stats['shared'] += table.select(shared).nbytes
+
+            self._tables[key] = (mtime, table)
+
+        return table
+    
+    # ......................... #
+
+    def _load(self) -> VaexDataFrame:
+
+        columns = self._load_args.get('columns')
+        filters = self._load_args.get('filters')
+
+        table = self._shared_table(columns)
+        table = table.select(columns) if columns else table
+
+        if filters:
+            table = table.filter(_dnf_mask(table, filters))
+
+            with self._lock:
+                self._stats['copied'] += table.nbytes
+
+        df = vaex.from_arrow_table(table)
+        self._loaded = weakref.ref(df)
+
+        return df
+    
+    # ......................... #
+
+    def _save(self, data: VaexDataFrame) -> None:
+
+        with self._lock:
+            self._tables.pop(os.path.abspath(self.filepath), None)
+
+        super()._save(data)
+
+# ------------------------- #
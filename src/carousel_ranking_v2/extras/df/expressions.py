@@ -0,0 +1,281 @@
+import ast
+import operator
+import functools
+from vaex.expression import Expression
+from typing import Any, Callable, Dict, FrozenSet, List, Optional, Tuple
+
+from ..utils.typing import *
+
+# ------------------------- #
+
+class ExpressionError(ValueError):
+    pass
+
+# ------------------------- #
+
+_binary: Dict[type, Callable] = {
+
+    ast.Add : operator.add,
+    ast.Sub : operator.sub,
+    ast.Mult : operator.mul,
+    ast.Div : operator.truediv,
+    ast.FloorDiv : operator.floordiv,
+    ast.Mod : operator.mod,
+    ast.Pow : operator.pow,
+    ast.BitAnd : operator.and_,
+    ast.BitOr : operator.or_,
+    ast.BitXor : operator.xor
+
+}
+
+_compare: Dict[type, Callable] = {
+
+    ast.Eq : operator.eq,
+    ast.NotEq : operator.ne,
+    ast.Lt : operator.lt,
+    ast.LtE : operator.le,
+    ast.Gt : operator.gt,
+    ast.GtE : operator.ge
+
+}
+
+_unary: Dict[type, Callable] = {
+
+    ast.Invert : operator.invert,
+    ast.Not : lambda x: ~x if isinstance(x, Expression) else operator.not_(x),
+    ast.USub : operator.neg,
+    ast.UAdd : operator.pos
+
+}
+
+# <name>(...) or the legacy df.func.<name>(...)
+_functions = frozenset(['abs', 'log', 'log1p', 'log10', 'sqrt', 'exp', 'clip', 'where', 'minimum', 'maximum'])
+
+# <expression>.<name>(...)
+_methods = frozenset(['isin', 'isna', 'notna', 'ismissing', 'notmissing', 'fillna', 'astype', 'abs'])
+
+_literals = (str, int, float, bool, type(None))
+
+# ------------------------- #
+
+def _function(func: ast.AST) -> Optional[str]:
+
+    # name of an allowed df.func function called as `log(x)` or `df.func.log(x)`
+
+    if isinstance(func, ast.Name) and func.id in _functions:
+        return func.id
+
+    if isinstance(func, ast.Attribute) and func.attr in _functions \
+       and isinstance(func.value, ast.Attribute) and func.value.attr == 'func' \
+       and isinstance(func.value.value, ast.Name) and func.value.value.id == 'df':
+        return func.attr
+
+    return None
+
+# ------------------------- #
+
+class CompiledExpression:
+
+    """Validated expression over column names and named parameters, bound
+    to a frame as a vectorized vaex expression without any eval"""
+
+    def __init__(self, text: str) -> None:
+
+        self.text = text
+
+        try:
+            self._tree = ast.parse(text.strip(), mode='eval').body
+
+        except SyntaxError as exc:
+            raise ExpressionError(f'invalid expression {text!r}: {exc.msg}') from None
+
+        self.names: FrozenSet[str] = frozenset(self._validate(self._tree))
+
+    # ......................... #
+
+    def _validate(self, node: ast.AST) -> List[str]:
+
+        # returns referenced names (columns or parameters)
+
+        if isinstance(node, ast.Constant):
+
+            if not isinstance(node.value, _literals):
+                raise ExpressionError(f'unsupported literal {node.value!r} in {self.text!r}')
+
+            return []
+
+        if isinstance(node, ast.Name) and not node.id.startswith('__'):
+            return [node.id]
+
+        if isinstance(node, ast.Attribute):
+
+            # legacy `df.column` references
+
+            if isinstance(node.value, ast.Name) and node.value.id == 'df' \
+               and not node.attr.startswith('__'):
+                return [node.attr]
+
+            raise ExpressionError(f'attribute access {ast.dump(node)} not allowed in {self.text!r}')
+
+        if isinstance(node, (ast.List, ast.Tuple, ast.Set)):
+            return [ n for x in node.elts for n in self._validate(x) ]
+
+        if isinstance(node, ast.BinOp) and type(node.op) in _binary:
+            return self._validate(node.left) + self._validate(node.right)
+
+        if isinstance(node, ast.UnaryOp) and type(node.op) in _unary:
+            return self._validate(node.operand)
+
+        if isinstance(node, ast.BoolOp):
+            return [ n for x in node.values for n in self._validate(x) ]
+
+        if isinstance(node, ast.Compare):
+
+            for op in node.ops:
+                if type(op) not in _compare and not isinstance(op, (ast.In, ast.NotIn)):
+                    raise ExpressionError(f'unsupported comparison {op.__class__.__name__} in {self.text!r}')
+
+            return [ n for x in [node.left] + node.comparators for n in self._validate(x) ]
+
+        if isinstance(node, ast.Call) and not node.keywords:
+
+            func = node.func
+            args = [ n for x in node.args for n in self._validate(x) ]
+
+            if _function(func) is not None:
+                return args
+
+            if isinstance(func, ast.Attribute) and func.attr in _methods:
+                return self._validate(func.value) + args
+
+            raise ExpressionError(f'call to {ast.dump(func)} not allowed in {self.text!r}')
+
+        raise ExpressionError(f'unsupported syntax {node.__class__.__name__} in {self.text!r}')
+
+    # ......................... #
+
+    def bind(self, df: VaexDataFrame, **params: Any) -> Any:
+
+        columns = set(df.get_column_names(hidden=True))
+        missing = [ n for n in self.names if n not in params and n not in columns ]
+
+        if missing:
+            raise ExpressionError(f'unknown columns {missing} in {self.text!r}')
+
+        return _Binder(df, params).emit(self._tree)
+
+    # ......................... #
+
+    def __repr__(self) -> str:
+        return f'CompiledExpression({self.text!r})'
+
+# ------------------------- #
+
+class _Binder:
+
+    def __init__(self, df: VaexDataFrame, params: Dict[str, Any]) -> None:
+
+        self.df = df
+        self.params = params
+
+    # ......................... #
+
+    def _values(self, node: ast.AST) -> List[Any]:
+
+        values = self.emit(node)
+
+        if isinstance(values, (set, frozenset, tuple)):
+            return list(values)
+
+        if isinstance(values, list):
+            return values
+
+        return list(values) if hasattr(values, '__iter__') and not isinstance(values, str) else [values]
+
+    # ......................... #
+
+    def emit(self, node: ast.AST) -> Any:
+
+        if isinstance(node, ast.Constant):
+            return node.value
+
+        if isinstance(node, ast.Name):
+            return self.params[node.id] if node.id in self.params else self.df[node.id]
+
+        if isinstance(node, ast.Attribute):
+            return self.df[node.attr]
+
+        if isinstance(node, (ast.List, ast.Tuple, ast.Set)):
+            return [ self.emit(x) for x in node.elts ]
+
+        if isinstance(node, ast.BinOp):
+            return _binary[type(node.op)](self.emit(node.left), self.emit(node.right))
+
+        if isinstance(node, ast.UnaryOp):
+            return _unary[type(node.op)](self.emit(node.operand))
+
+        if isinstance(node, ast.BoolOp):
+            op = operator.and_ if isinstance(node.op, ast.And) else operator.or_
+            return functools.reduce(op, [ self.emit(x) for x in node.values ])
+
+        if isinstance(node, ast.Compare):
+
+            # chained comparisons a < b < c become (a < b) & (b < c)
+
+            parts, left = list(), node.left
+
+            for op, right in zip(node.ops, node.comparators):
+
+                if isinstance(op, (ast.In, ast.NotIn)):
+                    part = self.emit(left).isin(self._values(right))
+                    part = ~part if isinstance(op, ast.NotIn) else part
+
+                else:
+                    part = _compare[type(op)](self.emit(left), self.emit(right))
+
+                parts.append(part)
+                left = right
+
+            return functools.reduce(operator.and_, parts)
+
+        if isinstance(node, ast.Call):
+
+            func = node.func
+
+            name = _function(func)
+
+            if name is not None:
+                return getattr(self.df.func, name)(*[ self.emit(x) for x in node.args ])
+
+            target = self.emit(func.value)
+
+            if func.attr == 'isin':
+                return target.isin(self._values(node.args[0]))
+
+            return getattr(target, func.attr)(*[ self.emit(x) for x in node.args ])
+
+        raise ExpressionError(f'unsupported syntax {node.__class__.__name__}')
+
+# ------------------------- #
+
+@functools.lru_cache(maxsize=4096)
+def compile_expression(text: str) -> CompiledExpression:
+
+    # parsed and validated once per distinct text
+
+    return CompiledExpression(text)
+
+# ------------------------- #
+
+def split_assignment(text: str) -> Tuple[str, str]:
+
+    # `name = expression` config entries, a bare expression gets no name
+
+    name, sep, expr = text.partition('=')
+
+    if sep and name.strip().isidentifier() and not expr.startswith('='):
+        return name.strip(), expr.strip()
+
+    return None, text.strip()
+
+# ------------------------- #
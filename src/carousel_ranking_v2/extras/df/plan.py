@@ -0,0 +1,383 @@
+import datetime
+import numpy as np
+import pyarrow as pa
+import pyarrow.compute as pc
+from typing import Any, Callable, Dict, List, Tuple
+
+from ..utils.typing import *
+from .vaex import _parse_dates, _compact_days
+
+# ------------------------- #
+
+class _Node:
+
+    """One column value in the plan: a source column, a constant or a
+    kernel applied to other nodes"""
+
+    def __init__(
+
+            self,
+            op: str,
+            inputs: Tuple['_Node'] = tuple(),
+            kernel: Callable = None,
+            itemsize: int = None,
+            source: str = None,
+            value: Any = None,
+            size: Callable[[], int] = None
+
+        ) -> None:
+
+        self.op = op
+        self.inputs = inputs
+        self.kernel = kernel
+        self.source = source
+        self.value = value
+        self._itemsize = itemsize
+        self._size = size
+
+    # ......................... #
+
+    @property
+    def itemsize(self) -> int:
+
+        # resolved on first use, only for columns the plan touches
+
+        if self._itemsize is None:
+            self._itemsize = self._size() if self._size is not None else self.inputs[0].itemsize
+
+        return self._itemsize
+
+    # ......................... #
+
+    @property
+    def constant(self) -> bool:
+        return self.op == 'constant' or bool(self.inputs) and all(x.constant for x in self.inputs)
+
+    # ......................... #
+
+    @property
+    def computed(self) -> bool:
+        return self.op != 'source'
+
+# ------------------------- #
+
+def _numpy(values: Any) -> np.ndarray:
+
+    if isinstance(values, (pa.Array, pa.ChunkedArray)):
+        return values.to_numpy(zero_copy_only=False)
+
+    return values
+
+# ------------------------- #
+
+def _fill(values: Any, value: Any) -> Any:
+
+    # missing values and NaN, like DataFrame.fillna
+
+    if isinstance(values, pa.ChunkedArray):
+        values = values.combine_chunks()
+
+    if isinstance(values, pa.Array):
+        return pc.fill_null(values, pa.scalar(value, values.type))
+
+    if np.ma.isMaskedArray(values):
+        values = values.filled(value)
+
+    if values.dtype.kind == 'f':
+        values = np.where(np.isnan(values), value, values)
+
+    return values
+
+# ------------------------- #
+
+def _days(values: np.ndarray, base: np.ndarray, dtype: str) -> np.ndarray:
+
+    # same floor semantics as vx.days_difference
+
+    diff = _numpy(base) - _numpy(values)
+    missing = np.isnat(diff)
+    days = np.where(missing, np.timedelta64(0), diff) // np.timedelta64(1, 'D')
+
+    return _compact_days(days, missing, dtype)
+
+# ------------------------- #
+
+class Plan:
+
+    """Lazy chain of vx column transformations, fused into one read per
+    source column and one write per surviving column on `collect`"""
+
+    def __init__(self, data: VaexDataFrame) -> None:
+
+        self._data = data
+        self._columns: Dict[str, _Node] = { c : self._source(c) for c in data.get_column_names(hidden=True) }
+        self._steps: List[Tuple[str, List[str]]] = list()
+        self._eager = dict(passes=0, bytes=0)
+        self._stats = None
+
+    # ......................... #
+
+    def _source(self, col: str) -> _Node:
+        return _Node('source', source=col, size=lambda: self._itemsize(col))
+
+    # ......................... #
+
+    def _itemsize(self, col: str) -> int:
+
+        dtype = self._data.data_type(col)
+
+        if dtype.is_string:
+            return 16
+
+        # dictionary-encoded columns have no numpy dtype, the codes are read
+        if isinstance(dtype.internal, pa.DictionaryType):
+            return dtype.internal.index_type.bit_width // 8
+
+        return np.dtype(dtype.numpy).itemsize
+
+    # ......................... #
+
+    def _record(
+
+            self,
+            step: str,
+            cols: List[str],
+            passes: int = 1
+
+        ) -> 'Plan':
+
+        # what the eager vx helper would cost: `passes` reads of the frame
+        # and one in-memory column written per transformed column
+
+        self._steps.append((step, list(cols)))
+        self._eager['passes'] += passes
+        self._eager['bytes'] += self._data.length_unfiltered() * sum(self._columns[c].itemsize for c in cols)
+        self._stats = None
+
+        return self
+
+    # ......................... #
+
+    def _apply(
+
+            self,
+            op: str,
+            col: str,
+            kernel: Callable,
+            inputs: List[str] = list(),
+            itemsize: int = None
+
+        ) -> None:
+
+        if col not in self._columns:
+            raise KeyError(f'{col=} not in plan')
+
+        nodes = (self._columns[col],) + tuple(self._columns[c] for c in inputs)
+        self._columns[col] = _Node(op, nodes, kernel, itemsize)
+
+    # ......................... #
+
+    def drop(self, cols: List[str]) -> 'Plan':
+
+        for col in cols:
+            self._columns.pop(col, None)
+
+        return self._record('drop', list(), passes=0)
+
+    # ......................... #
+
+    def constant(self, col: str, val: Any) -> 'Plan':
+
+        if col in self._columns:
+            raise ValueError(f'{col=} already exists')
+
+        value = np.asarray([val])
+        self._columns[col] = _Node('constant', itemsize=value.dtype.itemsize, value=value)
+
+        return self._record('constant', [col], passes=0)
+
+    # ......................... #
+
+    def fillna(self, cols: List[str], value: Any) -> 'Plan':
+
+        for col in cols:
+            self._apply('fillna', col, lambda x, value=value: _fill(x, value))
+
+        return self._record('fillna', cols)
+
+    # ......................... #
+
+    def force_int(self, cols: List[str]) -> 'Plan':
+
+        for col in cols:
+            self._apply('force_int', col, lambda x: _numpy(x).astype('int64'), itemsize=8)
+
+        return self._record('force_int', cols)
+
+    # ......................... #
+
+    def datetime(
+
+            self,
+            cols: List[str],
+            fillnaval: datetime.date,
+            dtformat: str = r'\d{4}-\d{2}-\d{2}',
+            strformat: str = '%Y-%m-%d'
+
+        ) -> 'Plan':
+
+        fill = np.datetime64(fillnaval, 'D')
+        parse = lambda x: _parse_dates(x, dtformat, strformat, fill)
+
+        for col in cols:
+            self._apply('datetime', col, parse, itemsize=8)
+
+        return self._record('datetime', cols, passes=len(cols))
+
+    # ......................... #
+
+    def days_difference(
+
+            self,
+            cols: List[str],
+            basecol: str,
+            dropbase: bool = True,
+            dtype: str = 'int32'
+
+        ) -> 'Plan':
+
+        itemsize = np.dtype(dtype).itemsize
+
+        for col in cols:
+            self._apply('days_difference', col, lambda x, base: _days(x, base, dtype), [basecol], itemsize)
+
+        self._record('days_difference', cols, passes=len(cols) + 1)
+
+        if dropbase:
+            self.drop([basecol])
+
+        return self
+
+    # ......................... #
+
+    def _targets(self) -> Dict[str, _Node]:
+
+        # surviving columns whose value differs from the input frame
+
+        return { c : n for c, n in self._columns.items() if n.computed }
+
+    # ......................... #
+
+    def _reads(self, targets: Dict[str, _Node]) -> List[str]:
+
+        reads, stack = list(), list(targets.values())
+
+        while stack:
+            node = stack.pop()
+
+            if node.op == 'source' and node.source not in reads:
+                reads.append(node.source)
+
+            stack.extend(node.inputs)
+
+        return reads
+
+    # ......................... #
+
+    def _evaluate(
+
+            self,
+            node: _Node,
+            sources: Dict[str, Any],
+            memo: Dict[int, Any]
+
+        ) -> Any:
+
+        if node.op == 'source':
+            return sources[node.source]
+
+        if node.op == 'constant':
+            return node.value
+
+        if id(node) not in memo:
+            memo[id(node)] = node.kernel(*[ self._evaluate(x, sources, memo) for x in node.inputs ])
+
+        return memo[id(node)]
+
+    # ......................... #
+
+    def collect(self) -> VaexDataFrame:
+
+        # sources are read unfiltered, constants must match their length
+
+        df = self._data.copy()
+        n = df.length_unfiltered()
+        targets = self._targets()
+        reads = self._reads(targets)
+
+        # one evaluation per array type, strings stay arrow for the parsers
+
+        strings = [ c for c in reads if df.data_type(c).is_string ]
+        groups = [ (strings, 'arrow'), ([ c for c in reads if c not in strings ], 'numpy') ]
+        sources = dict()
+
+        for cols, array_type in groups:
+            if cols:
+                sources.update(zip(cols, df.evaluate(cols, filtered=False, array_type=array_type)))
+
+        dropped = [ c for c in df.get_column_names(hidden=True) if c not in self._columns ]
+        df = df.drop(dropped) if dropped else df
+
+        memo, written = dict(), 0
+
+        for col, node in targets.items():
+
+            values = self._evaluate(node, sources, memo)
+
+            if node.constant:
+                values = np.full(n, np.ravel(_numpy(values))[0]) if len(values) == 1 else values
+
+            df[col] = values
+            written += values.nbytes
+
+        self._stats = dict(
+            passes=sum(1 for cols, _ in groups if cols),
+            bytes=written,
+            reads=len(reads),
+            writes=len(targets)
+        )
+
+        return df
+
+    # ......................... #
+
+    def explain(self) -> str:
+
+        # estimated before `collect`, measured after
+
+        n = self._data.length_unfiltered()
+        targets = self._targets()
+        reads = self._reads(targets)
+
+        stats = self._stats or dict(
+            passes=len(set(self._data.data_type(c).is_string for c in reads)),
+            bytes=n * sum(x.itemsize for x in targets.values()),
+            reads=len(reads),
+            writes=len(targets)
+        )
+        kind = 'measured' if self._stats else 'estimated'
+
+        lines = [ f'plan over {n} rows, {len(self._steps)} steps:' ]
+        lines += [ f'  {step}({", ".join(cols)})' for step, cols in self._steps ]
+        lines += [
+            f'fused: {stats["passes"]} passes reading {stats["reads"]} columns, '
+            f'{stats["writes"]} columns materialized, {stats["bytes"] / 2 ** 20:.1f} MB ({kind})',
+            f'eager: {self._eager["passes"]} passes, {self._eager["bytes"] / 2 ** 20:.1f} MB (estimated)'
+        ]
+
+        report = '\n'.join(lines)
+        print(report)
+
+        return report
+
+# ------------------------- #
@@ -0,0 +1,160 @@
+import json
+import numpy as np
+from typing import Any, Dict, List
+
+from ..utils.typing import *
+
+# ------------------------- #
+
+class StreamingScaler:
+
+    """Standard scaler with per-column count / mean / M2 accumulated chunk
+    by chunk (Welford, Chan et al. merge), mergeable across chunks and
+    processes and stored as json"""
+
+    def __init__(
+
+            self,
+            features: List[str],
+            dtype: str = 'float64'
+
+        ) -> None:
+
+        k = len(features)
+
+        self.features = list(features)
+        self.dtype = dtype
+        self.count_ = np.zeros(k)
+        self.mean_ = np.zeros(k)
+        self.m2_ = np.zeros(k)
+
+    # ......................... #
+
+    @property
+    def var_(self) -> np.ndarray:
+        return np.where(self.count_ > 0, self.m2_ / np.maximum(self.count_, 1), np.nan)
+
+    # ......................... #
+
+    @property
+    def scale_(self) -> np.ndarray:
+
+        # population std like vaex.ml, constant columns are only centered
+
+        std = np.sqrt(self.var_)
+
+        return np.where(std > 0, std, 1.)
+
+    # ......................... #
+
+    def _merge(
+
+            self,
+            count: np.ndarray,
+            mean: np.ndarray,
+            m2: np.ndarray
+
+        ) -> 'StreamingScaler':
+
+        total = self.count_ + count
+        share = np.divide(count, total, out=np.zeros_like(total), where=total > 0)
+        delta = mean - self.mean_
+
+        self.mean_ = self.mean_ + delta * share
+        self.m2_ = self.m2_ + m2 + delta ** 2 * self.count_ * share
+        self.count_ = total
+
+        return self
+
+    # ......................... #
+
+    def partial_fit(self, chunk: np.ndarray) -> 'StreamingScaler':
+
+        # (rows, features) block, missing values and NaN are skipped per column
+
+        x = np.ma.filled(np.ma.asarray(chunk, dtype='float64'), np.nan)
+        valid = ~np.isnan(x)
+        count = valid.sum(axis=0).astype('float64')
+
+        if not count.any():
+            return self
+
+        mean = np.divide(np.where(valid, x, 0.).sum(axis=0), count, out=np.zeros_like(count), where=count > 0)
+        m2 = np.where(valid, (x - mean) ** 2, 0.).sum(axis=0)
+
+        return self._merge(count, mean, m2)
+
+    # ......................... #
+
+    def merge(self, other: 'StreamingScaler') -> 'StreamingScaler':
+
+        # e.g. scalers fitted on partitions in separate processes
+
+        if other.features != self.features:
+            raise ValueError(f'cannot merge scalers over different features: {other.features}')
+
+        return self._merge(other.count_, other.mean_, other.m2_)
+
+    # ......................... #
+
+    def fit(self, df: VaexDataFrame, chunk_size: int = 250000) -> 'StreamingScaler':
+
+        # all features in one chunked pass over the frame
+
+        for _, _, chunks in df.evaluate_iterator(self.features, chunk_size=chunk_size, array_type='numpy'):
+            self.partial_fit(np.ma.column_stack([ np.ma.asarray(c, dtype='float64') for c in chunks ]))
+
+        return self
+
+    # ......................... #
+
+    def transform(self, df: VaexDataFrame) -> VaexDataFrame:
+
+        # virtual (x - mean) / std columns cast to `dtype`
+
+        df = df.copy()
+
+        for f, mean, scale in zip(self.features, self.mean_, self.scale_):
+            df[f] = ((df[f] - float(mean)) / float(scale)).astype(self.dtype)
+
+        return df
+
+    # ......................... #
+
+    def to_dict(self) -> Dict[str, Any]:
+        return dict(
+            features=self.features,
+            dtype=self.dtype,
+            count=self.count_.tolist(),
+            mean=self.mean_.tolist(),
+            m2=self.m2_.tolist()
+        )
+
+    # ......................... #
+
+    @classmethod
+    def from_dict(cls, state: Dict[str, Any]) -> 'StreamingScaler':
+
+        scaler = cls(state['features'], state['dtype'])
+        scaler.count_ = np.asarray(state['count'], dtype='float64')
+        scaler.mean_ = np.asarray(state['mean'], dtype='float64')
+        scaler.m2_ = np.asarray(state['m2'], dtype='float64')
+
+        return scaler
+
+    # ......................... #
+
+    def save(self, path: str) -> None:
+
+        with open(path, 'w') as f:
+            json.dump(self.to_dict(), f)
+
+    # ......................... #
+
+    @classmethod
+    def load(cls, path: str) -> 'StreamingScaler':
+
+        with open(path, 'r') as f:
+            return cls.from_dict(json.load(f))
+
+# ------------------------- #
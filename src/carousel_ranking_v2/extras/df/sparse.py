@@ -0,0 +1,221 @@
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.compute as pc
+import scipy.sparse as sp
+from typing import Any, Dict, List, Tuple
+
+from ..utils.typing import *
+from .vaex import _group_codes
+
+# ------------------------- #
+
+class SparseFrame:
+
+    """CSR matrix with its column vocabulary and optional row keys"""
+
+    def __init__(
+
+            self,
+            matrix: sp.spmatrix,
+            columns: List[str],
+            index: np.ndarray = None
+
+        ) -> None:
+
+        self.matrix = sp.csr_matrix(matrix)
+        self.columns = list(columns)
+        self.index = index
+
+        if self.matrix.shape[1] != len(self.columns):
+            raise ValueError(f'{self.matrix.shape=} does not match {len(self.columns)} columns')
+
+        if index is not None and len(index) != self.matrix.shape[0]:
+            raise ValueError(f'{self.matrix.shape=} does not match {len(index)} index keys')
+
+    # ......................... #
+
+    @property
+    def shape(self) -> Tuple[int, int]:
+        return self.matrix.shape
+
+    # ......................... #
+
+    @property
+    def nbytes(self) -> int:
+        m = self.matrix
+        return m.data.nbytes + m.indices.nbytes + m.indptr.nbytes
+
+    # ......................... #
+
+    def __len__(self) -> int:
+        return self.matrix.shape[0]
+
+    # ......................... #
+
+    def __repr__(self) -> str:
+        return f'SparseFrame({self.shape[0]} x {self.shape[1]}, nnz={self.matrix.nnz})'
+
+    # ......................... #
+
+    def sum_by(self, keys: Any = None) -> 'SparseFrame':
+
+        # rows sharing a key are summed through a (keys x rows) indicator
+        # product, keys come out sorted and become the index
+
+        keys = self.index if keys is None else keys
+
+        if keys is None:
+            raise ValueError('sum_by needs keys or an index')
+
+        codes, uniques = _group_codes(keys if isinstance(keys, (pa.Array, pa.ChunkedArray)) else pa.array(keys))
+        n = len(codes)
+
+        indicator = sp.csr_matrix(
+            (np.ones(n, dtype=self.matrix.dtype), (codes, np.arange(n))),
+            shape=(len(uniques), n)
+        )
+
+        return SparseFrame(indicator @ self.matrix, self.columns, uniques.to_numpy(zero_copy_only=False))
+
+    # ......................... #
+
+    def clip(self, lower: float, upper: float) -> 'SparseFrame':
+
+        # only stored values change, zeros must stay zeros
+
+        if not lower <= 0 <= upper:
+            raise ValueError(f'clip({lower}, {upper}) would fill implicit zeros')
+
+        m = self.matrix.copy()
+        m.data = np.clip(m.data, lower, upper)
+        m.eliminate_zeros()
+
+        return SparseFrame(m, self.columns, self.index)
+
+    # ......................... #
+
+    def drop_empty(self) -> 'SparseFrame':
+
+        # rows without any nonzero value
+
+        m = self.matrix.copy()
+        m.eliminate_zeros()
+        keep = np.flatnonzero(m.getnnz(axis=1))
+
+        return SparseFrame(m[keep], self.columns, None if self.index is None else self.index[keep])
+
+    # ......................... #
+
+    def to_pandas(self, dense: bool = True) -> PandasDataFrame:
+
+        if dense:
+            return pd.DataFrame(self.matrix.toarray(), columns=self.columns, index=self.index)
+
+        return pd.DataFrame.sparse.from_spmatrix(self.matrix, columns=self.columns, index=self.index)
+
+# ------------------------- #
+
+class SparseEncoder:
+
+    """Sorted per-column vocabularies, rows are encoded straight into CSR
+    blocks; with `sep` every value is split into several tokens (multi-hot)"""
+
+    def __init__(
+
+            self,
+            features: List[str],
+            sep: str = None
+
+        ) -> None:
+
+        self.features = list(features)
+        self.sep = sep
+        self.vocabulary_: Dict[str, pa.Array] = dict()
+
+    # ......................... #
+
+    @property
+    def columns(self) -> List[str]:
+        return [ f'{col}_{v}' for col in self.features for v in self.vocabulary_[col].to_pylist() ]
+
+    # ......................... #
+
+    def _tokens(self, df: VaexDataFrame, col: str) -> Tuple[np.ndarray, pa.Array]:
+
+        # (row, token) pairs of the non-missing values
+
+        values = df.evaluate(col, array_type='arrow')
+
+        if isinstance(values, pa.ChunkedArray):
+            values = values.combine_chunks()
+
+        if self.sep is None:
+            rows, tokens = np.arange(len(values)), values
+
+        else:
+            lists = pc.split_pattern(values.cast(pa.string()), self.sep)
+            rows = pc.list_parent_indices(lists).to_numpy()
+            tokens = pc.utf8_trim_whitespace(pc.list_flatten(lists))
+
+        valid = tokens.is_valid().to_numpy(zero_copy_only=False)
+
+        return rows[valid], tokens.filter(pa.array(valid))
+
+    # ......................... #
+
+    def fit(self, df: VaexDataFrame) -> 'SparseEncoder':
+
+        for col in self.features:
+            _, tokens = self._tokens(df, col)
+            uniques = pc.unique(tokens)
+            self.vocabulary_[col] = uniques.take(pc.array_sort_indices(uniques))
+
+        return self
+
+    # ......................... #
+
+    def transform(
+
+            self,
+            df: VaexDataFrame,
+            key: str = None,
+            values: str = None
+
+        ) -> SparseFrame:
+
+        # unseen values are left out, `values` (an expression) replaces the
+        # ones, `key` is kept as the row index
+
+        n = len(df)
+        weights = None
+
+        if values is not None:
+            weights = np.ma.filled(df.evaluate(values, array_type='numpy').astype('float64'), 0.)
+
+        rows, cols, data, offset = list(), list(), list(), 0
+
+        for col in self.features:
+
+            vocabulary = self.vocabulary_[col]
+            r, tokens = self._tokens(df, col)
+            idx = pc.index_in(tokens, value_set=vocabulary)
+            seen = idx.is_valid().to_numpy(zero_copy_only=False)
+
+            r = r[seen]
+            rows.append(r)
+            cols.append(idx.filter(pa.array(seen)).to_numpy().astype('int64') + offset)
+            data.append(np.ones(len(r)) if weights is None else weights[r])
+            offset += len(vocabulary)
+
+        matrix = sp.csr_matrix(
+            (np.concatenate(data), (np.concatenate(rows), np.concatenate(cols))),
+            shape=(n, offset)
+        )
+        matrix.sum_duplicates()
+
+        index = None if key is None else df.evaluate(key, array_type='numpy')
+
+        return SparseFrame(matrix, self.columns, index)
+
+# ------------------------- #
@@ -1,11 +1,15 @@
 import re
 import vaex
 import numpy as np
-import datetime
+import pyarrow as pa
+import pyarrow.compute as pc
 import logging
-from vaex.ml import OneHotEncoder, LabelEncoder, StandardScaler, MultiHotEncoder
-from typing import Callable, List, Tuple, Any, Union
+from datetime import date, datetime as pydatetime
+from vaex.ml import OneHotEncoder, LabelEncoder, MultiHotEncoder
+from typing import Callable, Dict, List, Optional, Tuple, Any, Union
 from ..utils.typing import *
+from .expressions import compile_expression, split_assignment
+from .scaler import StreamingScaler
 
 log = logging.getLogger(__name__)
 
@@ -74,46 +78,188 @@ def force_int(
 
 # ------------------------- #
 
+def _strptime_isolate(values: pa.Array, strformat: str) -> pa.Array:
+
+    # halves failing the kernel are split until the invalid values are
+    # isolated, only those single values go through python
+
+    try:
+        return pc.strptime(values, format=strformat, unit='s')
+
+    except pa.ArrowInvalid:
+
+        if len(values) > 1:
+            half = len(values) // 2
+            return pa.concat_arrays([
+                _strptime_isolate(values[:half], strformat),
+                _strptime_isolate(values[half:], strformat)
+            ])
+
+        try:
+            parsed = np.datetime64(pydatetime.strptime(values[0].as_py(), strformat), 's')
+        except (TypeError, ValueError):
+            parsed = None
+
+        return pa.array([parsed], type=pa.timestamp('s'))
+
+# ------------------------- #
+
+def _strptime(values: pa.Array, strformat: str) -> pa.Array:
+
+    # invalid dates (e.g. 2022-02-30) become null
+
+    try:
+        return pc.strptime(values, format=strformat, unit='s', error_is_null=True)
+
+    except TypeError:
+
+        # pyarrow < 8 has no error_is_null
+        return _strptime_isolate(values, strformat)
+
+# ------------------------- #
+
+def _parse_dates(
+    
+        values: Union[pa.Array, pa.ChunkedArray, np.ndarray],
+        dtformat: str,
+        strformat: str,
+        fillnaval: np.datetime64
+
+    ) -> np.ndarray:
+
+    # regex extraction and strptime run as arrow kernels, values that are
+    # missing, do not match `dtformat` or are not valid dates get `fillnaval`
+    # (NaT without one)
+
+    if isinstance(values, pa.ChunkedArray):
+        values = values.combine_chunks()
+
+    if not isinstance(values, pa.Array):
+        values = pa.array(values, type=pa.string())
+
+    if values.type != pa.string():
+        values = values.cast(pa.string())
+
+    # unmatched values are null in the struct, flatten carries that to the field
+    found = pc.extract_regex(values, f'(?P<date>{dtformat})').flatten()[0]
+    parsed = _strptime(found, strformat)
+
+    days = parsed.cast(pa.date32())
+
+    if fillnaval is not None:
+        days = pc.fill_null(days, pa.scalar(fillnaval.astype(object), pa.date32()))
+
+    return days.to_numpy(zero_copy_only=False).astype('datetime64[D]')
+
+# ------------------------- #
+
 def datetime(
     
         data: VaexDataFrame, 
         cols: List[str],
-        fillnaval: datetime.date,
+        fillnaval: date,
         dtformat: str = r'\d{4}-\d{2}-\d{2}',
+        strformat: str = '%Y-%m-%d'
     
     ) -> VaexDataFrame:
 
-    df = data.copy()
+    # `dtformat` locates the date inside the value, `strformat` parses it;
+    # results are datetime64[D]
 
-    df = fillna(df, cols=cols, value=fillnaval)
+    df = data.copy()
+    fill = np.datetime64(fillnaval, 'D')
 
     for col in cols:
-        df[col] = (df[col]
-                    .apply(lambda x: re.search(dtformat, x).string)
-                    .apply(np.datetime64)
-                )
-                
-    df.materialize(cols, inplace=True)
+        values = df.evaluate(col, filtered=False, array_type='arrow')
+        df[col] = _parse_dates(values, dtformat, strformat, fill)
 
     return df
 
 # ------------------------- #
 
+def _compact_days(
+    
+        days: np.ndarray, 
+        missing: np.ndarray,
+        dtype: str = 'int32'
+    
+    ) -> np.ndarray:
+
+    # fixed `dtype` so every chunk and run has the same schema, values out
+    # of its range raise instead of wrapping; missing dates become masked
+
+    valid = days[~missing]
+    info = np.iinfo(dtype)
+
+    if len(valid) and (valid.min() < info.min or valid.max() > info.max):
+        raise OverflowError(f'day differences [{valid.min()}, {valid.max()}] do not fit {dtype}')
+
+    days = np.where(missing, 0, days).astype(dtype)
+
+    return np.ma.masked_array(days, mask=missing) if missing.any() else days
+
+# ------------------------- #
+
 def days_difference(
     
         data: VaexDataFrame, 
         cols: List[str],
         basecol: str,
-        dropbase: bool = True
+        dropbase: bool = True,
+        dtype: str = 'int32'
     
     ) -> VaexDataFrame:
 
+    # whole days from each column to `basecol` (floored like timedelta.days)
+
     df = data.copy()
+    base = df.evaluate(basecol, filtered=False, array_type='numpy')
 
     for col in cols:
-        df[col] = (df[basecol] - df[col]).apply(lambda x: x.days)
+        values = df.evaluate(col, filtered=False, array_type='numpy')
+        diff = base - values
+        missing = np.isnat(diff)
+        days = np.where(missing, np.timedelta64(0), diff) // np.timedelta64(1, 'D')
+        df[col] = _compact_days(days, missing, dtype)
+
+    if dropbase:
+        df = drop(df, [basecol])
+
+    return df
+
+# ------------------------- #
+
+def days_from_strings(
     
-    df.materialize(cols, inplace=True)
+        data: VaexDataFrame, 
+        cols: List[str],
+        basecol: str,
+        fillnaval: date = None,
+        dropbase: bool = True,
+        dtformat: str = r'\d{4}-\d{2}-\d{2}',
+        strformat: str = '%Y-%m-%d',
+        dtype: str = 'int32'
+    
+    ) -> VaexDataFrame:
+
+    # days_difference straight from raw ISO strings, no datetime column is
+    # kept in between; unparsable values get `fillnaval` or stay missing
+
+    df = data.copy()
+    fill = None if fillnaval is None else np.datetime64(fillnaval, 'D')
+
+    def parse(col: str) -> np.ndarray:
+        values = df.evaluate(col, filtered=False, array_type='arrow')
+        return _parse_dates(values, dtformat, strformat, fill)
+
+    base = parse(basecol)
+
+    for col in cols:
+        values = parse(col)
+        missing = np.isnat(base) | np.isnat(values)
+        days = (np.where(missing, np.datetime64(0, 'D'), base) - 
+                np.where(missing, np.datetime64(0, 'D'), values)).astype('int64')
+        df[col] = _compact_days(days, missing, dtype)
 
     if dropbase:
         df = drop(df, [basecol])
@@ -133,15 +279,44 @@ def apply_function(
 
 # ------------------------- #
 
+def _sparse_encode(
+
+        data: VaexDataFrame,
+        cols: List[str],
+        enc: 'SparseEncoder',
+        sep: str,
+        key: str,
+        values: str
+
+    ) -> Tuple['SparseFrame', 'SparseEncoder']:
+
+    from .sparse import SparseEncoder
+
+    if enc is None:
+        enc = SparseEncoder(features=cols, sep=sep).fit(data)
+
+    return enc.transform(data, key=key, values=values), enc
+
+# ------------------------- #
+
 def onehotenc(
     
         data: VaexDataFrame, 
         cols: List[str],
         enc: OneHotEncoder = None,
         materialize: bool = False,
-        dropcols: bool = True
+        dropcols: bool = True,
+        sparse: bool = False,
+        key: str = None,
+        values: str = None
     
-    ) -> Tuple[VaexDataFrame, OneHotEncoder]:
+    ) -> Tuple[Union[VaexDataFrame, 'SparseFrame'], OneHotEncoder]:
+
+    # sparse=True returns a SparseFrame (CSR + vocabulary, `key` as index,
+    # `values` instead of ones) and a SparseEncoder, nothing dense is built
+
+    if sparse:
+        return _sparse_encode(data, cols, enc, None, key, values)
 
     df = data.copy()
 
@@ -167,9 +342,19 @@ def multihotenc(
         cols: List[str],
         enc: MultiHotEncoder = None,
         materialize: bool = False,
-        dropcols: bool = True
+        dropcols: bool = True,
+        sparse: bool = False,
+        sep: str = ',',
+        key: str = None,
+        values: str = None
+
+    ) -> Tuple[Union[VaexDataFrame, 'SparseFrame'], MultiHotEncoder]:
 
-    ) -> Tuple[VaexDataFrame, MultiHotEncoder]:
+    # sparse=True splits values on `sep` and sets one entry per token
+    # (e.g. channels), see onehotenc
+
+    if sparse:
+        return _sparse_encode(data, cols, enc, sep, key, values)
 
     df = data.copy()
 
@@ -194,24 +379,29 @@ def scale(
         data: VaexDataFrame, 
         cols: List[str],
         exclude: List[str] = list(),
-        scaler: StandardScaler = None # TODO: replace with custom
+        scaler: StreamingScaler = None,
+        dtype: str = 'float64',
+        chunk_size: int = 250000
     
-    ) -> Tuple[VaexDataFrame, StandardScaler]:
+    ) -> Tuple[VaexDataFrame, StreamingScaler]:
 
-    df = data.copy()
+    # a new scaler is fitted on all selected columns in one chunked pass,
+    # a given (e.g. loaded) one keeps its own features and dtype
 
-    sc = [ x for x in df.get_column_names() 
-           if not re.search(r'({})'.format('|'.join(exclude)), x)
-           or re.search(r'({})'.format('|'.join(cols)), x) ]
-    
-    sc = sc or df.get_columns_names()
+    df = data.copy()
 
     if scaler is None:
-        scaler = StandardScaler(features=sc, prefix='')
-        scaler.fit(df)
+
+        keep, skip = re.compile(f'({"|".join(cols)})'), re.compile(f'({"|".join(exclude)})')
+        sc = [ x for x in df.get_column_names() 
+               if not skip.search(x) or keep.search(x) ]
+        
+        sc = sc or df.get_column_names()
+
+        scaler = StreamingScaler(features=sc, dtype=dtype).fit(df, chunk_size)
     
     df = scaler.transform(df)
-    df.materialize(sc, inplace=True)
+    df.materialize(scaler.features, inplace=True)
 
     return df, scaler
 
@@ -220,14 +410,45 @@ def scale(
 def filt(
     
         data: VaexDataFrame, 
-        filt: str = None
+        filt: str = None,
+        **params: Any
     
     ) -> VaexDataFrame:
 
+    # `filt` is compiled once per text, names are columns or `params`
+    # (e.g. filt(df, 'offer_id in offers', offers=[...]))
+
     df = data.copy()
 
     if not filt is None:
-        df = df.filter(eval(filt))
+        df = df.filter(compile_expression(filt).bind(df, **params))
+
+    return df
+
+# ------------------------- #
+
+def expressions(
+    
+        data: VaexDataFrame, 
+        exprs: List[str],
+        materialize: bool = False
+    
+    ) -> VaexDataFrame:
+
+    # `name = expression` entries become virtual columns,
+    # bare expressions are named expr_<i>
+
+    df = data.copy()
+    names = list()
+
+    for i, text in enumerate(exprs):
+        name, expr = split_assignment(text)
+        name = name or f'expr_{i}'
+        df[name] = compile_expression(expr).bind(df)
+        names.append(name)
+
+    if materialize:
+        df.materialize(names, inplace=True)
 
     return df
 
@@ -285,7 +506,7 @@ def groupby(
 
     df = data.copy()
 
-    agg = dict( (name, vaex_agg_func[f](col, selection=query)) if query 
+    agg = dict( (name, vaex_agg_func[f](col, selection=compile_expression(query).bind(df))) if query 
                 else (name, vaex_agg_func[f](col))
                 for query, col, name, f in groups )
     cols = [n for _, _, n, _ in groups]
@@ -296,4 +517,102 @@ def groupby(
 
     return df
 
-# ------------------------- #
\ No newline at end of file
+# ------------------------- #
+
+def _group_codes(values: Union[pa.Array, pa.ChunkedArray]) -> Tuple[np.ndarray, pa.Array]:
+
+    # dense integer codes following the sorted order of the keys,
+    # missing keys form their own (last) group like in vaex groupby
+
+    if isinstance(values, pa.ChunkedArray):
+        values = values.combine_chunks()
+
+    encoded = values.dictionary_encode(null_encoding='encode')
+    # sort indices are uint64, codes must stay int64 for bincount
+    order = pc.array_sort_indices(encoded.dictionary).to_numpy()
+    rank = np.empty(len(order), dtype=np.int64)
+    rank[order] = np.arange(len(order))
+
+    codes = rank[encoded.indices.to_numpy(zero_copy_only=False)]
+
+    return codes, encoded.dictionary.take(pa.array(order))
+
+# ------------------------- #
+
+def binned_sums(
+    
+        data: VaexDataFrame,
+        by: str,
+        bin_col: str,
+        value: str,
+        period: int,
+        conditions: Dict[str, Optional[str]],
+        moments: Dict[str, str] = dict()
+    
+    ) -> VaexDataFrame:
+
+    # one `{prefix}_{bin}` column per condition and bin 1..period-1 holding the
+    # sum of `value`, plus `{prefix}_std` / `{prefix}_mean` of every `moments`
+    # column; keys are encoded once and every condition is a single bincount
+    # into a dense (conditions, bins, keys) array, independent of `period`
+
+    df = data.copy()
+
+    codes, keys = _group_codes(df.evaluate(by, array_type='arrow'))
+    n_keys, n_bins = len(keys), period - 1
+
+    bins = np.ma.filled(df.evaluate(bin_col, array_type='numpy').astype('float64'), np.nan)
+    weights = np.ma.filled(df.evaluate(value, array_type='numpy').astype('float64'), 0.)
+
+    in_range = (bins >= 1) & (bins < period) & (bins == np.floor(bins))
+    flat = np.where(in_range, bins - 1, 0).astype('int64') * n_keys + codes
+
+    dense = np.zeros((len(conditions), n_bins, n_keys))
+
+    for i, condition in enumerate(conditions.values()):
+
+        mask = in_range
+
+        if condition is not None:
+            selected = df.evaluate(compile_expression(condition).bind(df), array_type='numpy')
+            mask = mask & np.ma.filled(selected, False)
+
+        dense[i] = np.bincount(
+            flat[mask], 
+            weights=weights[mask], 
+            minlength=n_bins * n_keys
+        ).reshape(n_bins, n_keys)
+
+    columns = { by : keys }
+
+    for prefix, col in moments.items():
+
+        x = np.ma.filled(df.evaluate(col, array_type='numpy').astype('float64'), np.nan)
+        valid = ~np.isnan(x)
+        x = np.where(valid, x, 0.)
+
+        count = np.bincount(codes, weights=valid, minlength=n_keys)
+        mean = np.bincount(codes, weights=x, minlength=n_keys) / np.maximum(count, 1)
+        var = np.bincount(codes, weights=x * x, minlength=n_keys) / np.maximum(count, 1) - mean ** 2
+
+        columns[f'{prefix}_std'] = np.sqrt(np.clip(var, 0., None))
+        columns[f'{prefix}_mean'] = mean
+
+    for i, prefix in enumerate(conditions):
+        for b in range(n_bins):
+            columns[f'{prefix}_{b + 1}'] = dense[i, b]
+
+    return vaex.from_dict(columns)
+
+# ------------------------- #
+
+def plan(data: VaexDataFrame) -> 'Plan':
+
+    # lazy counterpart of the column helpers above, e.g.
+    # vx.plan(df).fillna(cols, -1).datetime(dates, unk).days_difference(dates, 'refresh_date').collect()
+
+    from .plan import Plan
+
+    return Plan(data)
+
+# ------------------------- #
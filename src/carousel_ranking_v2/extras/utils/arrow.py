@@ -0,0 +1,129 @@
+import decimal
+import datetime
+import numpy as np
+import pyarrow as pa
+import pyarrow.compute as pc
+from typing import Any, Dict, List, Optional, Sequence
+
+from .categories import CATEGORY
+
+# no io / typing imports, shared with datasets.sqlalchemy
+
+_float_types = [np.float32, np.float64, float]
+
+_arrow_types = {
+
+    str : pa.string(),
+    int : pa.int64(),
+    float : pa.float64(),
+    bool : pa.bool_(),
+    np.int32 : pa.int32(),
+    np.int64 : pa.int64(),
+    np.float32 : pa.float32(),
+    np.float64 : pa.float64()
+
+}
+
+# dtypes as spelled in the catalog `columns`
+_dtype_names = {
+
+    'str' : str,
+    'int' : int,
+    'float' : float,
+    'bool' : bool,
+    'np.int32' : np.int32,
+    'np.int64' : np.int64,
+    'np.float32' : np.float32,
+    'np.float64' : np.float64
+
+}
+
+# python types of sqlalchemy column types
+_python_types = {
+
+    str : pa.string(),
+    int : pa.int64(),
+    float : pa.float64(),
+    bool : pa.bool_(),
+    decimal.Decimal : pa.float64(),
+    datetime.datetime : pa.timestamp('us'),
+    datetime.date : pa.date32()
+
+}
+
+# ------------------------- #
+
+def sql_arrow_type(sqltype: Any) -> Optional[pa.DataType]:
+
+    try:
+        return _python_types.get(sqltype.python_type)
+
+    except (NotImplementedError, AttributeError):
+        return None
+
+# ------------------------- #
+
+def column_types(
+
+        column_names: List[str],
+        dtypes: Dict[str, Any] = dict(),
+        sql_types: Dict[str, Any] = dict()
+
+    ) -> Dict[str, Optional[pa.DataType]]:
+
+    # arrow type per column: the catalog dtype, else the sql column type,
+    # None when neither is known (resolved from the first non-null chunk)
+
+    types = dict()
+
+    for name in column_names:
+
+        if name in types:
+            continue
+
+        dtype = dtypes.get(name)
+        dtype = _dtype_names.get(dtype, dtype) if isinstance(dtype, str) else dtype
+        patype = None if dtype is None or dtype == CATEGORY else _arrow_types[dtype]
+
+        if patype is None and name in sql_types:
+            patype = sql_arrow_type(sql_types[name])
+
+        types[name] = patype
+
+    return types
+
+# ------------------------- #
+
+def to_arrow(
+
+        values: Sequence[Any],
+        dtype: Any = None,
+        patype: pa.DataType = None
+
+    ) -> pa.Array:
+
+    # `values` as `patype`, all-null values of an unknown type stay null
+    # typed so the spool casts them to the type resolved for the column
+
+    if patype is None:
+        return pa.array(values)
+
+    try:
+        arr = pa.array(values, type=patype)
+
+    except (pa.ArrowInvalid, pa.ArrowTypeError):
+
+        # e.g. timestamps forced to str or numerics returned as Decimal
+
+        if patype == pa.string():
+            arr = pa.array([ None if v is None else str(v) for v in values ], type=patype)
+
+        else:
+            arr = pa.array(values).cast(patype)
+
+    if dtype in _float_types:
+        arr = pc.fill_null(arr, pa.scalar(0., type=patype))
+
+    return arr
+
+# ------------------------- #
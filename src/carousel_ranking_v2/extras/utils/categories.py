@@ -0,0 +1,144 @@
+import os
+import json
+import logging
+import tempfile
+import threading
+import pyarrow as pa
+import pyarrow.compute as pc
+from typing import Any, Dict, List, Sequence, Union
+
+log = logging.getLogger(__name__)
+
+CATEGORY = 'category'
+
+# ------------------------- #
+
+class CategoryDictionary:
+
+    """Persisted per-column dictionaries, codes of known values never change
+    and new values are appended in first-seen order"""
+
+    _shared: Dict[str, 'CategoryDictionary'] = dict()
+    _shared_lock = threading.Lock()
+
+    def __init__(self, path: str) -> None:
+
+        self.path = path
+        self._lock = threading.Lock()
+        self._vocab: Dict[str, List[Any]] = self._read()
+
+    # ......................... #
+
+    @classmethod
+    def shared(cls, path: str) -> 'CategoryDictionary':
+
+        # one instance (vocab and lock) per file within the process,
+        # extraction threads and datasets must not keep diverging copies
+
+        key = os.path.abspath(path)
+
+        with cls._shared_lock:
+            if key not in cls._shared:
+                cls._shared[key] = cls(path)
+
+            return cls._shared[key]
+
+    # ......................... #
+
+    def _read(self) -> Dict[str, List[Any]]:
+
+        if not os.path.exists(self.path):
+            return dict()
+
+        with open(self.path, 'r') as f:
+            return json.load(f)
+
+    # ......................... #
+
+    def values(self, column: str, type: pa.DataType = None) -> pa.Array:
+
+        # current vocabulary of `column`, position = code
+
+        with self._lock:
+            return pa.array(list(self._vocab.get(column, list())), type=type)
+
+    # ......................... #
+
+    def encode(
+
+            self,
+            column: str,
+            values: Union[pa.Array, pa.ChunkedArray, Sequence[Any]]
+
+        ) -> pa.DictionaryArray:
+
+        if isinstance(values, pa.ChunkedArray):
+            values = values.combine_chunks()
+
+        if isinstance(values, pa.DictionaryArray):
+            values = values.dictionary_decode()
+
+        if not isinstance(values, pa.Array):
+            values = pa.array(values)
+
+        if values.type == pa.null():
+            values = values.cast(pa.string())
+
+        with self._lock:
+
+            vocab = self._vocab.setdefault(column, list())
+            known = set(vocab)
+            new = [ x for x in pc.unique(values).to_pylist()
+                    if x is not None and x not in known ]
+
+            if new:
+                vocab.extend(new)
+                log.info(f'{len(new)} new categories for {column}')
+
+            dictionary = pa.array(vocab, type=values.type)
+
+        indices = pc.index_in(values, value_set=dictionary).cast(pa.int32())
+
+        return pa.DictionaryArray.from_arrays(indices, dictionary)
+
+    # ......................... #
+
+    def save(self) -> None:
+
+        # merged with what is on disk (another process may have appended),
+        # known codes keep their position and unknown values go last
+
+        _dir = os.path.dirname(os.path.abspath(self.path))
+        os.makedirs(_dir, exist_ok=True)
+
+        with self._lock:
+
+            for column, stored in self._read().items():
+
+                vocab = self._vocab.get(column, list())
+
+                if vocab[:len(stored)] == stored:
+                    continue
+
+                known = set(stored)
+                extra = [ x for x in vocab if x not in known ]
+
+                if stored[:len(vocab)] != vocab:
+                    log.warning(f'{column}: {len(extra)} categories re-coded after a concurrent write')
+
+                self._vocab[column] = stored + extra
+
+            fd, tmp = tempfile.mkstemp(dir=_dir, prefix='.categories-', suffix='.tmp')
+
+            try:
+                with os.fdopen(fd, 'w') as f:
+                    json.dump(self._vocab, f)
+
+                os.replace(tmp, self.path)
+
+            except BaseException:
+                if os.path.exists(tmp):
+                    os.remove(tmp)
+                raise
+
+# ------------------------- #
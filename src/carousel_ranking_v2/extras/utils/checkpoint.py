@@ -0,0 +1,364 @@
+import os
+import json
+import time
+import hashlib
+import logging
+import datetime
+import pyarrow as pa
+import sqlalchemy as db
+from typing import Any, Callable, Dict, Iterator, List, Optional, Sequence, Tuple
+
+from . import io
+from .categories import CategoryDictionary, CATEGORY
+
+log = logging.getLogger(__name__)
+
+_CHECKPOINTS = 'data/02_intermediate/.checkpoints'
+_MANIFEST = 'manifest.json'
+
+# ------------------------- #
+
+def query_fingerprint(query: Any) -> str:
+
+    compiled = query.compile()
+    params = sorted((k, str(v)) for k, v in compiled.params.items())
+
+    return hashlib.sha1(f'{compiled}|{params}'.encode()).hexdigest()
+
+# ------------------------- #
+
+def _dump_key(value: Any) -> Dict[str, Any]:
+
+    if isinstance(value, datetime.datetime):
+        return dict(datetime=value.isoformat())
+
+    if isinstance(value, datetime.date):
+        return dict(date=value.isoformat())
+
+    return dict(value=value)
+
+# ------------------------- #
+
+def _load_key(value: Dict[str, Any]) -> Any:
+
+    if 'datetime' in value:
+        return datetime.datetime.fromisoformat(value['datetime'])
+
+    if 'date' in value:
+        return datetime.date.fromisoformat(value['date'])
+
+    return value['value']
+
+# ------------------------- #
+
+def is_retryable(exc: Exception) -> bool:
+
+    # dropped connections and server-side cancellations, not query errors
+
+    if isinstance(exc, db.exc.DBAPIError) and exc.connection_invalidated:
+        return True
+
+    return isinstance(exc, (db.exc.OperationalError, db.exc.InterfaceError, ConnectionError))
+
+# ------------------------- #
+
+class ChunkManifest:
+
+    """Committed chunk files of one extraction query and the keyset
+    watermark up to which rows are complete"""
+
+    def __init__(self, root: str, key: str) -> None:
+
+        self.path = os.path.join(root, key)
+        self._manifest = os.path.join(self.path, _MANIFEST)
+
+        io.safe_dir(self.path)
+
+        self.state = dict(key=key, chunks=list(), rows=0, watermark=None, done=False)
+
+        if os.path.exists(self._manifest):
+            with open(self._manifest, 'r') as f:
+                self.state = json.load(f)
+
+    # ......................... #
+
+    @property
+    def watermark(self) -> Any:
+
+        mark = self.state['watermark']
+
+        return None if mark is None else _load_key(mark)
+
+    # ......................... #
+
+    @property
+    def files(self) -> List[str]:
+        return [ os.path.join(self.path, c['file']) for c in self.state['chunks'] ]
+
+    # ......................... #
+
+    def _flush(self) -> None:
+
+        tmp = self._manifest + '.tmp'
+
+        with open(tmp, 'w') as f:
+            json.dump(self.state, f)
+
+        os.replace(tmp, self._manifest)
+
+    # ......................... #
+
+    def commit(
+
+            self,
+            chunk: Any,
+            watermark: Any,
+            row_group_size: int = None,
+            constants: Dict[str, Any] = dict(),
+            categories: List[str] = list(),
+            dictionary: CategoryDictionary = None,
+            types: Dict[str, pa.DataType] = dict()
+
+        ) -> None:
+
+        # the chunk file and the dictionary are durable before the
+        # manifest records them, a crash in between only loses this chunk
+
+        name = f'chunk-{len(self.state["chunks"]):05d}.parquet'
+        tmp = os.path.join(self.path, f'.{name}.tmp')
+
+        spool = io.ParquetSpool(
+            tmp,
+            row_group_size=row_group_size,
+            constants=constants,
+            categories=categories,
+            dictionary=dictionary,
+            types=types
+        )
+        spool.write(chunk)
+        spool.close()
+        os.replace(tmp, os.path.join(self.path, name))
+
+        if categories:
+            dictionary.save()
+
+        self.state['chunks'].append(dict(file=name, rows=spool.rows))
+        self.state['rows'] += spool.rows
+        self.state['watermark'] = _dump_key(watermark)
+        self._flush()
+
+    # ......................... #
+
+    def finish(self) -> None:
+
+        self.state['done'] = True
+        self._flush()
+
+    # ......................... #
+
+    def merge(self, spool: io.ParquetSpool) -> None:
+
+        # committed chunks become row groups of the (possibly shared) spool,
+        # they are already encoded and typed
+
+        for file in self.files:
+            spool.concat(file)
+
+    # ......................... #
+
+    def remove(self) -> None:
+        io.safe_rmtree(self.path)
+
+# ------------------------- #
+
+def expire_manifests(root: str, ttl: float, keep: str = None) -> List[str]:
+
+    # checkpoint keys embed the hour-floored window, manifests without a
+    # commit for `ttl` seconds belong to a past key and can never resume
+
+    expired = list()
+
+    if not os.path.isdir(root):
+        return expired
+
+    now = time.time()
+
+    for key in os.listdir(root):
+
+        path = os.path.join(root, key)
+        manifest = os.path.join(path, _MANIFEST)
+
+        if key == keep or not os.path.isdir(path):
+            continue
+
+        try:
+            idle = now - os.path.getmtime(manifest if os.path.exists(manifest) else path)
+
+            if idle > ttl:
+                io.safe_rmtree(path)
+                expired.append(key)
+
+        # removed concurrently by another partition
+        except OSError:
+            continue
+
+    if expired:
+        log.info(f'expired {len(expired)} stale checkpoint manifests')
+
+    return expired
+
+# ------------------------- #
+
+def _keyset_chunks(
+
+        parts: Iterator[Sequence[Tuple]],
+        key_index: int
+
+    ) -> Iterator[Tuple[List[Tuple], Any]]:
+
+    # rows arrive ordered by the key, the trailing rows sharing the last key
+    # value are held back so every committed chunk ends on a complete key
+    # and `key > watermark` resumes without gaps or duplicates
+
+    carry = list()
+
+    for part in parts:
+
+        rows = carry + list(part)
+        last = rows[-1][key_index]
+        cut = len(rows)
+
+        while cut > 0 and rows[cut - 1][key_index] == last:
+            cut -= 1
+
+        if cut == 0:
+            carry = rows
+            continue
+
+        carry = rows[cut:]
+
+        yield rows[:cut], rows[cut - 1][key_index]
+
+    if carry:
+        yield carry, carry[-1][key_index]
+
+# ------------------------- #
+
+def fetch_resumable(
+
+        checkout: Callable[[], db.engine.base.Connection],
+        query: Any,
+        key_column: db.Column,
+        column_names: List[str],
+        chunksize: int,
+        dtypes: Dict[str, str] = dict(),
+        droplist: List[str] = list(),
+        limit: int = None,
+        prefix: str = '',
+        builder: str = 'pandas',
+        row_group_size: int = None,
+        constants: Dict[str, Any] = dict(),
+        dictionary: CategoryDictionary = None,
+        retries: int = 3,
+        backoff: float = 5.,
+        root: str = _CHECKPOINTS,
+        ttl: float = 3600,
+        types: Dict[str, pa.DataType] = dict(),
+        spool: io.ParquetSpool = None
+
+    ) -> Optional[str]:
+
+    # keyset-paginated extraction on `key_column`, every chunk is committed
+    # to a manifest keyed by the query fingerprint, a retry (or the next run
+    # of the same query) continues after the last committed key
+
+    key = query_fingerprint(query)
+    expire_manifests(root, ttl, keep=key)
+
+    manifest = ChunkManifest(root, key)
+    categories = [ c for c, d in dtypes.items() if d == CATEGORY ]
+    key_index = column_names.index(key_column.name)
+    timer = io.StageTimer('fetch', 'convert', 'write')
+    attempt = 0
+
+    if categories and dictionary is None:
+        raise ValueError(f'{categories=} declared without a category dictionary')
+
+    if manifest.state['rows']:
+        log.info(f'resuming extraction #{prefix} after {manifest.state["rows"]} rows, '
+                 f'watermark={manifest.watermark}')
+
+    while not manifest.state['done']:
+
+        resumed = query.order_by(key_column)
+
+        if manifest.watermark is not None:
+            resumed = resumed.where(key_column > manifest.watermark)
+
+        if limit is not None:
+            remaining = limit - manifest.state['rows']
+
+            if remaining <= 0:
+                break
+
+            resumed = resumed.limit(remaining)
+
+        conn = None
+
+        try:
+            conn = checkout()
+            res = conn.execution_options(stream_results=True).execute(resumed)
+            parts = io._timed_partitions(res, chunksize, timer)
+
+            for rows, watermark in _keyset_chunks(parts, key_index):
+
+                chunk = io._convert_chunk(rows, column_names, dtypes, droplist, builder, timer, types)
+                start = time.perf_counter()
+
+                manifest.commit(
+                    chunk,
+                    watermark,
+                    row_group_size=row_group_size,
+                    constants=constants,
+                    categories=categories,
+                    dictionary=dictionary,
+                    types=types
+                )
+
+                timer.add('write', time.perf_counter() - start)
+                log.info(f'committed chunk #{prefix}{len(manifest.files) - 1} '
+                         f'({manifest.state["rows"]} rows, watermark={watermark})')
+
+                # `retries` bounds consecutive failures, progress resets it
+                attempt = 0
+
+            manifest.finish()
+
+        except Exception as exc:
+
+            if not is_retryable(exc) or attempt >= retries:
+                raise
+
+            delay = backoff * 2 ** attempt
+            attempt += 1
+
+            log.warning(f'extraction #{prefix} interrupted ({exc.__class__.__name__}), '
+                        f'retry {attempt}/{retries} in {delay:.0f}s')
+            time.sleep(delay)
+
+        finally:
+            if conn is not None:
+                conn.close()
+
+    log.info(timer.report(prefix))
+
+    # a shared spool (parallel partitions) is closed by the caller
+
+    target = spool or io.new_spool(f'{prefix}spool.parquet', types=types)
+    manifest.merge(target)
+    manifest.remove()
+    expire_manifests(root, ttl, keep=key)
+
+    return target.path if spool is not None else target.close()
+
+# ------------------------- #
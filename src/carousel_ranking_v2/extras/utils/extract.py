@@ -0,0 +1,181 @@
+import os
+import logging
+import datetime
+import pyarrow as pa
+import sqlalchemy as db
+from sqlalchemy.sql.expression import func
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from . import io
+from .checkpoint import fetch_resumable
+from .categories import CategoryDictionary, CATEGORY
+from .typing import *
+
+log = logging.getLogger(__name__)
+
+# ------------------------- #
+
+def time_ranges(
+
+        start: datetime.datetime,
+        end: datetime.datetime,
+        n: int
+
+    ) -> List[Tuple[datetime.datetime, datetime.datetime]]:
+
+    step = (end - start) / n
+    bounds = [ start + step * i for i in range(n) ] + [end]
+
+    return list(zip(bounds[:-1], bounds[1:]))
+
+# ------------------------- #
+
+def split_conditions(
+
+        column: db.Column,
+        split_by: str,
+        parallelism: int,
+        start: datetime.datetime,
+        end: datetime.datetime = None
+
+    ) -> List[Any]:
+
+    # one WHERE condition per partition of the extraction window:
+    # equal time ranges on a timestamp column or md5 hash buckets
+
+    end = end or datetime.datetime.now()
+
+    if split_by == 'time':
+
+        ranges = time_ranges(start, end, parallelism)
+        conditions = [ (column >= lo) & (column < hi) for lo, hi in ranges[:-1] ]
+        conditions.append(column >= ranges[-1][0])
+
+        return conditions
+
+    if split_by == 'hash':
+
+        bucket = func.mod(func.strtol(func.left(func.md5(column), 8), 16), parallelism)
+
+        return [ bucket == i for i in range(parallelism) ]
+
+    raise ValueError(f'unknown {split_by=}, expected "time" or "hash"')
+
+# ------------------------- #
+
+def fetch_parallel(
+
+        checkout: Callable[[], db.engine.base.Connection],
+        queries: List[Any],
+        column_names: List[str],
+        chunksize: int,
+        dtypes: Dict[str, str] = dict(),
+        droplist: List[str] = list(),
+        builder: str = 'pandas',
+        workers: int = 1,
+        queue_depth: int = 0,
+        row_group_size: int = None,
+        constants: Dict[str, Any] = dict(),
+        dictionary: CategoryDictionary = None,
+        resumable: Dict[str, Any] = None,
+        types: Dict[str, pa.DataType] = dict()
+
+    ) -> VaexDataFrame:
+
+    # partition queries run on a thread pool over pooled connections and
+    # end up in one spool file in partition order, whatever the completion
+    # order: partition 0 writes into it directly, the others into child
+    # spools (same column types and dictionary) appended once all are done;
+    # with `resumable` (key_column, limit, retries, backoff, ttl) every
+    # partition is checkpointed and retried on its own
+
+    categories = [ c for c, d in dtypes.items() if d == CATEGORY ]
+    spool = io.new_spool(
+        'spool.parquet',
+        row_group_size=row_group_size,
+        constants=constants,
+        categories=categories,
+        dictionary=dictionary,
+        types=types
+    )
+    _dir = os.path.dirname(spool.path)
+    spools = [spool] + [ spool.child(os.path.join(_dir, f'{i:03d}_spool.parquet'))
+                         for i in range(1, len(queries)) ]
+
+    # ......................... #
+
+    def run(i: int, query: Any) -> Optional[str]:
+
+        if resumable is not None:
+            return fetch_resumable(
+                checkout,
+                query,
+                column_names=column_names,
+                chunksize=chunksize,
+                dtypes=dtypes,
+                droplist=droplist,
+                prefix=f'{i:03d}_',
+                builder=builder,
+                row_group_size=row_group_size,
+                constants=constants,
+                dictionary=dictionary,
+                types=types,
+                spool=spools[i],
+                **resumable
+            )
+
+        conn = checkout()
+
+        try:
+            log.info(f'partition #{i} query execution started')
+            res = conn.execution_options(stream_results=True).execute(query)
+
+            return io.write_chunks(
+                res,
+                column_names,
+                chunksize=chunksize,
+                dtypes=dtypes,
+                droplist=droplist,
+                prefix=f'{i:03d}_',
+                builder=builder,
+                workers=workers,
+                queue_depth=queue_depth,
+                row_group_size=row_group_size,
+                constants=constants,
+                dictionary=dictionary,
+                types=types,
+                spool=spools[i]
+            )
+
+        finally:
+            conn.close()
+
+    # ......................... #
+
+    try:
+        with ThreadPoolExecutor(max_workers=len(queries)) as pool:
+            futures = [ pool.submit(run, i, q) for i, q in enumerate(queries) ]
+
+            for f in futures:
+                f.result()
+
+    finally:
+
+        for part in spools[1:]:
+
+            path = part.close()
+
+            if path is not None:
+                spool.concat(path)
+                io.safe_rm(path)
+
+        path = spool.close()
+
+    if path is None:
+        log.warning('partition queries returned no rows')
+        return None
+
+    return io.open_spool(path)
+
+# ------------------------- #
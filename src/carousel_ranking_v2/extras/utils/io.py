@@ -1,29 +1,37 @@
-import re
 import os
 import gc
-import glob
 from xxlimited import Str
+import time
+import queue
 import vaex
 import logging
+import threading
+import weakref
 import pandas as pd
 import shutil
 import numpy as np
+import pyarrow as pa
+import pyarrow.parquet as pq
 import sqlalchemy as db
-from typing import Any, Dict, List
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Dict, Iterator, List, Optional, Sequence, Tuple
 from .typing import *
+from .categories import CategoryDictionary, CATEGORY
+from .arrow import _float_types, to_arrow
 from sqlalchemy.engine.cursor import LegacyCursorResult
 
 log = logging.getLogger(__name__)
 _TEMPDIR = '.temp'
 
+# frames opened straight from a spooled extraction file, keyed by id
+_spools: Dict[int, Tuple[weakref.ref, str]] = dict()
+
 # ------------------------- #
 
 def safe_dir(path: str):
 
     path = os.path.abspath(path)
-
-    if not os.path.exists(path):
-        os.makedirs(path)
+    os.makedirs(path, exist_ok=True)
 
 # ------------------------- #
 
@@ -45,92 +53,559 @@ def safe_rm(path: str):
 
 # ------------------------- #
 
-def build_chunk(
-        
-        chunk: PandasDataFrame,
-        savepath: str,
+def build_pandas_chunk(
+
+        part: Sequence[Tuple],
+        column_names: List[str],
+        dtypes: Dict[str, Any] = dict(),
         droplist: List[str] = list()
+
+    ) -> PandasDataFrame:
+
+    df = pd.DataFrame(data=part, columns=column_names)
+    df = df.drop(columns=droplist, errors='ignore')
+
+    for col, dtype in dtypes.items():
+        if col not in df.columns:
+            continue
+
+        if dtype in _float_types:
+            df[col] = df[col].fillna(0.)
         
-    ):
+        # categories are dictionary-encoded when spooled
+        if not dtype is None and dtype != CATEGORY:
+            df[col] = df[col].astype(dtype)
 
-    dupl_cols = [ x for x in chunk.columns
-                if re.search(r'.\d', x) ]
+    return df
 
-    droplist += dupl_cols
-    droplist = [ x for x in droplist
-                if x in chunk.columns ]
-    
-    chunk = chunk.drop(droplist, axis=1)
-    vaex_df = vaex.from_pandas(chunk, copy_index=False)
+# ------------------------- #
 
-    log.info('exporting chunk to hdf5 via vaex')
+def build_arrow_batch(
 
-    vaex_df.export_hdf5(path=savepath, progress=False)
+        part: Sequence[Tuple],
+        column_names: List[str],
+        dtypes: Dict[str, Any] = dict(),
+        droplist: List[str] = list(),
+        types: Dict[str, pa.DataType] = dict()
 
-    del vaex_df
-    gc.collect()
+    ) -> pa.RecordBatch:
+
+    # rows are transposed once and every column is built as a typed arrow
+    # array (`types`, see arrow.column_types), duplicated names (joined
+    # keys) keep their first occurrence
+
+    names, arrays = list(), list()
+
+    for name, values in zip(column_names, zip(*part)):
+
+        if name in droplist or name in names:
+            continue
+
+        names.append(name)
+        arrays.append(to_arrow(values, dtypes.get(name), types.get(name)))
+
+    return pa.RecordBatch.from_arrays(arrays, names=names)
 
 # ------------------------- #
 
-def load_chunks(chunkdir: str) -> VaexDataFrame:
+class ParquetSpool:
+
+    # chunks are appended to a single parquet file as row groups under the
+    # column types given in `types` (see arrow.column_types), a column
+    # without one takes the type of its first non-null chunk and leading
+    # chunks are held back until then; writes are serialized so partition
+    # threads can share one spool
+
+    def __init__(
+
+            self, 
+            path: str, 
+            row_group_size: int = None,
+            constants: Dict[str, Any] = dict(),
+            categories: List[str] = list(),
+            dictionary: CategoryDictionary = None,
+            types: Dict[str, pa.DataType] = dict()
+
+        ) -> None:
+
+        self.path = path
+        self.rows = 0
+        self._row_group_size = row_group_size
+        self._constants = constants
+        self._categories = categories
+        self._dictionary = dictionary
+        self._types = dict(types)
+        self._pending: List[pa.Table] = list()
+        self._lock = threading.Lock()
+        self._writer = None
     
     # ......................... #
 
-    def tryint(s):
-        try:
-            return int(s)
+    def _column(self, values: Any, patype: pa.DataType) -> pa.Array:
+
+        if isinstance(values, pd.Series):
+
+            try:
+                return pa.array(values, type=patype, from_pandas=True)
+
+            except (pa.ArrowInvalid, pa.ArrowTypeError):
+                values = pa.array(values, from_pandas=True)
+
+        return values if values.type == patype else values.cast(patype)
+    
+    # ......................... #
+
+    def _typed(self, chunk: Any) -> pa.Table:
+
+        if isinstance(chunk, pa.RecordBatch):
+            table = pa.Table.from_batches([chunk])
+            columns = [ table[n] for n in table.column_names ]
+
+        else:
+            table = pa.Table.from_pandas(chunk, preserve_index=False)
+            columns = [ chunk[n] for n in table.column_names ]
+
+        with self._lock:
+
+            for name, column in zip(table.column_names, table.columns):
+                if self._types.get(name) is None and column.type != pa.null():
+                    self._types[name] = column.type
+
+            types = [ self._types.get(n) for n in table.column_names ]
+
+        arrays = [ self._column(c, t) if t is not None else table[n]
+                   for n, c, t in zip(table.column_names, columns, types) ]
+
+        return pa.Table.from_arrays(arrays, names=table.column_names)
+    
+    # ......................... #
+
+    def write(self, chunk: Any) -> None:
+
+        table = self._typed(chunk)
+
+        for name, value in self._constants.items():
+            table = table.append_column(name, pa.array(np.full(len(table), value)))
+
+        for name in self._categories:
+            if name in table.column_names:
+                i = table.column_names.index(name)
+                table = table.set_column(i, name, self._dictionary.encode(name, table[name]))
+
+        self.append(table)
+    
+    # ......................... #
+
+    def _resolved(self, table: pa.Table, fallback: bool = False) -> Optional[pa.Schema]:
+
+        # schema with every null column typed, None while one is unknown
+
+        fields = list()
+
+        for field in table.schema:
 
-        except:
-            return s
+            if field.type == pa.null():
 
-    def alphanum_key(s):
-        return [ tryint(c) for c in re.split('([0-9]+)', s) ]
+                patype = self._types.get(field.name)
 
+                if patype is None and not fallback:
+                    return None
+
+                if patype is None:
+                    log.warning(f'{field.name} is null in every chunk, spooled as string')
+                    patype = pa.string()
+
+                field = field.with_type(patype)
+
+            fields.append(field)
+
+        return pa.schema(fields)
+    
+    # ......................... #
+
+    def _write(self, table: pa.Table) -> None:
+
+        if not table.schema.equals(self._writer.schema):
+            table = table.cast(self._writer.schema)
+
+        self._writer.write_table(table, row_group_size=self._row_group_size)
+        self.rows += len(table)
+    
+    # ......................... #
+
+    def append(self, table: pa.Table, fallback: bool = False) -> None:
+
+        # ready (encoded) tables, e.g. committed checkpoint chunks
+
+        with self._lock:
+
+            if self._writer is None:
+
+                schema = self._resolved(table, fallback)
+
+                if schema is None:
+                    self._pending.append(table)
+                    return
+
+                self._writer = pq.ParquetWriter(self.path, schema)
+                pending, self._pending = self._pending, list()
+
+                for t in pending:
+                    self._write(t)
+
+            self._write(table)
+    
+    # ......................... #
+
+    def child(self, path: str) -> 'ParquetSpool':
+
+        # separate file sharing this spool's column types, constants and
+        # dictionary, e.g. one per partition, concatenated later in order
+
+        spool = ParquetSpool(
+            path,
+            row_group_size=self._row_group_size,
+            constants=self._constants,
+            categories=self._categories,
+            dictionary=self._dictionary
+        )
+        spool._types = self._types
+        spool._lock = self._lock
+
+        return spool
+    
+    # ......................... #
+
+    def concat(self, path: str) -> None:
+
+        # row groups of another (already typed and encoded) spool file,
+        # appended one at a time
+
+        f = pq.ParquetFile(path)
+
+        for i in range(f.num_row_groups):
+            self.append(f.read_row_group(i))
+    
     # ......................... #
 
-    hdf5_list = glob.glob(f'{chunkdir}/*.hdf5')
-    hdf5_list.sort(key=alphanum_key)
-    hdf5_list = np.array(hdf5_list)
+    def close(self) -> Optional[str]:
+
+        if self._writer is None and self._pending:
+            self.append(self._pending.pop(0), fallback=True)
+
+        with self._lock:
+
+            if self._writer is None:
+                return None
 
-    return vaex.open_many(hdf5_list)
+            self._writer.close()
+
+        return self.path
 
 # ------------------------- #
 
-def fetch_chunkwise(
+def open_spool(path: str) -> VaexDataFrame:
+
+    df = vaex.open(path)
+    _spools[id(df)] = (weakref.ref(df), path)
+
+    return df
+
+# ------------------------- #
+
+def spool_path(data: VaexDataFrame) -> Optional[str]:
+
+    # path of the spooled file when the frame is still unmodified,
+    # lets the dataset move the file instead of exporting it again
+
+    ref, path = _spools.get(id(data), (None, None))
+
+    if ref is None or ref() is not data or not os.path.exists(path):
+        return None
+
+    return path
+
+# ------------------------- #
+
+class StageTimer:
+
+    def __init__(self, *stages: str) -> None:
+
+        self.timings = dict((s, 0.) for s in stages)
+        self._lock = threading.Lock()
+    
+    # ......................... #
+
+    def add(self, stage: str, seconds: float) -> None:
+
+        with self._lock:
+            self.timings[stage] += seconds
+    
+    # ......................... #
+
+    def report(self, prefix: str = '') -> str:
+
+        total = sum(self.timings.values()) or 1.
+        stages = ', '.join( f'{k} {v:.2f}s ({v / total:.0%})' 
+                            for k, v in self.timings.items() )
+
+        return f'{prefix}stage timings: {stages}'
+
+# ------------------------- #
+
+def _timed_partitions(
+
+        res: LegacyCursorResult,
+        chunksize: int,
+        timer: StageTimer
+
+    ) -> Iterator[Sequence[Tuple]]:
+
+    parts = res.partitions(chunksize)
+
+    while True:
+
+        start = time.perf_counter()
+        part = next(parts, None)
+        timer.add('fetch', time.perf_counter() - start)
+
+        if part is None:
+            return
+
+        yield part
+
+# ------------------------- #
+
+def _convert_chunk(
+
+        part: Sequence[Tuple],
+        column_names: List[str],
+        dtypes: Dict[str, Any],
+        droplist: List[str],
+        builder: str,
+        timer: StageTimer,
+        types: Dict[str, pa.DataType] = dict()
+
+    ) -> Any:
+
+    start = time.perf_counter()
+
+    if builder == 'arrow':
+        chunk = build_arrow_batch(part, column_names, dtypes, droplist, types)
+
+    else:
+        chunk = build_pandas_chunk(part, column_names, dtypes, droplist)
+
+    timer.add('convert', time.perf_counter() - start)
+
+    return chunk
+
+# ------------------------- #
+
+def _write_chunk(
+
+        chunk: Any,
+        spool: ParquetSpool,
+        timer: StageTimer
+
+    ) -> None:
+
+    start = time.perf_counter()
+    spool.write(chunk)
+    timer.add('write', time.perf_counter() - start)
+
+# ------------------------- #
+
+def new_spool(
+
+        name: str,
+        row_group_size: int = None,
+        constants: Dict[str, Any] = dict(),
+        categories: List[str] = list(),
+        dictionary: CategoryDictionary = None,
+        types: Dict[str, pa.DataType] = dict()
+
+    ) -> ParquetSpool:
+
+    tempdir = os.path.join('data/02_intermediate', _TEMPDIR)
+    safe_dir(tempdir)
+
+    return ParquetSpool(
+        os.path.join(tempdir, name),
+        row_group_size=row_group_size,
+        constants=constants,
+        categories=categories,
+        dictionary=dictionary,
+        types=types
+    )
+
+# ------------------------- #
+
+def write_chunks(
 
         res: LegacyCursorResult,
         column_names: List[str],
         chunksize: int,
         dtypes: Dict[str, str] = dict(),
-        droplist: List[str] = list()
+        droplist: List[str] = list(),
+        prefix: str = '',
+        builder: str = 'pandas',
+        workers: int = 1,
+        queue_depth: int = 0,
+        row_group_size: int = None,
+        constants: Dict[str, Any] = dict(),
+        dictionary: CategoryDictionary = None,
+        types: Dict[str, pa.DataType] = dict(),
+        spool: ParquetSpool = None
+
+    ) -> Optional[str]:
+
+    # with a shared `spool` (parallel partitions) it is left open,
+    # closing it is up to the caller
+
+    timer = StageTimer('fetch', 'convert', 'write')
+    categories = [ c for c, d in dtypes.items() if d == CATEGORY ]
+    shared = spool is not None
+
+    if categories and dictionary is None:
+        raise ValueError(f'{categories=} declared without a category dictionary')
+
+    if not shared:
+        spool = new_spool(
+            f'{prefix}spool.parquet',
+            row_group_size=row_group_size,
+            constants=constants,
+            categories=categories,
+            dictionary=dictionary,
+            types=types
+        )
 
-    ) -> VaexDataFrame:
+    # ......................... #
+
+    if queue_depth <= 0:
+
+        try:
+            for i, part in enumerate(_timed_partitions(res, chunksize, timer)):
 
-    savedir = 'data/02_intermediate'
-    tempdir = os.path.join(savedir, _TEMPDIR)
+                log.info(f'fetching chunk #{prefix}{i}')
+
+                chunk = _convert_chunk(part, column_names, dtypes, droplist, builder, timer, types)
+                _write_chunk(chunk, spool, timer)
+
+                del chunk
+                gc.collect()
+
+        finally:
+            path = spool.path if shared else spool.close()
+
+        if categories:
+            dictionary.save()
+
+        log.info(timer.report(prefix))
+
+        return path
     
-    safe_dir(tempdir)
+    # ......................... #
 
-    for i, part in enumerate(res.partitions(chunksize)):
+    # overlapped mode: the cursor is drained on this thread, chunks are
+    # converted on a worker pool and appended in order by a writer thread,
+    # the bounded queue keeps at most queue_depth chunks in flight
 
-        log.info(f'fetching chunk #{i}')
-        df = pd.DataFrame(data=part, columns=column_names)
-        df = df.drop(columns=droplist)
+    pending = queue.Queue(maxsize=queue_depth)
+    errors = list()
 
-        for col, dtype in dtypes.items():
-            if dtype in [np.float32, np.float64, float]:
-                df[col] = df[col].fillna(0.)
-            
-            if not dtype is None:
-                df[col] = df[col].astype(dtype)
+    def writer() -> None:
 
-        build_chunk(df, os.path.join(tempdir, f'{i}.hdf5'))
+        while True:
 
-        del df
-        gc.collect()
+            future = pending.get()
 
-    df = load_chunks(tempdir)
+            if future is None:
+                return
 
-    return df
+            # keep draining after a failure so the producer never blocks
+            if errors:
+                continue
+
+            try:
+                _write_chunk(future.result(), spool, timer)
+
+            except Exception as exc:
+                errors.append(exc)
+
+    thread = threading.Thread(target=writer, name=f'chunk-writer{prefix}', daemon=True)
+    thread.start()
+
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+
+        try:
+            for i, part in enumerate(_timed_partitions(res, chunksize, timer)):
+
+                if errors:
+                    break
+
+                log.info(f'fetching chunk #{prefix}{i}')
+
+                future = pool.submit(
+                    _convert_chunk, 
+                    part, column_names, dtypes, droplist, builder, timer, types
+                )
+                pending.put(future)
+
+        finally:
+            pending.put(None)
+            thread.join()
+            path = spool.path if shared else spool.close()
+
+    if errors:
+        raise errors[0]
+
+    if categories:
+        dictionary.save()
+
+    log.info(timer.report(prefix))
+    gc.collect()
+
+    return path
+
+# ------------------------- #
+
+def fetch_chunkwise(
+
+        res: LegacyCursorResult,
+        column_names: List[str],
+        chunksize: int,
+        dtypes: Dict[str, str] = dict(),
+        droplist: List[str] = list(),
+        builder: str = 'pandas',
+        workers: int = 1,
+        queue_depth: int = 0,
+        row_group_size: int = None,
+        constants: Dict[str, Any] = dict(),
+        dictionary: CategoryDictionary = None,
+        types: Dict[str, pa.DataType] = dict()
+
+    ) -> VaexDataFrame:
+
+    path = write_chunks(
+        res,
+        column_names,
+        chunksize=chunksize,
+        dtypes=dtypes,
+        droplist=droplist,
+        builder=builder,
+        workers=workers,
+        queue_depth=queue_depth,
+        row_group_size=row_group_size,
+        constants=constants,
+        dictionary=dictionary,
+        types=types
+    )
+
+    if path is None:
+        log.warning('query returned no rows')
+        return None
+
+    return open_spool(path)
 
 # ------------------------- #
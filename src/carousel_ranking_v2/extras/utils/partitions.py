@@ -0,0 +1,171 @@
+import os
+import json
+import glob
+import logging
+import datetime
+import vaex
+import pyarrow.compute as pc
+from typing import List, Optional
+
+from .io import safe_dir, safe_rmtree, safe_rm
+from .typing import *
+
+log = logging.getLogger(__name__)
+
+_WATERMARK = '_watermark.json'
+
+# ------------------------- #
+
+class DayPartitionStore:
+
+    """Day-partitioned parquet store with a high-watermark on a timestamp
+    column, partitions older than ``period`` days are evicted"""
+
+    def __init__(
+
+            self,
+            path: str,
+            column: str,
+            period: int
+
+        ) -> None:
+
+        self.path = path
+        self.column = column
+        self.period = period
+        self._watermark_path = os.path.join(path, _WATERMARK)
+
+        safe_dir(path)
+
+    # ......................... #
+
+    def _state(self) -> dict:
+
+        if not os.path.exists(self._watermark_path):
+            return dict()
+
+        with open(self._watermark_path, 'r') as f:
+            return json.load(f)
+
+    # ......................... #
+
+    def watermark(self) -> Optional[str]:
+
+        if not self.days():
+            return None
+
+        return self._state().get(self.column)
+
+    # ......................... #
+
+    def days(self) -> List[str]:
+
+        return sorted(
+            os.path.basename(x).split('=', 1)[1]
+            for x in glob.glob(os.path.join(self.path, 'day=*'))
+        )
+
+    # ......................... #
+
+    def _parts(self) -> List[str]:
+
+        # parts published by a committed append: the watermark file is the
+        # commit record, parts stamped after it belong to an interrupted one
+
+        state = self._state()
+
+        if not state:
+            return list()
+
+        # stores written before commit stamps, every part is committed
+        committed = state.get('stamp', '~')
+
+        return sorted(
+            x for x in glob.glob(os.path.join(self.path, 'day=*', 'part-*.parquet'))
+            if os.path.basename(x)[5:].split('.', 1)[0] <= committed
+        )
+
+    # ......................... #
+
+    def _write_state(self, state: dict) -> None:
+
+        tmp = f'{self._watermark_path}.tmp'
+
+        with open(tmp, 'w') as f:
+            json.dump(state, f)
+
+        os.replace(tmp, self._watermark_path)
+
+    # ......................... #
+
+    def append(self, data: VaexDataFrame) -> None:
+
+        df = data.copy()
+        df['__day'] = df[self.column].str.slice(0, 10)
+        stamp = datetime.datetime.utcnow().strftime('%Y%m%d%H%M%S%f')
+
+        # leftovers of an interrupted append
+        for path in glob.glob(os.path.join(self.path, 'day=*', '.part-*.tmp')):
+            safe_rm(path)
+
+        staged, watermark = list(), self.watermark()
+
+        for day in sorted(df.unique(df['__day'], dropna=True)):
+
+            daydir = os.path.join(self.path, f'day={day}')
+            safe_dir(daydir)
+
+            part = df[df['__day'] == day].extract()
+            part = part.drop(['__day'])
+
+            tmp = os.path.join(daydir, f'.part-{stamp}.tmp')
+            part.export_parquet(tmp)
+            staged.append((tmp, os.path.join(daydir, f'part-{stamp}.parquet')))
+
+            # iso timestamp strings, a max aggregation per partition
+            top = pc.max(part[self.column].values).as_py()
+
+            if top is not None:
+                watermark = top if watermark is None else max(watermark, top)
+
+            log.info(f'staged {len(part)} rows for partition {day}')
+
+        if not staged:
+            return
+
+        # parts are only read once the watermark names their stamp, so a
+        # crash before the watermark is replaced leaves them invisible
+
+        for tmp, path in staged:
+            os.replace(tmp, path)
+
+        self._write_state({self.column: watermark, 'stamp': stamp})
+
+        log.info(f'committed {len(staged)} partitions, {self.column} watermark {watermark}')
+
+    # ......................... #
+
+    def evict(self, today: datetime.date = None) -> List[str]:
+
+        today = today or datetime.date.today()
+        oldest = (today - datetime.timedelta(days=self.period)).isoformat()
+        evicted = [ d for d in self.days() if d < oldest ]
+
+        for day in evicted:
+            safe_rmtree(os.path.join(self.path, f'day={day}'))
+            log.info(f'evicted partition {day}')
+
+        return evicted
+
+    # ......................... #
+
+    def open(self) -> VaexDataFrame:
+
+        files = self._parts()
+
+        if not files:
+            raise FileNotFoundError(f'no committed partitions in {self.path}')
+
+        return vaex.open_many(files)
+
+# ------------------------- #
@@ -0,0 +1,371 @@
+"""
+Synthetic data for the local redshift stand-in (``conf/offline``).
+
+Fills ``stg_amplitude.app_events``, ``stg_amplitude.app_events_extended``,
+``stg_lucky.transaction_eg`` and ``stg_lucky.offer_eg`` with one sqlite file
+per schema, run from the project root with::
+
+    python -m carousel_ranking_v2.extras.utils.synthetic --events 1000000
+"""
+import os
+import uuid
+import time
+import logging
+import argparse
+import datetime
+import yaml
+import numpy as np
+import sqlalchemy as db
+from typing import Any, Dict, Iterator, List, Tuple
+
+from ..datasets.engines import sqlite_path
+
+log = logging.getLogger(__name__)
+
+_CHANNELS = [ '["in_store"]', '["online"]', '["delivery"]', '["online","delivery"]',
+              '["in_store","online","delivery"]' ]
+
+# ------------------------- #
+
+def _tables(metadata: db.MetaData) -> Dict[str, db.Table]:
+
+    return dict(
+
+        app_events=db.Table(
+            'app_events', metadata,
+            db.Column('event_id', db.String),
+            db.Column('event_timestamp', db.DateTime, index=True),
+            db.Column('user_id', db.String),
+            db.Column('language', db.String),
+            db.Column('anonymous_user_id', db.String)
+        ),
+
+        app_events_extended=db.Table(
+            'app_events_extended', metadata,
+            db.Column('event_id', db.String),
+            db.Column('event_timestamp', db.DateTime, index=True),
+            db.Column('event_type', db.String),
+            db.Column('offer_id', db.Integer),
+            db.Column('merchant_id', db.Integer),
+            db.Column('category_id', db.Integer),
+            db.Column('channels', db.String),
+            db.Column('is_attribution_event', db.Boolean)
+        ),
+
+        transaction_eg=db.Table(
+            'transaction_eg', metadata,
+            db.Column('offerid', db.Integer),
+            db.Column('transactionchannelid', db.Integer),
+            db.Column('transactionstatusid', db.Integer),
+            db.Column('customerplanid', db.Integer),
+            db.Column('createddatetime', db.DateTime, index=True),
+            db.Column('burndatetime', db.DateTime),
+            db.Column('branchid', db.Integer),
+            db.Column('expiredate', db.DateTime),
+            db.Column('merchantid', db.Integer),
+            db.Column('luckyuserid', db.String),
+            db.Column('offerpaymentstatuslookupid', db.Integer),
+            db.Column('offerprice', db.Float),
+            db.Column('commission', db.Float),
+            db.Column('merchantcommission', db.Float),
+            db.Column('value', db.Float),
+            db.Column('clientrevenue', db.Float),
+            db.Column('merchantcommissionfactor', db.Float),
+            db.Column('originalprice', db.Float),
+            db.Column('offerpercentage', db.Float),
+            db.Column('simnumberid', db.Integer)
+        ),
+
+        offer_eg=db.Table(
+            'offer_eg', metadata,
+            db.Column('offerid', db.Integer),
+            db.Column('enddate', db.DateTime),
+            db.Column('offercappingtypeid', db.Integer)
+        )
+
+    )
+
+# ------------------------- #
+
+class SyntheticWorld:
+
+    """Users, offers, merchants and categories shared by all generated tables,
+    offer popularity follows a zipf law and event types are drawn with
+    frequencies inversely proportional to their ``event_weights.yml`` weight"""
+
+    def __init__(
+
+            self,
+            events: int,
+            event_weights: Dict[str, float],
+            days: int = 40,
+            offers: int = 3000,
+            skew: float = 1.1,
+            seed: int = 0
+
+        ) -> None:
+
+        self.rng = np.random.default_rng(seed)
+        self.now = datetime.datetime.now().replace(microsecond=0)
+        self.days = days
+
+        n_users = max(events // 50, 100)
+        n_merchants = max(offers // 6, 10)
+
+        self.anon_ids = np.array([ uuid.UUID(int=int(x)).hex for x in
+                                   self.rng.integers(0, 2 ** 63, n_users) ])
+        self.user_ids = np.array([ str(x) for x in self.rng.integers(1, 10 ** 7, n_users) ], dtype=object)
+        self.user_ids[self.rng.random(n_users) < 0.4] = None # not logged in
+        self.languages = np.where(self.rng.random(n_users) < 0.7, 'en', 'ar')
+
+        self.offer_ids = np.arange(1, offers + 1)
+        self.offer_merchant = self.rng.integers(1, n_merchants + 1, offers)
+        self.merchant_category = self.rng.integers(1, 41, n_merchants + 1)
+        self.offer_channels = self.rng.integers(0, len(_CHANNELS), offers)
+
+        popularity = 1. / np.arange(1, offers + 1) ** skew
+        self.offer_p = self.rng.permutation(popularity / popularity.sum())
+
+        activity = self.rng.pareto(1.5, n_users) + 1 # heavy-tailed user activity
+        self.user_p = activity / activity.sum()
+
+        types = list(event_weights.keys())
+        freq = np.array([ 1. / float(event_weights[t]) for t in types ])
+        self.event_types = np.array(types)
+        self.event_p = freq / freq.sum()
+
+    # ......................... #
+
+    def _timestamps(self, n: int, days: int) -> np.ndarray:
+
+        # iso strings, sqlite DATETIME columns are read back by sqlalchemy
+
+        offsets = self.rng.integers(0, days * 86400 * 10 ** 6, n)
+        start = np.datetime64(self.now - datetime.timedelta(days=days), 'us')
+
+        return np.datetime_as_string(start + offsets.astype('timedelta64[us]'), unit='us')
+
+    # ......................... #
+
+    def events(self, n: int, offset: int) -> Tuple[List[tuple], List[tuple]]:
+
+        users = self.rng.choice(len(self.anon_ids), n, p=self.user_p)
+        offers = self.rng.choice(len(self.offer_ids), n, p=self.offer_p)
+        ts = np.char.replace(self._timestamps(n, self.days), 'T', ' ')
+        event_ids = np.char.mod('%d', np.arange(offset, offset + n))
+        merchants = self.offer_merchant[offers]
+        categories = self.merchant_category[merchants]
+
+        known = self.rng.random(n) > 0.05 # merchant / category missing for some events
+        merchants = np.where(known, merchants, None)
+        categories = np.where(known, categories, None)
+
+        ae = list(zip(
+            event_ids.tolist(),
+            ts.tolist(),
+            self.user_ids[users].tolist(),
+            self.languages[users].tolist(),
+            self.anon_ids[users].tolist()
+        ))
+
+        aex = list(zip(
+            event_ids.tolist(),
+            ts.tolist(),
+            self.rng.choice(self.event_types, n, p=self.event_p).tolist(),
+            self.offer_ids[offers].tolist(),
+            merchants.tolist(),
+            categories.tolist(),
+            [ _CHANNELS[i] for i in self.offer_channels[offers] ],
+            (self.rng.random(n) < 0.1).tolist()
+        ))
+
+        return ae, aex
+
+    # ......................... #
+
+    def transactions(self, n: int) -> List[tuple]:
+
+        users = self.rng.choice(len(self.anon_ids), n, p=self.user_p)
+        offers = self.rng.choice(len(self.offer_ids), n, p=self.offer_p)
+        created = self._timestamps(n, self.days).astype('datetime64[us]')
+        burned = created + self.rng.integers(0, 7 * 86400, n).astype('timedelta64[s]')
+        expires = created + self.rng.integers(1, 90, n).astype('timedelta64[D]')
+        price = np.round(self.rng.lognormal(3.5, 0.8, n), 2)
+        percentage = self.rng.choice([10., 15., 20., 25., 50.], n)
+        commission = np.round(price * 0.1, 2)
+
+        def fmt(x: np.ndarray) -> List[str]:
+            return np.char.replace(np.datetime_as_string(x, unit='us'), 'T', ' ').tolist()
+
+        return list(zip(
+            self.offer_ids[offers].tolist(),
+            self.rng.integers(1, 4, n).tolist(),
+            self.rng.integers(1, 5, n).tolist(),
+            self.rng.integers(1, 6, n).tolist(),
+            fmt(created),
+            fmt(burned),
+            self.rng.integers(1, 2000, n).tolist(),
+            fmt(expires),
+            self.offer_merchant[offers].tolist(),
+            self.anon_ids[users].tolist(),
+            self.rng.integers(1, 4, n).tolist(),
+            price.tolist(),
+            commission.tolist(),
+            np.round(commission * 0.5, 2).tolist(),
+            np.round(price * (1 - percentage / 100.), 2).tolist(),
+            np.round(commission * 0.8, 2).tolist(),
+            np.full(n, 0.5).tolist(),
+            price.tolist(),
+            percentage.tolist(),
+            np.where(self.rng.random(n) < 0.3, None, self.rng.integers(1, 10 ** 6, n)).tolist()
+        ))
+
+    # ......................... #
+
+    def offers(self) -> List[tuple]:
+
+        n = len(self.offer_ids)
+        ends = np.datetime64(self.now, 'us') + \
+               self.rng.integers(-30, 120, n).astype('timedelta64[D]')
+        ends = np.char.replace(np.datetime_as_string(ends, unit='us'), 'T', ' ')
+
+        return list(zip(
+            self.offer_ids.tolist(),
+            ends.tolist(),
+            self.rng.choice([1, 2, 3], n, p=[0.6, 0.3, 0.1]).tolist()
+        ))
+
+# ------------------------- #
+
+def _batches(n: int, batch_size: int) -> Iterator[Tuple[int, int]]:
+
+    for offset in range(0, n, batch_size):
+        yield offset, min(batch_size, n - offset)
+
+# ------------------------- #
+
+def _insert(cursor: Any, table: db.Table, rows: List[tuple]) -> None:
+
+    placeholders = ', '.join('?' * len(table.columns))
+    cursor.executemany(f'INSERT INTO {table.name} VALUES ({placeholders})', rows)
+
+# ------------------------- #
+
+def generate(
+
+        path: str,
+        events: int,
+        event_weights: Dict[str, float],
+        transactions: int = None,
+        offers: int = 3000,
+        days: int = 40,
+        skew: float = 1.1,
+        batch_size: int = 500000,
+        seed: int = 0
+
+    ) -> Dict[str, int]:
+
+    # tables are dropped and rebuilt, rows go through the raw sqlite
+    # driver in batches since the orm insert path is far too slow at 50M
+
+    world = SyntheticWorld(events, event_weights, days=days, offers=offers, skew=skew, seed=seed)
+    transactions = events // 20 if transactions is None else transactions
+    counts = dict()
+
+    os.makedirs(path, exist_ok=True)
+
+    schemas = dict(
+        stg_amplitude=['app_events', 'app_events_extended'],
+        stg_lucky=['transaction_eg', 'offer_eg']
+    )
+
+    for schema, names in schemas.items():
+
+        engine = db.create_engine(f'sqlite:///{sqlite_path(path, schema)}')
+        metadata = db.MetaData()
+        tables = { k: v for k, v in _tables(metadata).items() if k in names }
+
+        metadata.drop_all(engine)
+
+        # indexes are built after the bulk load
+
+        indexes = [ i for tb in tables.values() for i in tb.indexes ]
+
+        for tb in tables.values():
+            tb.indexes.clear()
+
+        metadata.create_all(engine)
+
+        raw = engine.raw_connection()
+        cursor = raw.cursor()
+
+        try:
+            cursor.execute('PRAGMA journal_mode = OFF')
+            cursor.execute('PRAGMA synchronous = OFF')
+
+            if schema == 'stg_amplitude':
+
+                for offset, n in _batches(events, batch_size):
+                    ae, aex = world.events(n, offset)
+                    _insert(cursor, tables['app_events'], ae)
+                    _insert(cursor, tables['app_events_extended'], aex)
+                    raw.commit()
+                    log.info(f'generated {offset + n}/{events} events')
+
+                counts.update(app_events=events, app_events_extended=events)
+
+            else:
+
+                for offset, n in _batches(transactions, batch_size):
+                    _insert(cursor, tables['transaction_eg'], world.transactions(n))
+                    raw.commit()
+
+                _insert(cursor, tables['offer_eg'], world.offers())
+                raw.commit()
+
+                counts.update(transaction_eg=transactions, offer_eg=offers)
+
+        finally:
+            cursor.close()
+            raw.close()
+
+        for index in indexes:
+            index.create(engine)
+
+        engine.dispose()
+
+    return counts
+
+# ------------------------- #
+
+if __name__ == '__main__':
+
+    logging.basicConfig(level=logging.INFO)
+
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--path', default='data/01_raw/offline_redshift')
+    parser.add_argument('--events', type=int, default=1000000)
+    parser.add_argument('--transactions', type=int, default=None)
+    parser.add_argument('--offers', type=int, default=3000)
+    parser.add_argument('--days', type=int, default=40)
+    parser.add_argument('--skew', type=float, default=1.1)
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--event-weights', default='conf/base/processing/event_weights.yml')
+    args = parser.parse_args()
+
+    with open(args.event_weights, 'r') as f:
+        weights = yaml.safe_load(f)
+
+    start = time.perf_counter()
+    counts = generate(
+        args.path,
+        events=args.events,
+        event_weights=weights,
+        transactions=args.transactions,
+        offers=args.offers,
+        days=args.days,
+        skew=args.skew,
+        seed=args.seed
+    )
+
+    log.info(f'generated {counts} in {time.perf_counter() - start:.1f}s')
@@ -0,0 +1,93 @@
+import threading
+import psutil
+import pandas as pd
+import pyarrow as pa
+import vaex
+from typing import Any, Optional, Tuple
+
+# ------------------------- #
+
+class RSSSampler:
+
+    """Peak resident set size of this process, sampled on a daemon thread"""
+
+    def __init__(self, interval: float = 0.02) -> None:
+
+        self.interval = interval
+        self.peak = 0
+        self._proc = psutil.Process()
+        self._stop = threading.Event()
+        self._thread = None
+
+    # ......................... #
+
+    def rss(self) -> int:
+        return self._proc.memory_info().rss
+
+    # ......................... #
+
+    def _run(self) -> None:
+
+        while not self._stop.wait(self.interval):
+            self.peak = max(self.peak, self.rss())
+
+    # ......................... #
+
+    def start(self) -> 'RSSSampler':
+
+        self.peak = self.rss()
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+
+        return self
+
+    # ......................... #
+
+    def stop(self) -> int:
+
+        self._stop.set()
+        self._thread.join()
+        self.peak = max(self.peak, self.rss())
+
+        return self.peak
+
+    # ......................... #
+
+    def __enter__(self) -> 'RSSSampler':
+        return self.start()
+
+    # ......................... #
+
+    def __exit__(self, *args: Any) -> None:
+        self.stop()
+
+# ------------------------- #
+
+def data_size(data: Any) -> Tuple[Optional[int], Optional[int]]:
+
+    # (rows, bytes) of in-memory frames and tables, only what is cheap
+    # to tell without evaluating anything
+
+    if isinstance(data, vaex.dataframe.DataFrame):
+
+        # len() and byte_size() of a filtered frame evaluate the filter,
+        # rows are reported unfiltered and bytes left out
+
+        if data.filtered:
+            return data.length_unfiltered(), None
+
+        return data.length_unfiltered(), data.byte_size()
+
+    if isinstance(data, pd.DataFrame):
+        return len(data), int(data.memory_usage(index=True, deep=False).sum())
+
+    if isinstance(data, (pa.Table, pa.RecordBatch)):
+        return data.num_rows, data.nbytes
+
+    if isinstance(data, (list, tuple, dict, set)):
+        return len(data), None
+
+    return None, None
+
+# ------------------------- #
@@ -1,8 +1,46 @@
-from typing import Any, Dict, Iterable, Optional
+import os
+import json
+import time
+import inspect
+import hashlib
+import functools
+import logging
+import datetime
+from typing import Any, Callable, Dict, Iterable, List, Optional
 from kedro.config import ConfigLoader
 from kedro.framework.hooks import hook_impl
 from kedro.io import DataCatalog
+from kedro.pipeline import Pipeline
+from kedro.pipeline.node import Node
 from kedro.versioning import Journal
+from mlflow.entities import Metric
+from mlflow.tracking import MlflowClient
+
+from carousel_ranking_v2.extras.datasets.engines import registry
+from carousel_ranking_v2.extras.datasets.vaex import VaexDataSet, SharedVaexDataSet
+from carousel_ranking_v2.extras.utils.telemetry import RSSSampler, data_size
+
+log = logging.getLogger(__name__)
+
+# ------------------------- #
+
+def _shared_paths(names: Iterable[str], catalog: DataCatalog) -> List[str]:
+
+    # distinct files behind the SharedVaexDataSet entries in `names`
+
+    paths = list()
+
+    for name in names:
+
+        dataset = catalog._data_sets.get(name)
+
+        if isinstance(dataset, SharedVaexDataSet):
+            path = os.path.abspath(dataset.filepath)
+
+            if path not in paths:
+                paths.append(path)
+
+    return paths
 
 # ------------------------- #
 
@@ -25,3 +63,366 @@ class ProjectHooks:
         return DataCatalog.from_config(
             catalog, credentials, load_versions, save_version, journal
         )
+
+    @hook_impl
+    def before_pipeline_run(self, pipeline: Pipeline, catalog: DataCatalog) -> None:
+        registry.reset_stats()
+        SharedVaexDataSet.release()
+
+        # nodes still to read each shared artifact, across all its aliases
+        self._consumers: Dict[str, int] = dict()
+
+        for node in pipeline.nodes:
+            for path in _shared_paths(node.inputs, catalog):
+                self._consumers[path] = self._consumers.get(path, 0) + 1
+
+    @hook_impl
+    def after_node_run(self, node: Node, catalog: DataCatalog) -> None:
+
+        for path in _shared_paths(node.inputs, catalog):
+
+            self._consumers[path] = self._consumers.get(path, 1) - 1
+
+            if self._consumers[path] <= 0:
+                log.info(f'last consumer of {path} done, releasing shared table')
+                SharedVaexDataSet.release(path)
+
+    @hook_impl
+    def after_pipeline_run(self) -> None:
+        for engine, stats in registry.stats().items():
+            log.info(f'connection pool {engine}: {stats}')
+
+        shared = SharedVaexDataSet.stats()
+        log.info(f'shared datasets: {shared["shared"] / 2 ** 20:.1f} MB shared, '
+                 f'{shared["copied"] / 2 ** 20:.1f} MB copied')
+        SharedVaexDataSet.release()
+
+# ------------------------- #
+
+def _input_fingerprint(name: str, catalog: DataCatalog, data: Any) -> Optional[str]:
+
+    dataset = catalog._data_sets.get(name)
+
+    if isinstance(dataset, VaexDataSet) and dataset.fingerprint():
+        return dataset.fingerprint()
+
+    filepath = getattr(dataset, 'filepath', None) or getattr(dataset, '_filepath', None)
+
+    if filepath is not None and os.path.exists(str(filepath)):
+        stat = os.stat(str(filepath))
+        return f'{filepath}:{stat.st_mtime_ns}:{stat.st_size}'
+
+    # parameters, configs and other plain in-memory values
+    if isinstance(data, (dict, list, tuple, str, int, float, bool, type(None))):
+        return json.dumps(data, sort_keys=True, default=str)
+
+    # e.g. live database tables, never cached
+    return None
+
+# ------------------------- #
+
+def _code_fingerprint(func: Callable) -> str:
+
+    # source of the node function, so an edited node is not skipped;
+    # bytecode when the source is unavailable
+
+    while isinstance(func, functools.partial):
+        func = func.func
+
+    func = inspect.unwrap(func)
+
+    try:
+        code = inspect.getsource(func)
+
+    except (OSError, TypeError):
+        code = getattr(getattr(func, '__code__', None), 'co_code', repr(func).encode())
+        code = code.hex() if isinstance(code, bytes) else code
+
+    return hashlib.sha1(code.encode()).hexdigest()
+
+# ------------------------- #
+
+class NodeCacheHooks:
+
+    """Skips nodes whose outputs are all cache-enabled VaexDataSets with a
+    fingerprint (function code + inputs + parameters) matching the current
+    inputs, the outputs are then loaded back through the catalog"""
+
+    def __init__(self) -> None:
+        self._original: Dict[str, Callable] = dict()
+
+    # ......................... #
+
+    @staticmethod
+    def _outputs(node: Node, catalog: DataCatalog) -> List[Any]:
+        return [ catalog._data_sets.get(name) for name in node.outputs ]
+
+    # ......................... #
+
+    @staticmethod
+    def _reuse(node: Node, catalog: DataCatalog) -> Callable:
+
+        def reuse(*args, **kwargs) -> Any:
+
+            data = [ catalog.load(name) for name in node.outputs ]
+
+            if isinstance(node._outputs, str):
+                return data[0]
+
+            if isinstance(node._outputs, dict):
+                return dict(zip(node._outputs.keys(), data))
+
+            return data
+
+        return reuse
+
+    # ......................... #
+
+    @hook_impl
+    def before_node_run(
+
+            self, 
+            node: Node, 
+            catalog: DataCatalog, 
+            inputs: Dict[str, Any]
+
+        ) -> None:
+
+        outputs = self._outputs(node, catalog)
+
+        if not outputs or not all(isinstance(ds, VaexDataSet) and ds.cache for ds in outputs):
+            return
+
+        parts = [ node.name, _code_fingerprint(node.func) ]
+
+        for name in sorted(inputs):
+
+            fingerprint = _input_fingerprint(name, catalog, inputs[name])
+
+            if fingerprint is None:
+                return
+
+            parts.append(f'{name}={fingerprint}')
+
+        fingerprint = hashlib.sha1('|'.join(parts).encode()).hexdigest()
+
+        for ds in outputs:
+            ds.expect_fingerprint(fingerprint)
+
+        if all(ds.fingerprint() == fingerprint and ds.exists() for ds in outputs):
+
+            # Node.func is settable for hooks, restored after the run
+
+            log.info(f'{node.name}: outputs match fingerprint {fingerprint[:12]}, reusing artifacts')
+            self._original[node.name] = node.func
+            node.func = self._reuse(node, catalog)
+
+    # ......................... #
+
+    def _restore(self, node: Node) -> None:
+
+        if node.name in self._original:
+            node.func = self._original.pop(node.name)
+
+    # ......................... #
+
+    @hook_impl
+    def after_node_run(self, node: Node) -> None:
+        self._restore(node)
+
+    # ......................... #
+
+    @hook_impl
+    def on_node_error(self, node: Node) -> None:
+        self._restore(node)
+
+# ------------------------- #
+
+class TelemetryHooks:
+
+    """Per-node wall time, cpu time, peak RSS and input / output sizes,
+    appended as json lines and logged as metrics of one MLflow run per
+    pipeline run"""
+
+    def __init__(
+
+            self,
+            path: str = 'logs/telemetry.jsonl',
+            tracking_uri: str = 'sqlite:///carousel-ranking.db',
+            experiment: str = 'telemetry',
+            interval: float = 0.02
+
+        ) -> None:
+
+        self.path = path
+        self.tracking_uri = tracking_uri
+        self.experiment = experiment
+        self.interval = interval
+
+        self._nodes: Dict[str, Dict[str, Any]] = dict()
+        self._run_params: Dict[str, Any] = dict()
+        self._client = None
+        self._mlflow_run = None
+        self._step = 0
+
+    # ......................... #
+
+    def _mlflow(self, call: Callable, *args, **kwargs) -> Any:
+
+        # telemetry never fails a pipeline run
+
+        try:
+            return call(*args, **kwargs)
+
+        except Exception as exc:
+            log.warning(f'telemetry: mlflow call failed, disabling ({exc})')
+            self._client = None
+
+    # ......................... #
+
+    @staticmethod
+    def _sizes(data: Dict[str, Any]) -> Dict[str, Dict[str, Optional[int]]]:
+
+        sizes = dict()
+
+        for name, value in data.items():
+            rows, nbytes = data_size(value)
+            sizes[name] = dict(rows=rows, bytes=nbytes)
+
+        return sizes
+
+    # ......................... #
+
+    @hook_impl
+    def before_pipeline_run(self, run_params: Dict[str, Any]) -> None:
+
+        self._run_params = run_params
+        self._nodes.clear()
+        self._step = 0
+
+        try:
+            self._client = MlflowClient(tracking_uri=self.tracking_uri)
+            experiment = self._client.get_experiment_by_name(self.experiment)
+            experiment_id = experiment.experiment_id if experiment else \
+                            self._client.create_experiment(self.experiment)
+
+            self._mlflow_run = self._client.create_run(
+                experiment_id,
+                tags={
+                    'kedro.run_id': str(run_params.get('run_id')),
+                    'kedro.pipeline': str(run_params.get('pipeline_name') or '__default__'),
+                    'kedro.env': str(run_params.get('env'))
+                }
+            )
+
+        except Exception as exc:
+            log.warning(f'telemetry: mlflow unavailable, json lines only ({exc})')
+            self._client = None
+
+    # ......................... #
+
+    @hook_impl
+    def before_node_run(self, node: Node, inputs: Dict[str, Any]) -> None:
+
+        self._nodes[node.name] = dict(
+            sampler=RSSSampler(self.interval).start(),
+            wall=time.perf_counter(),
+            cpu=time.process_time(),
+            inputs=self._sizes(inputs)
+        )
+
+    # ......................... #
+
+    @hook_impl
+    def after_node_run(self, node: Node, outputs: Dict[str, Any]) -> None:
+
+        state = self._nodes.pop(node.name, None)
+
+        if state is None:
+            return
+
+        wall = time.perf_counter() - state['wall']
+        cpu = time.process_time() - state['cpu']
+        rss = state['sampler'].stop()
+
+        record = dict(
+            timestamp=datetime.datetime.utcnow().isoformat(),
+            run_id=self._run_params.get('run_id'),
+            pipeline=self._run_params.get('pipeline_name'),
+            node=node.name,
+            wall_time=round(wall, 4),
+            cpu_time=round(cpu, 4),
+            peak_rss_mb=round(rss / 2 ** 20, 1),
+            inputs=state['inputs'],
+            outputs=self._sizes(outputs)
+        )
+
+        os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+
+        with open(self.path, 'a') as f:
+            f.write(json.dumps(record) + '\n')
+
+        log.info(f'telemetry {node.name}: {wall:.2f}s wall, {cpu:.2f}s cpu, '
+                 f'{record["peak_rss_mb"]} MB peak rss')
+
+        metrics = dict(
+            wall_time=wall,
+            cpu_time=cpu,
+            peak_rss_mb=record['peak_rss_mb'],
+            input_rows=sum(x['rows'] or 0 for x in record['inputs'].values()),
+            input_bytes=sum(x['bytes'] or 0 for x in record['inputs'].values()),
+            output_rows=sum(x['rows'] or 0 for x in record['outputs'].values()),
+            output_bytes=sum(x['bytes'] or 0 for x in record['outputs'].values())
+        )
+
+        self._log_metrics(node.name, metrics)
+
+    # ......................... #
+
+    def _log_metrics(self, prefix: str, metrics: Dict[str, float]) -> None:
+
+        if self._client is None or self._mlflow_run is None:
+            return
+
+        stamp = int(time.time() * 1000)
+        batch = [ Metric(f'{prefix}.{k}', float(v), stamp, self._step) for k, v in metrics.items() ]
+        self._step += 1
+
+        self._mlflow(
+            self._client.log_batch, 
+            self._mlflow_run.info.run_id, 
+            metrics=batch
+        )
+
+    # ......................... #
+
+    @hook_impl
+    def on_node_error(self, node: Node) -> None:
+
+        state = self._nodes.pop(node.name, None)
+
+        if state is not None:
+            state['sampler'].stop()
+
+    # ......................... #
+
+    def _finish(self, status: str) -> None:
+
+        if self._client is not None and self._mlflow_run is not None:
+            self._mlflow(self._client.set_terminated, self._mlflow_run.info.run_id, status)
+
+        self._mlflow_run = None
+
+    # ......................... #
+
+    @hook_impl
+    def after_pipeline_run(self) -> None:
+        self._finish('FINISHED')
+
+    # ......................... #
+
+    @hook_impl
+    def on_pipeline_error(self) -> None:
+        self._finish('FAILED')
+
+# ------------------------- #
@@ -9,7 +9,8 @@ import logging
 import datetime
 import vaex
 
-from carousel_ranking_v2.extras import io, vx
+from carousel_ranking_v2.extras import vx
+from carousel_ranking_v2.extras.utils.partitions import DayPartitionStore
 from carousel_ranking_v2.extras.utils.typing import *
 
 from .subnodes import *
@@ -63,56 +64,81 @@ def merge_app_events(
     :rtype: vaex.dataframe.DataFrame
     """
     
-    ae = app_events.table
-    aex = app_events_extended.table
-    conn = app_events.conn
-
     fetch_conf = config['events']
     preproc_conf = config['events_preprocessing']
 
-    app_events_extended.conn.close()
-
     ae_cols = app_events.columns
     aex_cols = app_events_extended.columns
 
     ae_column_names, ae_dtypes = extract_cols_info(ae_cols)
     aex_column_names, aex_dtypes = extract_cols_info(aex_cols)
-    column_names = ae_column_names + aex_column_names
+    column_names = aex_column_names + ae_column_names
     dtypes = {**ae_dtypes, **aex_dtypes}
 
-    columns = [aex.columns[k] for k in aex_column_names] + \
-              [ae.columns[k] for k in ae_column_names]
-                 
+    columns = resolve_columns(app_events_extended, aex_column_names) + \
+              resolve_columns(app_events, ae_column_names)
+
+    ae = app_events.table
+    aex = app_events_extended.table
+
+    start = window_start(fetch_conf)
 
     query = (db
         .select([aex])
         .with_only_columns(columns)
-        .where(aex.columns.event_timestamp >= datetime.datetime.now() - datetime.timedelta(days=fetch_conf['period']))
+        .where(aex.columns.event_timestamp >= start)
         #.where(func.length(ae.columns.anonymous_user_id) > 20)
         .where(aex.columns.offer_id != None)
         .join(ae, (aex.columns.event_id == ae.columns.event_id) and (aex.columns.event_timestamp == ae.columns.event_timestamp))
-        .limit(fetch_conf['limit'])
     )
 
-    log.info(f'query execution started')
-    res = conn.execution_options(stream_results=True).execute(query)
-    log.info(f'query execution finished')
+    # incremental mode: pull only rows newer than the stored
+    # high-watermark into day partitions
+
+    store = None
 
-    df = io.fetch_chunkwise(
-        res,
-        column_names,
-        chunksize=fetch_conf['chunksize'],
+    if fetch_conf.get('incremental'):
+
+        store = DayPartitionStore(
+            fetch_conf['store'], 
+            column='event_timestamp', 
+            period=fetch_conf['period']
+        )
+        store.evict()
+        watermark = store.watermark()
+
+        if watermark is not None:
+            log.info(f'incremental extraction after {watermark=}')
+            query = query.where(aex.columns.event_timestamp > watermark)
+            start = max(start, datetime.datetime.fromisoformat(watermark))
+
+    df = fetch_query(
+        app_events,
+        query,
+        fetch_conf,
+        start=start,
+        columns=dict(
+            time=aex.columns.event_timestamp, 
+            hash=aex.columns.event_id
+        ),
+        column_names=column_names,
         dtypes=dtypes,
-        droplist=['event_id']
+        droplist=['event_id'],
+        constants=dict() if store else dict(refresh_date=dyn_params['refdate'])
     )
 
-    del res
+    if store is not None:
+
+        if df is not None:
+            store.append(df)
+
+        df = store.open()
+        df = vx.constant(df, 'refresh_date', dyn_params['refdate'])
+
     gc.collect()
 
     # preprocessing
 
-    df = vx.constant(df, 'refresh_date', dyn_params['refdate'])
-
     log.critical(df.dtypes)
     log.critical(df)
 
@@ -149,44 +175,53 @@ def pull_transactions(
     :rtype: vaex.dataframe.DataFrame
     """
     
-    tr = transactions.table
-    conn = transactions.conn
     cols = transactions.columns
     fetch_conf = config['transactions']
     preproc_conf = config['transactions_preprocessing']
 
     column_names, dtypes = extract_cols_info(cols)
-    columns = [tr.columns[k] for k in column_names]
+    columns = resolve_columns(transactions, column_names)
+    tr = transactions.table
+
+    start = window_start(fetch_conf)
 
     query = (db
             .select([tr])
             .with_only_columns(columns)
-            .where(tr.columns.createddatetime >= datetime.datetime.now() - datetime.timedelta(days=fetch_conf['period']))
+            .where(tr.columns.createddatetime >= start)
             .where(tr.columns.luckyuserid != None)
-            .limit(fetch_conf['limit'])
         )
     
-    log.info(f'query execution started')
-    res = conn.execution_options(stream_results=True).execute(query)
-    log.info(f'query execution finished')
-    
-    df = io.fetch_chunkwise(
-        res,
-        column_names,
-        chunksize=fetch_conf['chunksize'],
+    df = fetch_query(
+        transactions,
+        query,
+        fetch_conf,
+        start=start,
+        columns=dict(
+            time=tr.columns.createddatetime, 
+            hash=tr.columns.luckyuserid
+        ),
+        column_names=column_names,
         dtypes=dtypes
     )
 
-    del res
     gc.collect()
 
-    df = vx.constant(df, 'refresh_date', dyn_params['refdate'])
+    # fused: each column is read and written once, refresh_date never materializes
+
+    steps = vx.plan(df).constant('refresh_date', dyn_params['refdate'])
 
     for value, cols in preproc_conf['fillna'].items():
-        df = vx.fillna(df, cols, value)
+        steps = steps.fillna(cols, value)
     
-    df = vx.datetime(df, preproc_conf['datetime'], dyn_params['unkdate'])
-    df = vx.days_difference(df, preproc_conf['days_difference'], 'refresh_date')
+    steps = steps.datetime(preproc_conf['datetime'], dyn_params['unkdate'])
+    steps = steps.days_difference(
+        preproc_conf['days_difference'], 
+        'refresh_date', 
+        dtype=preproc_conf.get('days_dtype', 'int32')
+    )
+
+    df = steps.collect()
 
     return df
 
@@ -34,7 +34,7 @@ def create_pipeline(local: bool = False, **kwargs):
                         config="pulling_config",
                         dyn_params="dyn_params"
                     ),
-                    "app_events_merged",
+                    "app_events_merged@vaex",
                     name="merge_app_events"
                 ),
                 # node(
@@ -1,8 +1,14 @@
 from typing import Any, Dict, List
 import re
+import math
 import logging
+import datetime
+import sqlalchemy as db
 
 from carousel_ranking_v2.extras.utils.typing import *
+from carousel_ranking_v2.extras.utils import io, extract, checkpoint, arrow
+from carousel_ranking_v2.extras.utils.categories import CategoryDictionary, CATEGORY
+from carousel_ranking_v2.extras.datasets.schema_cache import is_column_mismatch
 from carousel_ranking_v2.extras.df import vaex as vx
 
 log = logging.getLogger(__name__)
@@ -13,7 +19,7 @@ def extract_cols_info(cols: Dict[str, Any]):
 
     column_names = list(cols.keys())
     dtypes = dict(
-        (col, dty) if dty is None else (col, eval(dty))
+        (col, dty) if dty is None or dty == CATEGORY else (col, eval(dty))
         for col, dty in cols.items()
     )
 
@@ -21,6 +27,190 @@ def extract_cols_info(cols: Dict[str, Any]):
 
 # ------------------------- #
 
+def window_start(fetch_conf: Config) -> datetime.datetime:
+
+    # checkpointed extractions are keyed by their query, the window is
+    # floored to the hour so a retry within the hour resumes
+
+    start = datetime.datetime.now() - datetime.timedelta(days=fetch_conf['period'])
+
+    if fetch_conf.get('checkpoint'):
+        start = start.replace(minute=0, second=0, microsecond=0)
+
+    return start
+
+# ------------------------- #
+
+def resolve_columns(source: RedshiftTableConn, names: List[str]) -> List[db.Column]:
+
+    # a configured column missing from cached table metadata reflects the
+    # table again once, `source.table` is the fresh table afterwards
+
+    return source.resolve(names)
+
+# ------------------------- #
+
+def _invalidate_on_mismatch(source: RedshiftTableConn, exc: Exception) -> None:
+
+    # other database errors (permissions, syntax, timeouts) keep the cache
+
+    if is_column_mismatch(exc):
+        log.warning(f'column mismatch, invalidating cached schema: {exc}')
+        source.invalidate_schema()
+
+# ------------------------- #
+
+def fetch_query(
+
+        source: RedshiftTableConn,
+        query: Any,
+        fetch_conf: Config,
+        start: datetime.datetime,
+        columns: Dict[str, db.Column],
+        column_names: List[str],
+        dtypes: Dict[str, Any],
+        droplist: List[str] = list(),
+        constants: Dict[str, Any] = dict()
+
+    ) -> VaexDataFrame:
+
+    parallelism = fetch_conf.get('parallelism', 1)
+    dictionary = None
+    resumable = None
+
+    # arrow type per column from the catalog dtypes or the selected sql
+    # columns, every chunk and partition is built with the same types
+
+    types = arrow.column_types(
+        column_names, 
+        dtypes, 
+        dict((c.name, c.type) for c in reversed(list(query.selected_columns)))
+    )
+
+    if CATEGORY in dtypes.values():
+        dictionary = CategoryDictionary.shared(fetch_conf['dictionary'])
+
+    if fetch_conf.get('checkpoint'):
+        resumable = dict(
+            key_column=columns['time'],
+            retries=fetch_conf.get('retries', 3),
+            backoff=fetch_conf.get('backoff', 5.),
+            ttl=fetch_conf.get('checkpoint_ttl', 3600)
+        )
+
+    if parallelism > 1:
+
+        split_by = fetch_conf.get('split_by', 'time')
+        end = None if resumable is None else \
+              datetime.datetime.now().replace(minute=0, second=0, microsecond=0)
+        conditions = extract.split_conditions(
+            columns[split_by],
+            split_by=split_by,
+            parallelism=parallelism,
+            start=start,
+            end=end
+        )
+        limit = math.ceil(fetch_conf['limit'] / parallelism)
+        queries = [ query.where(c) for c in conditions ]
+
+        if resumable is None:
+            queries = [ q.limit(limit) for q in queries ]
+
+        else:
+            resumable['limit'] = limit
+
+        log.info(f'parallel extraction: {parallelism} partitions split by {split_by}')
+
+        try:
+            return extract.fetch_parallel(
+                source.checkout,
+                queries,
+                column_names,
+                chunksize=fetch_conf['chunksize'],
+                dtypes=dtypes,
+                droplist=droplist,
+                builder=fetch_conf.get('builder', 'pandas'),
+                workers=fetch_conf.get('workers', 1),
+                queue_depth=fetch_conf.get('queue_depth', 0),
+                row_group_size=fetch_conf.get('row_group_size'),
+                constants=constants,
+                dictionary=dictionary,
+                resumable=resumable,
+                types=types
+            )
+
+        except db.exc.ProgrammingError as exc:
+            _invalidate_on_mismatch(source, exc)
+            raise
+
+    if resumable is not None:
+
+        try:
+            path = checkpoint.fetch_resumable(
+                source.checkout,
+                query,
+                column_names=column_names,
+                chunksize=fetch_conf['chunksize'],
+                dtypes=dtypes,
+                droplist=droplist,
+                limit=fetch_conf['limit'],
+                builder=fetch_conf.get('builder', 'pandas'),
+                row_group_size=fetch_conf.get('row_group_size'),
+                constants=constants,
+                dictionary=dictionary,
+                types=types,
+                **resumable
+            )
+
+        except db.exc.ProgrammingError as exc:
+            _invalidate_on_mismatch(source, exc)
+            raise
+
+        if path is None:
+            log.warning('query returned no rows')
+            return None
+
+        return io.open_spool(path)
+
+    log.info(f'query execution started')
+
+    try:
+
+        try:
+            res = source.conn.execution_options(stream_results=True).execute(
+                query.limit(fetch_conf['limit'])
+            )
+
+        except db.exc.ProgrammingError as exc:
+            _invalidate_on_mismatch(source, exc)
+            raise
+
+        log.info(f'query cursor opened')
+
+        df = io.fetch_chunkwise(
+            res,
+            column_names,
+            chunksize=fetch_conf['chunksize'],
+            dtypes=dtypes,
+            droplist=droplist,
+            builder=fetch_conf.get('builder', 'pandas'),
+            workers=fetch_conf.get('workers', 1),
+            queue_depth=fetch_conf.get('queue_depth', 0),
+            row_group_size=fetch_conf.get('row_group_size'),
+            constants=constants,
+            dictionary=dictionary,
+            types=types
+        )
+
+        del res
+
+    finally:
+        source.close()
+
+    return df
+
+# ------------------------- #
+
 def preprocess_channels(data: VaexDataFrame) -> VaexDataFrame:
 
     df = data.copy()
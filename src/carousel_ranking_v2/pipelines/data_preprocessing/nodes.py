@@ -3,7 +3,6 @@ import gc
 import logging
 import vaex
 from vaex.ml import LabelEncoder
-from kedro.extras.decorators.memory_profiler import mem_profile
 
 from carousel_ranking_v2.extras.df import vaex as vx
 from carousel_ranking_v2.extras.utils.typing import *
@@ -13,7 +12,6 @@ log = logging.getLogger(__name__)
 
 # ------------------------- #
 
-@mem_profile
 def extract_uid_mapping(app_events_merged: VaexDataFrame) -> VaexDataFrame:
 
     uid = 'user_id'
@@ -52,7 +50,6 @@ def extract_uid_mapping(app_events_merged: VaexDataFrame) -> VaexDataFrame:
 
 # ------------------------- #
 
-@mem_profile
 def preprocess_events_for_segmentation(
 
         app_events_merged: VaexDataFrame,
@@ -97,13 +94,16 @@ def preprocess_events_for_segmentation(
     uids = grp2.unique(grp2.anonymous_user_id)
 
     grp2 = vx.drop(grp2, ['anonymous_user_id'])
-    grp2, _ = vx.scale(grp2, grp2.get_column_names())
+    grp2, scaler = vx.scale(
+            grp2, 
+            grp2.get_column_names(), 
+            dtype=config.get('scale_dtype', 'float64')
+        )
     
-    return grp2, uids
+    return grp2, uids, scaler.to_dict()
 
 # ------------------------- #
 
-@mem_profile
 def preprocess_events_for_ranking(
 
         app_events_merged: VaexDataFrame,
@@ -132,28 +132,34 @@ def preprocess_events_for_ranking(
     for segment in aem.unique(aem.segment):
 
         data = aem[aem.segment == segment]
-        data, _ = vx.onehotenc(data, config['onehotenc'])
-        offer_cols = [ c for c in data.get_column_names() 
-                    if c.startswith('offer_id') ]
 
-        for c in offer_cols:
-            data[c] *= data['event_type']
-        
-        data = vx.drop(data, config['drop'])
-        splitted_data[segment] = data
+        # offer one-hots weighted by event_type and summed per user,
+        # kept sparse (users x offers) instead of one column per offer
+
+        data, _ = vx.onehotenc(
+                data, 
+                config['onehotenc'], 
+                sparse=True,
+                key='anonymous_user_id',
+                values='event_type'
+            )
+        splitted_data[segment] = data.sum_by()
 
     return splitted_data
 
 # ------------------------- #
 
-@mem_profile
 def preprocess_transactions_for_ranking(
 
         transactions: VaexDataFrame,
+        config: Config
 
     ) -> VaexDataFrame:
 
     tr = transactions.copy()
+    config = config['transactions']
+
+    tr = vx.expressions(tr, config.get('expressions', list()), materialize=True)
 
     return tr
 
@@ -9,7 +9,7 @@ def create_pipeline(**kwargs):
             node(
                 extract_uid_mapping,
                 dict(
-                    app_events_merged="app_events_merged"
+                    app_events_merged="app_events_merged@uid_pairs"
                 ),
                 "uid_aid_mapping",
                 name="extract_uid-aid_mapping"
@@ -17,20 +17,21 @@ def create_pipeline(**kwargs):
             node(
                 preprocess_events_for_segmentation,
                 dict(
-                    app_events_merged="app_events_merged",
+                    app_events_merged="app_events_merged@segmentation",
                     config="segmentation_config",
                     event_weights="event_weights"
                 ),
                 [
                     "app_events_segmentation",
-                    "anon_ids_for_segmentation"
+                    "anon_ids_for_segmentation",
+                    "segmentation_scaler"
                 ],
                 name="preprocess_events_for_segmentation"
             ),
             node(
                 preprocess_events_for_ranking,
                 dict(
-                    app_events_merged="app_events_merged",
+                    app_events_merged="app_events_merged@ranking",
                     aid_segm_mapping="aid_segm_mapping",
                     offer_eg="offer_eg",
                     config="ranking_config", 
@@ -40,5 +41,14 @@ def create_pipeline(**kwargs):
                 "app_events_ranking",
                 name="preprocess_events_for_ranking"
             ),
+            # node(
+            #     preprocess_transactions_for_ranking,
+            #     dict(
+            #         transactions="transactions",
+            #         config="ranking_config"
+            #     ),
+            #     "transactions_ranking",
+            #     name="preprocess_transactions_for_ranking"
+            # ),
         ]
     )
@@ -51,25 +51,6 @@ def preprocess_anon_uid(data: VaexDataFrame) -> VaexDataFrame:
 
 # ------------------------- #
 
-def __build_histogram(
-
-        tag: str = 'activity',
-        subcondition: str = None,
-        period: int = 35
-
-    ) -> List[Tuple[str]]:
-
-    histogram = [ (f'event_timestamp == {day}', 
-                  'event_weight', f'activity_{day}', 'sum') 
-                  if subcondition is None else
-                  (f'(event_timestamp == {day}) & ({subcondition})', 
-                  'event_weight', f'{tag}_{day}', 'sum')
-                  for day in range(1, period) ]
-    
-    return histogram
-
-# ------------------------- #
-
 def add_event_weights(
     
         data: VaexDataFrame,
@@ -94,24 +75,23 @@ def get_activity_characteristics(
     
     ) -> VaexDataFrame:
 
-    df = data.copy()
+    # activity_{day} and hist_*_{day} sums of event_weight per user
+    # computed in one binned pass (see vx.binned_sums)
 
-    groups = [
-        (None, 'event_timestamp', 'activity_std', 'std'),
-        (None, 'event_timestamp', 'activity_mean', 'mean')
-    ]
+    conditions = dict(activity=None)
 
-    # build event histogram
-    groups += __build_histogram(period=period)
-    
     for h in histograms:
-        groups += __build_histogram(
-                period=period, 
-                subcondition=h,
-                tag=f'hist_{"_".join(h.split())}'
-            )
-
-    df = vx.groupby(df, by='anonymous_user_id', groups=groups)
+        conditions[f'hist_{"_".join(h.split())}'] = h
+
+    df = vx.binned_sums(
+            data,
+            by='anonymous_user_id',
+            bin_col='event_timestamp',
+            value='event_weight',
+            period=period,
+            conditions=conditions,
+            moments=dict(activity='event_timestamp')
+        )
 
     return df
 
@@ -170,11 +150,8 @@ def filter_suitable_offers(
 
     ) -> VaexDataFrame:
 
-    df = data.copy()
-    
     offer_set = __get_offer_set(offer_eg, refresh)
-    query = 'df.offer_id == ' + ' | df.offer_id == '.join(map(str, offer_set))
-    df = df.filter(eval(query))
+    df = vx.filt(data, 'offer_id in offers', offers=offer_set)
 
     return df
 
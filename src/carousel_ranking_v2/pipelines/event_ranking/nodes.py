@@ -5,6 +5,7 @@ import tensorflow as tf
 from carousel_ranking_v2.extras.ml.keras.models import DeepAutoRec
 from carousel_ranking_v2.extras.ml.keras.losses import MMSE
 from carousel_ranking_v2.extras.ml.keras.callbacks import KerasTqdmBar
+from carousel_ranking_v2.extras.df.sparse import SparseFrame
 from carousel_ranking_v2.extras.utils.typing import *
 
 log = logging.getLogger(__name__)
@@ -13,7 +14,7 @@ log = logging.getLogger(__name__)
 
 def event_based_ranking(
 
-        app_events_ranking: Dict[str, VaexDataFrame],
+        app_events_ranking: Dict[str, SparseFrame],
         config: Config,
         clip: Tuple[float] = (0, 37)
 
@@ -26,14 +27,15 @@ def event_based_ranking(
         data = app_events_ranking.get(segment) 
 
         #? loaded as bound method for unexpected reason
-        data = data().to_pandas_df()
+        data = data()
+
+        # already summed per user, densified only for the model input
         data = (data
-                    .groupby('anonymous_user_id')
-                    .sum()
+                    .clip(*clip)
+                    .drop_empty()
+                    .to_pandas()
                     .reset_index(drop=True)
                 )
-        data = data.clip(*clip)
-        data = data[data.max(axis=1) != 0]
 
         model = DeepAutoRec(data_shape=data.shape)
         optimizer = tf.keras.optimizers.Adam(**config['optimizer'])
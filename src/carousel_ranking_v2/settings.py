@@ -1,11 +1,11 @@
-from carousel_ranking_v2.hooks import ProjectHooks
+from carousel_ranking_v2.hooks import ProjectHooks, NodeCacheHooks, TelemetryHooks
 from kedro_viz.integrations.kedro.sqlite_store import SQLiteStore
 from pathlib import Path
 
 # ------------------------- #
 
 # Instantiate and list your project hooks here
-HOOKS = (ProjectHooks(),)
+HOOKS = (ProjectHooks(), NodeCacheHooks(), TelemetryHooks())
 
 # List the installed plugins for which to disable auto-registry
 # DISABLE_HOOKS_FOR_PLUGINS = ("kedro-viz",)
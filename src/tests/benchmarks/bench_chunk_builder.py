@@ -0,0 +1,127 @@
+"""
+Benchmark of the pandas and arrow chunk builders used by ``io.fetch_chunkwise``.
+
+Synthetic cursor rows mimic the merged app events (``conf/base/catalog.yml``),
+run from ``src`` with::
+
+    python -m tests.benchmarks.bench_chunk_builder --rows 400000
+"""
+import os
+import time
+import uuid
+import random
+import argparse
+import datetime
+import tempfile
+
+from carousel_ranking_v2.extras.utils import io
+
+# ------------------------- #
+
+COLUMNS = [
+    'event_id', 'event_type', 'offer_id', 'merchant_id', 'category_id',
+    'channels', 'is_attribution_event', 'event_timestamp', 'user_id',
+    'language', 'anonymous_user_id', 'event_id'
+]
+
+DTYPES = dict(
+    event_timestamp=str,
+    user_id=str,
+    language=str,
+    anonymous_user_id=str,
+    event_id=None,
+    event_type=None,
+    offer_id=None,
+    merchant_id=None,
+    category_id=None,
+    channels=None,
+    is_attribution_event=None
+)
+
+EVENT_TYPES = [
+    'discover_view_offer', 'discover_offer_impression', 'redeem_get_offer',
+    'discover_load_feed', 'discover_tap_favorite', 'redeem_tap_redeem'
+]
+
+# ------------------------- #
+
+def synthetic_rows(n: int, seed: int = 0) -> list:
+
+    rnd = random.Random(seed)
+    start = datetime.datetime(2022, 3, 1)
+    users = [ str(uuid.UUID(int=rnd.getrandbits(128))) for _ in range(1000) ]
+    rows = list()
+
+    for i in range(n):
+        event_id = str(i)
+        rows.append((
+            event_id,
+            rnd.choice(EVENT_TYPES),
+            rnd.randint(1, 3000),
+            rnd.choice([None, rnd.randint(1, 500)]),
+            rnd.choice([None, rnd.randint(1, 40)]),
+            rnd.choice([None, '["in_store"]', '["online","delivery"]']),
+            rnd.random() < 0.1,
+            start + datetime.timedelta(seconds=rnd.randint(0, 35 * 86400)),
+            rnd.choice([None, str(rnd.randint(1, 10 ** 6))]),
+            rnd.choice(['en', 'ar']),
+            rnd.choice(users),
+            event_id
+        ))
+
+    return rows
+
+# ------------------------- #
+
+def bench_pandas(rows: list, savepath: str) -> float:
+
+    start = time.perf_counter()
+    spool = io.ParquetSpool(savepath)
+    spool.write(io.build_pandas_chunk(rows, COLUMNS, DTYPES, ['event_id']))
+    spool.close()
+
+    return time.perf_counter() - start
+
+# ------------------------- #
+
+def bench_arrow(rows: list, savepath: str) -> float:
+
+    start = time.perf_counter()
+    spool = io.ParquetSpool(savepath)
+    spool.write(io.build_arrow_batch(rows, COLUMNS, DTYPES, ['event_id']))
+    spool.close()
+
+    return time.perf_counter() - start
+
+# ------------------------- #
+
+def main(rows: int, repeat: int) -> dict:
+
+    data = synthetic_rows(rows)
+    results = dict()
+
+    with tempfile.TemporaryDirectory() as tmp:
+
+        for name, fn in [('pandas', bench_pandas), ('arrow', bench_arrow)]:
+
+            times = [ fn(data, os.path.join(tmp, f'{name}_{i}.parquet'))
+                      for i in range(repeat) ]
+            best = min(times)
+            results[name] = dict(seconds=best, rows_per_sec=rows / best)
+
+            print(f'{name:>7}: {best:.3f}s ({rows / best:,.0f} rows/s)')
+
+    print(f'speedup: {results["pandas"]["seconds"] / results["arrow"]["seconds"]:.2f}x')
+
+    return results
+
+# ------------------------- #
+
+if __name__ == '__main__':
+
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--rows', type=int, default=400000)
+    parser.add_argument('--repeat', type=int, default=3)
+    args = parser.parse_args()
+
+    main(args.rows, args.repeat)
@@ -0,0 +1,92 @@
+"""
+End-to-end timing of a pipeline against the local redshift stand-in.
+
+Synthetic tables are generated once per scale (``--events``) and reused,
+run from the project root with ``PYTHONPATH=src``::
+
+    python -m tests.benchmarks.bench_offline_run --events 1000000
+"""
+import os
+import json
+import time
+import argparse
+from pathlib import Path
+
+import yaml
+from kedro.framework.session import KedroSession
+from kedro.framework.startup import bootstrap_project
+
+from carousel_ranking_v2.extras.datasets.engines import sqlite_path
+from carousel_ranking_v2.extras.utils import synthetic
+
+# ------------------------- #
+
+OFFLINE_PATH = 'data/01_raw/offline_redshift'
+EVENT_WEIGHTS = 'conf/base/processing/event_weights.yml'
+MARKER = '_scale.json'
+
+# ------------------------- #
+
+def ensure_data(events: int, seed: int, rebuild: bool = False) -> float:
+
+    # regenerates only when the requested scale or seed changed
+
+    marker = os.path.join(OFFLINE_PATH, MARKER)
+    scale = dict(events=events, seed=seed)
+
+    if not rebuild and os.path.exists(marker) and \
+       os.path.exists(sqlite_path(OFFLINE_PATH, 'stg_amplitude')):
+
+        with open(marker, 'r') as f:
+            if json.load(f) == scale:
+                return 0.
+
+    with open(EVENT_WEIGHTS, 'r') as f:
+        weights = yaml.safe_load(f)
+
+    start = time.perf_counter()
+    synthetic.generate(OFFLINE_PATH, events=events, event_weights=weights, seed=seed)
+    elapsed = time.perf_counter() - start
+
+    with open(marker, 'w') as f:
+        json.dump(scale, f)
+
+    return elapsed
+
+# ------------------------- #
+
+def main(events: int, pipeline: str, seed: int, rebuild: bool) -> dict:
+
+    generation = ensure_data(events, seed, rebuild)
+    bootstrap_project(Path.cwd())
+
+    start = time.perf_counter()
+
+    with KedroSession.create('carousel_ranking_v2', env='offline') as session:
+        session.run(pipeline_name=pipeline)
+
+    elapsed = time.perf_counter() - start
+    results = dict(
+        events=events,
+        pipeline=pipeline,
+        generation_seconds=round(generation, 3),
+        run_seconds=round(elapsed, 3),
+        events_per_sec=events / elapsed
+    )
+
+    print(f'{pipeline}: {elapsed:.1f}s for {events:,} events ({events / elapsed:,.0f} events/s)')
+
+    return results
+
+# ------------------------- #
+
+if __name__ == '__main__':
+
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--events', type=int, default=1000000)
+    parser.add_argument('--pipeline', default='__default__')
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--rebuild', action='store_true')
+    args = parser.parse_args()
+
+    main(args.events, args.pipeline, args.seed, args.rebuild)
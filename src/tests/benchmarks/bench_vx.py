@@ -0,0 +1,273 @@
+"""
+Micro-benchmarks of the ``extras.df.vaex`` helpers on synthetic frames.
+
+Every helper runs on 100k, 1M and 10M rows by default and records the best
+wall time, peak RSS and rows/s. Results are written as a JSON baseline and a
+later run can be compared against it, run from ``src`` with::
+
+    python -m tests.benchmarks.bench_vx --output ../data/08_reporting/bench_vx.json
+    python -m tests.benchmarks.bench_vx --compare ../data/08_reporting/bench_vx.json
+
+``--compare`` exits with status 1 when a case is slower than the baseline
+by more than ``--threshold`` (relative wall time).
+"""
+import gc
+import os
+import sys
+import json
+import time
+import argparse
+import platform
+from typing import Any, Callable, Dict, List, Tuple
+
+import numpy as np
+import vaex
+
+from carousel_ranking_v2.extras.df import vaex as vx
+from carousel_ranking_v2.extras.utils.telemetry import RSSSampler
+
+# ------------------------- #
+
+SIZES = [100000, 1000000, 10000000]
+
+EVENT_TYPES = np.array([
+    'discover_view_offer', 'discover_offer_impression', 'redeem_get_offer',
+    'discover_load_feed', 'discover_tap_favorite', 'redeem_tap_redeem'
+])
+
+GROUPS = [
+    ('(event_type == "discover_view_offer") & (days < 8)', 'event_type', 'views_7d', 'count'),
+    ('(event_type == "redeem_get_offer") & (days < 31)', 'event_type', 'redeem_get_30d', 'count'),
+    (None, 'value', 'value_mean', 'mean')
+]
+
+# ------------------------- #
+
+def synthetic_frame(n: int, seed: int = 0) -> vaex.dataframe.DataFrame:
+
+    rng = np.random.default_rng(seed)
+    start = np.datetime64('2022-03-01T00:00:00')
+    ts = start + rng.integers(0, 35 * 86400, n).astype('timedelta64[s]')
+
+    merchant = rng.integers(1, 500, n).astype('float64')
+    merchant[rng.random(n) < 0.1] = np.nan
+
+    return vaex.from_arrays(
+        anonymous_user_id=rng.integers(0, max(n // 50, 1), n),
+        event_type=EVENT_TYPES[rng.integers(0, len(EVENT_TYPES), n)].astype(object),
+        offer_id=rng.integers(1, 3000, n),
+        merchant_id=merchant,
+        category_id=rng.integers(1, 40, n),
+        language=np.where(rng.random(n) < 0.7, 'en', 'ar').astype(object),
+        event_timestamp=np.datetime_as_string(ts, unit='s').astype(object),
+        refresh_date=np.full(n, '2022-04-05', dtype=object),
+        event_datetime=ts,
+        refresh_datetime=np.full(n, np.datetime64('2022-04-05T00:00:00')),
+        days=rng.integers(0, 35, n),
+        value=rng.lognormal(3.5, 0.8, n)
+    )
+
+# ------------------------- #
+
+def _numeric(df: vaex.dataframe.DataFrame) -> vaex.dataframe.DataFrame:
+    return df[['offer_id', 'category_id', 'days', 'value']]
+
+# ------------------------- #
+
+# name -> (setup, run), setup is excluded from timing and
+# run must force evaluation of everything it computes
+
+CASES: Dict[str, Tuple[Callable, Callable]] = dict(
+
+    datetime=(
+        lambda df: df,
+        lambda df: vx.datetime(df, ['event_timestamp'], '2022-04-05')
+    ),
+
+    days_difference=(
+        lambda df: df,
+        lambda df: vx.days_difference(df, ['event_datetime'], 'refresh_datetime')
+    ),
+
+    fillna=(
+        lambda df: df,
+        lambda df: vx.fillna(df, ['merchant_id'], -1)
+    ),
+
+    onehotenc=(
+        lambda df: df,
+        lambda df: vx.onehotenc(df, ['language', 'category_id'], materialize=True)
+    ),
+
+    onehotenc_sparse=(
+        lambda df: df,
+        lambda df: vx.onehotenc(df, ['offer_id'], sparse=True, key='anonymous_user_id', values='value')[0].sum_by()
+    ),
+
+    scale=(
+        _numeric,
+        lambda df: vx.scale(df, ['value'], exclude=['offer_id'])
+    ),
+
+    scale_float32=(
+        _numeric,
+        lambda df: vx.scale(df, ['value'], exclude=['offer_id'], dtype='float32')
+    ),
+
+    groupby=(
+        lambda df: df,
+        lambda df: vx.groupby(df, 'anonymous_user_id', GROUPS)
+    ),
+
+    binned_sums=(
+        lambda df: df,
+        lambda df: vx.binned_sums(
+            df, 'anonymous_user_id', 'days', 'value', 35,
+            dict(activity=None, hist_views='event_type == "discover_view_offer"'),
+            moments=dict(activity='days')
+        )
+    ),
+
+    chain=(
+        lambda df: df,
+        lambda df: vx.days_difference(
+            vx.datetime(vx.fillna(df, ['merchant_id'], -1), ['event_timestamp', 'refresh_date'], '2022-04-05'),
+            ['event_timestamp'], 'refresh_date'
+        )
+    ),
+
+    plan=(
+        lambda df: df,
+        lambda df: vx.plan(df)
+            .fillna(['merchant_id'], -1)
+            .datetime(['event_timestamp', 'refresh_date'], '2022-04-05')
+            .days_difference(['event_timestamp'], 'refresh_date')
+            .collect()
+    ),
+
+    categorical=(
+        lambda df: df,
+        lambda df: vx.categorical(df, ['event_type'])
+    ),
+
+    filt=(
+        lambda df: df,
+        lambda df: len(vx.filt(df, 'df.event_type == "discover_view_offer"').extract())
+    )
+
+)
+
+# ------------------------- #
+
+def run_case(name: str, df: vaex.dataframe.DataFrame, repeat: int) -> Dict[str, float]:
+
+    setup, run = CASES[name]
+    data = setup(df)
+    times, peaks = list(), list()
+
+    for _ in range(repeat):
+
+        gc.collect()
+
+        with RSSSampler(interval=0.005) as sampler:
+            base = sampler.rss()
+            start = time.perf_counter()
+            run(data)
+            times.append(time.perf_counter() - start)
+
+        peaks.append(sampler.peak - base)
+
+    best = min(times)
+
+    return dict(
+        seconds=best,
+        rows_per_sec=len(df) / best,
+        peak_rss_mb=max(peaks) / 2 ** 20
+    )
+
+# ------------------------- #
+
+def main(sizes: List[int], cases: List[str], repeat: int) -> Dict[str, Any]:
+
+    results = dict()
+
+    for n in sizes:
+
+        df = synthetic_frame(n)
+
+        for name in cases:
+
+            key = f'{name}/{n}'
+            results[key] = run_case(name, df, repeat)
+            r = results[key]
+
+            print(f'{key:>24}: {r["seconds"]:8.3f}s {r["rows_per_sec"]:>14,.0f} rows/s '
+                  f'{r["peak_rss_mb"]:>9.1f} MB')
+
+        del df
+        gc.collect()
+
+    return dict(
+        meta=dict(
+            python=platform.python_version(),
+            vaex=vaex.__version__['vaex-core'] if isinstance(vaex.__version__, dict) else vaex.__version__,
+            machine=platform.machine(),
+            cpus=os.cpu_count()
+        ),
+        results=results
+    )
+
+# ------------------------- #
+
+def compare(current: Dict[str, Any], baseline: Dict[str, Any], threshold: float) -> List[str]:
+
+    regressions = list()
+
+    for key, r in current['results'].items():
+
+        if key not in baseline['results']:
+            continue
+
+        ref = baseline['results'][key]['seconds']
+        change = r['seconds'] / ref - 1.
+        flag = 'REGRESSION' if change > threshold else ''
+
+        print(f'{key:>24}: {ref:8.3f}s -> {r["seconds"]:8.3f}s ({change:+.1%}) {flag}')
+
+        if flag:
+            regressions.append(key)
+
+    return regressions
+
+# ------------------------- #
+
+if __name__ == '__main__':
+
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--sizes', type=int, nargs='+', default=SIZES)
+    parser.add_argument('--cases', nargs='+', default=list(CASES), choices=list(CASES))
+    parser.add_argument('--repeat', type=int, default=3)
+    parser.add_argument('--output', default=None, help='write results as a json baseline')
+    parser.add_argument('--compare', default=None, help='json baseline to compare against')
+    parser.add_argument('--threshold', type=float, default=0.15)
+    args = parser.parse_args()
+
+    current = main(args.sizes, args.cases, args.repeat)
+
+    if args.output:
+
+        os.makedirs(os.path.dirname(os.path.abspath(args.output)), exist_ok=True)
+
+        with open(args.output, 'w') as f:
+            json.dump(current, f, indent=2)
+
+    if args.compare:
+
+        with open(args.compare, 'r') as f:
+            baseline = json.load(f)
+
+        regressions = compare(current, baseline, args.threshold)
+
+        if regressions:
+            print(f'{len(regressions)} regression(s) above {args.threshold:.0%}: {regressions}')
+            sys.exit(1)
@@ -0,0 +1,51 @@
+import pytest
+
+from carousel_ranking_v2.extras.datasets.engines import EngineRegistry
+
+
+@pytest.fixture
+def engines():
+    registry = EngineRegistry()
+    yield registry
+    registry.dispose()
+
+
+def key(registry, host, schema='events', **engine_args):
+    return registry.get_engine(
+        host=str(host),
+        user='user',
+        password='password',
+        schema=schema,
+        engine_args=engine_args,
+        dialect='sqlite'
+    )
+
+
+class TestEngineRegistry:
+
+    def test_one_engine_per_configuration(self, engines, tmp_path):
+        first = key(engines, tmp_path)
+
+        assert key(engines, tmp_path) == first
+        assert key(engines, tmp_path, pool_size=2) != first
+        assert key(engines, tmp_path, pool_size=2) == key(engines, tmp_path, pool_size=2)
+        assert key(engines, tmp_path, schema='offers') != first
+        assert engines.engine(key(engines, tmp_path, pool_size=2)).pool.size() == 2
+        assert len(engines.stats()) == 3
+
+    def test_checkouts_are_counted_and_returned(self, engines, tmp_path):
+        k = key(engines, tmp_path)
+
+        with engines.connect(k) as conn:
+            conn.exec_driver_sql('select 1')
+            checked_out = engines.engine(k).pool.checkedout()
+
+        stats = next(iter(engines.stats().values()))
+
+        assert checked_out == 1
+        assert stats['checkouts'] == 1 and stats['peak_checked_out'] == 1
+        assert stats['checked_out'] == 0
+
+    def test_unknown_dialect(self, engines, tmp_path):
+        with pytest.raises(ValueError, match='unknown dialect'):
+            engines.get_engine(str(tmp_path), 'user', 'password', 'events', dialect='mysql')
@@ -0,0 +1,68 @@
+import logging
+
+import pytest
+import sqlalchemy as db
+
+from carousel_ranking_v2.extras.datasets.queries import QueryInstrumentation
+
+
+@pytest.fixture
+def engine():
+    engine = db.create_engine('sqlite://')
+    QueryInstrumentation(label='test', explain=True).attach(engine)
+
+    with engine.begin() as conn:
+        conn.execute(db.text('CREATE TABLE t (id INTEGER, v TEXT)'))
+        conn.execute(db.text("INSERT INTO t VALUES (1, 'aa'), (2, 'bb'), (3, NULL)"))
+
+    yield engine
+
+    engine.dispose()
+
+
+def records(caplog):
+    return [ r for r in caplog.records if r.name == 'carousel_ranking_v2.extras.datasets.queries' ]
+
+
+class TestQueryInstrumentation:
+
+    def test_select_records_rows_bytes_and_plan(self, engine, caplog):
+        caplog.set_level(logging.INFO)
+
+        with engine.connect() as conn:
+            rows = conn.execute(db.text('SELECT id, v FROM t WHERE id > :lo'), dict(lo=0)).fetchall()
+
+        record, = records(caplog)
+
+        assert len(rows) == 3
+        assert record.engine == 'test'
+        assert record.rows == 3
+        assert record.bytes == 3 * 8 + 2 + 2
+        assert record.time_to_first_row is not None
+        assert record.fetch_time >= record.time_to_first_row
+        assert record.statement.startswith('SELECT id, v FROM t')
+        assert record.plan and 'SCAN' in ' '.join(record.plan).upper()
+
+    def test_plans_are_explained_once_per_statement(self, engine, caplog):
+        caplog.set_level(logging.INFO)
+
+        with engine.connect() as conn:
+            for lo in (0, 1):
+                conn.execute(db.text('SELECT id FROM t WHERE id > :lo'), dict(lo=lo)).fetchall()
+
+        first, second = records(caplog)
+
+        assert first.query_id == second.query_id
+        assert first.plan is second.plan
+        assert [ first.rows, second.rows ] == [3, 2]
+
+    def test_other_statements_record_execution_time(self, engine, caplog):
+        caplog.set_level(logging.INFO)
+
+        with engine.begin() as conn:
+            conn.execute(db.text('UPDATE t SET v = NULL'))
+
+        record, = records(caplog)
+
+        assert record.execute_time >= 0
+        assert not hasattr(record, 'rows')
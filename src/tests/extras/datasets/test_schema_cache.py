@@ -0,0 +1,87 @@
+import os
+import time
+
+import pytest
+import sqlalchemy as db
+
+from carousel_ranking_v2.extras.datasets.engines import registry
+from carousel_ranking_v2.extras.datasets.schema_cache import SchemaCache
+from carousel_ranking_v2.extras.datasets.sqlalchemy import RedshiftDataSet, RedshiftFullDataSet
+
+
+@pytest.fixture
+def source(tmp_path):
+    # sqlite stand-in for redshift: schema `events` is events.db in the host directory
+    engine = db.create_engine(f'sqlite:///{tmp_path / "events.db"}')
+
+    with engine.begin() as conn:
+        conn.execute(db.text('CREATE TABLE t (id INTEGER, v TEXT)'))
+        conn.execute(db.text("INSERT INTO t VALUES (1, 'a'), (2, 'b')"))
+
+    yield engine
+
+    engine.dispose()
+    registry.dispose()
+
+
+def add_column(engine):
+    with engine.begin() as conn:
+        conn.execute(db.text('ALTER TABLE t ADD COLUMN w INTEGER'))
+        conn.execute(db.text('UPDATE t SET w = id * 10'))
+
+
+def dataset(tmp_path, cls=RedshiftFullDataSet, **kwargs):
+    return cls(
+        host=str(tmp_path),
+        credentials=dict(user='user', password='password'),
+        table='events.t',
+        dialect='sqlite',
+        schema_cache=dict(path=str(tmp_path / 'schema_cache'), ttl=3600),
+        **kwargs
+    )
+
+
+class TestSchemaCache:
+
+    def test_entries_expire_after_ttl(self, tmp_path, source):
+        cache = SchemaCache(path=str(tmp_path / 'schema_cache'), ttl=60)
+        cache.table('key', 't', db.MetaData(), source)
+
+        assert [ c['name'] for c in cache.get('key') ] == ['id', 'v']
+
+        past = time.time() - 120
+        os.utime(cache._filepath('key'), (past, past))
+
+        assert cache.get('key') is None
+
+    def test_cached_columns_skip_reflection(self, tmp_path, source):
+        cache = SchemaCache(path=str(tmp_path / 'schema_cache'))
+        cache.table('key', 't', db.MetaData(), source)
+        add_column(source)
+
+        assert cache.table('key', 't', db.MetaData(), source).columns.keys() == ['id', 'v']
+
+        cache.invalidate('key')
+
+        assert cache.table('key', 't', db.MetaData(), source).columns.keys() == ['id', 'v', 'w']
+
+
+class TestStaleColumns:
+
+    def test_full_load_reflects_again_and_retries(self, tmp_path, source):
+        dataset(tmp_path, columns=['id', 'v']).load()
+        add_column(source)
+
+        df = dataset(tmp_path, columns=['id', 'w']).load()
+
+        assert list(df.columns) == ['id', 'w']
+        assert df['w'].tolist() == [10, 20]
+
+    def test_resolve_reflects_again(self, tmp_path, source):
+        dataset(tmp_path, columns=['id', 'v']).load()
+        add_column(source)
+
+        table = dataset(tmp_path, cls=RedshiftDataSet).load()
+
+        assert [ c.name for c in table.resolve(['id', 'w']) ] == ['id', 'w']
+        assert table.table.columns.keys() == ['id', 'v', 'w']
@@ -0,0 +1,30 @@
+import os
+
+import numpy as np
+import scipy.sparse as sp
+
+from carousel_ranking_v2.extras.datasets.sparse import SparseMatrixDataSet
+from carousel_ranking_v2.extras.df.sparse import SparseFrame
+
+
+class TestSparseMatrixDataSet:
+
+    def test_round_trip_keeps_missing_keys(self, tmp_path):
+        dataset = SparseMatrixDataSet(str(tmp_path / 'ranking.npz'))
+        frame = SparseFrame(sp.csr_matrix([[1., 0.], [0., 2.]]), ['x', 'y'], np.array(['u1', None], dtype=object))
+
+        dataset.save(frame)
+        loaded = dataset.load()
+
+        assert loaded.index.tolist() == ['u1', None]
+        assert loaded.columns == ['x', 'y']
+        np.testing.assert_array_equal(loaded.matrix.toarray(), frame.matrix.toarray())
+
+    def test_masked_numeric_keys(self, tmp_path):
+        dataset = SparseMatrixDataSet(str(tmp_path / 'ranking.npz'), save_args=dict(compressed=False))
+        index = np.ma.masked_array([7, 8], mask=[False, True])
+
+        dataset.save(SparseFrame(sp.csr_matrix([[1.], [2.]]), ['x'], index))
+
+        assert dataset.load().index.tolist() == [7, None]
+        assert os.listdir(str(tmp_path)) == ['ranking.npz']
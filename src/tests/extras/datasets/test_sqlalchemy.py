@@ -0,0 +1,60 @@
+import pandas as pd
+import pyarrow as pa
+import pytest
+import sqlalchemy as db
+
+from carousel_ranking_v2.extras.datasets.sqlalchemy import _iter_batches
+
+
+@pytest.fixture
+def events():
+    engine = db.create_engine('sqlite://')
+    metadata = db.MetaData()
+    table = db.Table(
+        'events', metadata,
+        db.Column('event_id', db.String),
+        db.Column('merchant_id', db.Integer)
+    )
+    metadata.create_all(engine)
+
+    with engine.begin() as conn:
+        conn.execute(table.insert(), [
+            dict(event_id='a', merchant_id=None),
+            dict(event_id='b', merchant_id=None),
+            dict(event_id='c', merchant_id=7),
+            dict(event_id=None, merchant_id=8),
+        ])
+
+    return engine, table
+
+
+class TestIterBatches:
+
+    def test_arrow_batches_share_one_schema(self, events):
+        engine, table = events
+        batches = list(_iter_batches(engine.connect, db.select([table]), None, 2, output='arrow'))
+
+        assert [ b.schema for b in batches ] == [ batches[0].schema ] * 2
+        assert batches[0].schema.field('merchant_id').type == pa.int64()
+
+    def test_pandas_batches_keep_nullable_ints(self, events):
+        engine, table = events
+        batches = list(_iter_batches(engine.connect, db.select([table]), None, 2))
+
+        assert all(b['merchant_id'].dtype == pd.Int64Dtype() for b in batches)
+        assert batches[1]['merchant_id'].tolist() == [7, 8]
+
+    def test_catalog_dtypes_win(self, events):
+        engine, table = events
+        batches = list(_iter_batches(
+            engine.connect, db.select([table]), ['event_id', 'merchant_id'], 4,
+            output='arrow', dtypes=dict(merchant_id='float')
+        ))
+
+        assert batches[0].schema.field('merchant_id').type == pa.float64()
+
+    def test_execution_errors_are_raised_before_iteration(self, events):
+        engine, _ = events
+
+        with pytest.raises(db.exc.OperationalError):
+            _iter_batches(engine.connect, db.text('select missing from events'), None, 2)
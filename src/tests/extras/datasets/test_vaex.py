@@ -0,0 +1,161 @@
+import os
+
+import numpy as np
+import pyarrow as pa
+import pyarrow.parquet as pq
+import pytest
+import vaex
+from kedro.io import DataSetError
+
+from carousel_ranking_v2.extras.datasets.vaex import SharedVaexDataSet, VaexDataSet
+from carousel_ranking_v2.extras.utils.categories import CategoryDictionary
+from carousel_ranking_v2.extras.utils.io import ParquetSpool, open_spool
+
+
+@pytest.fixture(autouse=True)
+def fresh_state():
+    CategoryDictionary._shared.clear()
+    SharedVaexDataSet.release()
+    yield
+    CategoryDictionary._shared.clear()
+    SharedVaexDataSet.release()
+
+
+def batch(event_types, xs):
+    return pa.RecordBatch.from_arrays([pa.array(event_types), pa.array(xs)], names=['event_type', 'x'])
+
+
+def frame():
+    return vaex.from_arrays(a=np.arange(6), b=np.arange(6) % 3, c=np.arange(6) * 0.5)
+
+
+class TestVaexDataSet:
+
+    def test_projection_and_filters_are_read_by_parquet(self, tmp_path):
+        filepath = str(tmp_path / 'frame.parquet')
+        VaexDataSet(filepath, save_args=dict(row_group_size=2)).save(frame())
+
+        alias = VaexDataSet(filepath, load_args=dict(columns=['a', 'b'], filters=[['b', '>=', 1], ['a', '<', 5]]))
+        df = alias.load()
+
+        assert df.get_column_names() == ['a', 'b']
+        assert df['a'].tolist() == [1, 2, 4]
+
+        either = VaexDataSet(filepath, load_args=dict(columns=['a'], filters=[[['a', '=', 0]], [['b', 'in', [2]]]]))
+
+        assert either.load()['a'].tolist() == [0, 2, 5]
+
+    def test_projected_alias_is_read_only(self, tmp_path):
+        filepath = str(tmp_path / 'frame.parquet')
+        alias = VaexDataSet(filepath, load_args=dict(columns=['a']))
+
+        with pytest.raises(DataSetError, match='read-only'):
+            alias.save(frame())
+
+    def test_failed_save_keeps_the_previous_artifact(self, tmp_path, monkeypatch):
+        filepath = str(tmp_path / 'frame.parquet')
+        dataset = VaexDataSet(filepath)
+        dataset.save(frame())
+
+        def broken(df, path):
+            with open(path, 'wb') as f:
+                f.write(b'partial')
+            raise OSError('disk full')
+
+        monkeypatch.setattr(dataset, '_export', broken)
+
+        with pytest.raises(DataSetError):
+            dataset.save(frame()[['a']])
+
+        assert pq.read_table(filepath).column_names == ['a', 'b', 'c']
+        assert os.listdir(tmp_path) == ['frame.parquet']
+
+
+class TestArrowExport:
+
+    def test_chunks_encoded_against_a_growing_dictionary(self, tmp_path):
+        dictionary_path = str(tmp_path / 'dictionary.json')
+        dictionary = CategoryDictionary.shared(dictionary_path)
+
+        spool = ParquetSpool(
+            str(tmp_path / 'spool.parquet'),
+            row_group_size=2,
+            categories=['event_type'],
+            dictionary=dictionary
+        )
+        spool.write(batch(['view', 'view'], [1, 2]))
+        spool.write(batch(['click', 'buy'], [3, 4]))
+        spool.write(batch(['view', 'share'], [5, 6]))
+        dictionary.save()
+
+        df = open_spool(spool.close())
+        df['y'] = df.x * 2
+
+        filepath = str(tmp_path / 'events.arrow')
+        dataset = SharedVaexDataSet(
+            filepath,
+            columns=dict(event_type='category'),
+            dictionary=dictionary_path,
+            save_args=dict(row_group_size=2)
+        )
+        dataset.save(df)
+
+        table = pa.ipc.open_file(pa.memory_map(filepath, 'r')).read_all()
+
+        assert table.schema.field('event_type').type == pa.dictionary(pa.int32(), pa.string())
+        assert table['event_type'].to_pylist() == ['view', 'view', 'click', 'buy', 'view', 'share']
+        assert table['y'].to_pylist() == [2, 4, 6, 8, 10, 12]
+        assert dataset.load()['x'].tolist() == [1, 2, 3, 4, 5, 6]
+
+
+class TestSharedVaexDataSet:
+
+    def test_parquet_columns_are_decoded_once(self, tmp_path):
+        filepath = str(tmp_path / 'frame.parquet')
+        VaexDataSet(filepath).save(frame())
+
+        first = SharedVaexDataSet(filepath, load_args=dict(columns=['a', 'b'])).load()
+        copied = SharedVaexDataSet.stats()['copied']
+
+        assert copied > 0 and SharedVaexDataSet.stats()['shared'] == 0
+
+        second = SharedVaexDataSet(filepath, load_args=dict(columns=['b', 'c'])).load()
+        _, table = SharedVaexDataSet._tables[os.path.abspath(filepath)]
+
+        assert sorted(table.column_names) == ['a', 'b', 'c']
+        assert SharedVaexDataSet.stats()['shared'] == table.select(['b']).nbytes
+        assert SharedVaexDataSet.stats()['copied'] == copied + table.select(['c']).nbytes
+        assert first['a'].tolist() == [0, 1, 2, 3, 4, 5]
+        assert second['c'].tolist() == [0., .5, 1., 1.5, 2., 2.5]
+
+    def test_arrow_file_is_mapped_once(self, tmp_path):
+        dataset = SharedVaexDataSet(str(tmp_path / 'frame.arrow'))
+        dataset.save(frame())
+
+        dataset.load()
+        copied = SharedVaexDataSet.stats()['copied']
+        df = dataset.load()
+
+        assert SharedVaexDataSet.stats()['copied'] == copied
+        assert SharedVaexDataSet.stats()['shared'] > 0
+        assert df['b'].tolist() == [0, 1, 2, 0, 1, 2]
+
+    def test_save_and_release_drop_the_shared_table(self, tmp_path):
+        filepath = str(tmp_path / 'frame.parquet')
+        dataset = SharedVaexDataSet(filepath)
+        dataset.save(frame())
+        dataset.load()
+
+        dataset.save(vaex.from_arrays(a=np.arange(3)))
+
+        assert os.path.abspath(filepath) not in SharedVaexDataSet._tables
+        assert dataset.load().get_column_names() == ['a']
+
+        SharedVaexDataSet.release(filepath)
+
+        assert os.path.abspath(filepath) not in SharedVaexDataSet._tables
+        assert SharedVaexDataSet.stats()['copied'] > 0
+
+        SharedVaexDataSet.release()
+
+        assert SharedVaexDataSet.stats() == dict(shared=0, copied=0)
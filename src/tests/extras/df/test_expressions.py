@@ -0,0 +1,74 @@
+import numpy as np
+import pytest
+import vaex
+
+from carousel_ranking_v2.extras.df.expressions import (
+    ExpressionError,
+    compile_expression,
+    split_assignment,
+)
+
+
+@pytest.fixture
+def df():
+    return vaex.from_arrays(x=np.array([1, 2, 3]), y=np.array([1., 10., 100.]))
+
+
+class TestValidation:
+
+    @pytest.mark.parametrize('text', [
+        "__import__('os')",
+        "__import__('os').system('true')",
+        'x.__class__',
+        'df.__dict__',
+        '().__class__.__bases__',
+        'lambda: 1',
+        '(lambda v: v)(x)',
+        '[v for v in x]',
+        '{v: v for v in x}',
+        'open("f")',
+    ])
+    def test_rejects_unsafe_syntax(self, text):
+        with pytest.raises(ExpressionError):
+            compile_expression(text)
+
+    def test_unknown_columns(self, df):
+        with pytest.raises(ExpressionError):
+            compile_expression('z > 1').bind(df)
+
+    def test_cache_returns_the_same_object(self):
+        assert compile_expression('x > 1') is compile_expression('x > 1')
+
+
+class TestBinding:
+
+    def test_in_and_not_in_with_parameter_lists(self, df):
+        assert compile_expression('x in ids').bind(df, ids=[1, 3]).tolist() == [True, False, True]
+        assert compile_expression('x not in ids').bind(df, ids=[1, 3]).tolist() == [False, True, False]
+        assert compile_expression('x in (2,)').bind(df).tolist() == [False, True, False]
+
+    def test_chained_comparisons(self, df):
+        assert compile_expression('1 < x <= 3').bind(df).tolist() == [False, True, True]
+        assert compile_expression('lo <= x < hi').bind(df, lo=2, hi=3).tolist() == [False, True, False]
+
+    def test_not_on_python_values_and_expressions(self, df):
+        assert compile_expression('not flag').bind(df, flag=False) is True
+        assert compile_expression('not flag').bind(df, flag=3) is False
+        assert compile_expression('not (x > 1)').bind(df).tolist() == [True, False, False]
+
+    def test_functions_and_legacy_df_func(self, df):
+        expected = np.log10([1., 10., 100.]).tolist()
+
+        assert compile_expression('log10(y)').bind(df).tolist() == expected
+        assert compile_expression('df.func.log10(df.y)').bind(df).tolist() == expected
+
+
+class TestSplitAssignment:
+
+    @pytest.mark.parametrize('text', ['a == b', 'a >= 1', 'a <= 1', 'a != 1', "a == 'x=y'"])
+    def test_comparisons_are_not_assignments(self, text):
+        assert split_assignment(text) == (None, text)
+
+    def test_assignment(self):
+        assert split_assignment('flag = a == 1') == ('flag', 'a == 1')
+        assert split_assignment(' total=x + y ') == ('total', 'x + y')
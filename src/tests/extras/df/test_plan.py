@@ -0,0 +1,49 @@
+import datetime
+
+import numpy as np
+import pyarrow as pa
+import vaex
+
+from carousel_ranking_v2.extras.df import vaex as vx
+
+
+def frame():
+    df = vaex.from_arrays(
+        x=np.arange(8),
+        v=np.array([0.5, np.nan, 2., np.nan, np.nan, 5., 6., 7.]),
+        ts=pa.array([
+            '2022-03-01 10:00:00', '2022-03-02', None, 'garbage',
+            '2022-02-27T23:00:00', '2022-13-01', '2022-01-15', '2021-12-31'
+        ]),
+        ref=np.full(8, np.datetime64('2022-03-10T12:00:00', 's'))
+    )
+    df['w'] = df.x * 1.5
+
+    return df[df.x % 2 == 0]
+
+
+class TestPlan:
+
+    def test_collect_matches_the_sequential_helpers(self):
+        unknown = datetime.date(2022, 1, 1)
+
+        expected = vx.fillna(frame(), ['v'], 0.)
+        expected = vx.force_int(expected, ['w'])
+        expected = vx.datetime(expected, ['ts'], fillnaval=unknown)
+        expected = vx.days_difference(expected, ['ts'], basecol='ref')
+
+        result = vx.plan(frame()) \
+            .fillna(['v'], 0.) \
+            .force_int(['w']) \
+            .datetime(['ts'], fillnaval=unknown) \
+            .days_difference(['ts'], basecol='ref') \
+            .collect()
+
+        assert len(result) == len(expected) == 4
+        assert result.get_column_names() == expected.get_column_names()
+
+        for col in expected.get_column_names():
+            assert result[col].tolist() == expected[col].tolist(), col
+
+        assert result['ts'].tolist() == [9, 68, 11, 54]
+        assert result['w'].tolist() == [0, 3, 6, 9]
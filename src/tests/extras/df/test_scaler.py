@@ -0,0 +1,46 @@
+import numpy as np
+import vaex
+
+from carousel_ranking_v2.extras.df.scaler import StreamingScaler
+
+
+class TestStreamingScaler:
+
+    def test_chunked_fit_and_merge_match_numpy(self):
+        rng = np.random.default_rng(0)
+        x = rng.normal(5., 3., size=(1000, 3))
+        x[rng.random((1000, 3)) < 0.1] = np.nan
+
+        left, right = StreamingScaler(['a', 'b', 'c']), StreamingScaler(['a', 'b', 'c'])
+
+        for chunk in np.array_split(x[:600], 7):
+            left.partial_fit(chunk)
+
+        for chunk in np.array_split(x[600:], 3):
+            right.partial_fit(chunk)
+
+        scaler = left.merge(right)
+
+        np.testing.assert_allclose(scaler.mean_, np.nanmean(x, axis=0))
+        np.testing.assert_allclose(scaler.var_, np.nanvar(x, axis=0))
+        np.testing.assert_array_equal(scaler.count_, (~np.isnan(x)).sum(axis=0))
+
+    def test_dict_round_trip(self):
+        scaler = StreamingScaler(['a', 'b'], dtype='float32').partial_fit(np.array([[1., 2.], [3., 6.]]))
+        restored = StreamingScaler.from_dict(scaler.to_dict())
+
+        assert restored.features == ['a', 'b']
+        assert restored.dtype == 'float32'
+        np.testing.assert_array_equal(restored.mean_, scaler.mean_)
+        np.testing.assert_array_equal(restored.scale_, scaler.scale_)
+
+    def test_fit_and_transform_a_frame(self):
+        df = vaex.from_arrays(a=np.arange(10.), b=np.full(10, 4.))
+        scaler = StreamingScaler(['a', 'b'], dtype='float32').fit(df, chunk_size=3)
+        scaled = scaler.transform(df)
+
+        np.testing.assert_allclose(scaled['a'].values, (np.arange(10.) - 4.5) / np.arange(10.).std(), rtol=1e-6)
+        assert scaled['a'].dtype == np.float32
+
+        # constant columns are only centered
+        np.testing.assert_array_equal(scaled['b'].values, np.zeros(10))
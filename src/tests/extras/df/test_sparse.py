@@ -0,0 +1,37 @@
+import numpy as np
+import pandas as pd
+import scipy.sparse as sp
+
+from carousel_ranking_v2.extras.df.sparse import SparseFrame
+
+
+class TestSumBy:
+
+    def test_matches_a_dense_groupby(self):
+        rng = np.random.default_rng(0)
+        dense = rng.integers(0, 3, size=(50, 4)) * (rng.random((50, 4)) < 0.3)
+        keys = rng.choice(['c', 'a', 'b'], size=50)
+        columns = ['w', 'x', 'y', 'z']
+
+        frame = SparseFrame(sp.csr_matrix(dense), columns).sum_by(keys)
+        expected = pd.DataFrame(dense, columns=columns).groupby(keys).sum()
+
+        assert frame.index.tolist() == ['a', 'b', 'c']
+        np.testing.assert_array_equal(frame.to_pandas().values, expected.values)
+
+    def test_missing_keys_form_the_last_group(self):
+        frame = SparseFrame(sp.identity(3, format='csr'), ['x', 'y', 'z'], np.array(['b', None, 'b'], dtype=object))
+        summed = frame.sum_by()
+
+        assert summed.index.tolist() == ['b', None]
+        np.testing.assert_array_equal(summed.matrix.toarray(), [[1, 0, 1], [0, 1, 0]])
+
+
+class TestClip:
+
+    def test_clip_and_drop_empty(self):
+        frame = SparseFrame(sp.csr_matrix([[0., 5.], [0., 0.], [-2., 1.]]), ['x', 'y'], np.array([1, 2, 3]))
+        kept = frame.clip(0, 2).drop_empty()
+
+        assert kept.index.tolist() == [1, 3]
+        np.testing.assert_array_equal(kept.matrix.toarray(), [[0., 2.], [0., 1.]])
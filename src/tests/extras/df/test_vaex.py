@@ -0,0 +1,99 @@
+import datetime
+
+import numpy as np
+import pyarrow as pa
+import pytest
+import vaex
+
+from carousel_ranking_v2.extras.df import vaex as vx
+
+
+@pytest.fixture
+def events():
+    rng = np.random.default_rng(0)
+    n = 400
+
+    return vaex.from_arrays(
+        anonymous_user_id=rng.choice(['u3', 'u1', 'u2', 'u4'], size=n),
+        event_timestamp=rng.integers(0, 9, size=n),
+        event_weight=rng.random(n),
+        event_type=rng.choice(['view', 'click'], size=n)
+    )
+
+
+@pytest.fixture
+def timestamps():
+    # time of day, null, no date at all and an impossible month
+    return vaex.from_arrays(
+        event_timestamp=pa.array([
+            '2022-03-01 13:45:00',
+            '2022-02-28T23:59:59',
+            None,
+            'garbage',
+            '2022-13-01',
+            '2021-12-31'
+        ]),
+        refdate=np.full(6, np.datetime64('2022-03-10T06:00:00', 's'))
+    )
+
+
+class TestBinnedSums:
+
+    def test_matches_the_filtered_groupby(self, events):
+        period, condition = 8, 'event_type == "click"'
+
+        groups = [
+            (None, 'event_timestamp', 'activity_std', 'std'),
+            (None, 'event_timestamp', 'activity_mean', 'mean')
+        ]
+        groups += [ (f'event_timestamp == {d}', 'event_weight', f'activity_{d}', 'sum') for d in range(1, period) ]
+        groups += [ (f'(event_timestamp == {d}) & ({condition})', 'event_weight', f'hist_click_{d}', 'sum')
+                    for d in range(1, period) ]
+
+        expected = vx.groupby(events, by='anonymous_user_id', groups=groups)
+        result = vx.binned_sums(
+            events,
+            by='anonymous_user_id',
+            bin_col='event_timestamp',
+            value='event_weight',
+            period=period,
+            conditions=dict(activity=None, hist_click=condition),
+            moments=dict(activity='event_timestamp')
+        )
+
+        assert result.get_column_names() == expected.get_column_names()
+        assert result['anonymous_user_id'].tolist() == expected['anonymous_user_id'].tolist()
+
+        for col in expected.get_column_names()[1:]:
+            np.testing.assert_allclose(result[col].values, expected[col].values, err_msg=col)
+
+
+class TestDates:
+
+    def test_datetime_truncates_to_days_and_fills_unparsable(self, timestamps):
+        df = vx.datetime(timestamps, ['event_timestamp'], fillnaval=datetime.date(2022, 1, 1))
+
+        expected = np.array(
+            ['2022-03-01', '2022-02-28', '2022-01-01', '2022-01-01', '2022-01-01', '2021-12-31'],
+            dtype='datetime64[D]'
+        )
+
+        np.testing.assert_array_equal(df['event_timestamp'].values, expected)
+
+    def test_days_difference_floors_whole_days(self, timestamps):
+        df = vx.datetime(timestamps, ['event_timestamp'], fillnaval=datetime.date(2022, 1, 1))
+        df = vx.days_difference(df, ['event_timestamp'], basecol='refdate')
+
+        assert df.get_column_names() == ['event_timestamp']
+        assert df['event_timestamp'].values.tolist() == [9, 10, 68, 68, 68, 69]
+
+    def test_days_from_strings_leaves_unparsable_missing(self, timestamps):
+        df = timestamps.copy()
+        df['refdate'] = np.full(6, '2022-03-10')
+        df = vx.days_from_strings(df, ['event_timestamp'], basecol='refdate')
+
+        values = df['event_timestamp'].values
+
+        assert values.dtype == np.int32
+        assert np.ma.getmaskarray(values).tolist() == [False, False, True, True, True, False]
+        assert np.ma.filled(values, -1).tolist() == [9, 10, -1, -1, -1, 69]
@@ -0,0 +1,36 @@
+import importlib
+
+import pytest
+
+
+@pytest.mark.parametrize('module', [
+    'carousel_ranking_v2.extras',
+    'carousel_ranking_v2.extras.df.vaex',
+    'carousel_ranking_v2.extras.df.plan',
+    'carousel_ranking_v2.extras.df.sparse',
+    'carousel_ranking_v2.extras.df.scaler',
+    'carousel_ranking_v2.extras.df.expressions',
+    'carousel_ranking_v2.extras.datasets.vaex',
+    'carousel_ranking_v2.extras.datasets.sqlalchemy',
+    'carousel_ranking_v2.extras.datasets.sparse',
+    'carousel_ranking_v2.extras.utils.io',
+    'carousel_ranking_v2.extras.utils.extract',
+    'carousel_ranking_v2.extras.utils.checkpoint',
+    'carousel_ranking_v2.extras.utils.partitions',
+    'carousel_ranking_v2.extras.utils.telemetry',
+    'carousel_ranking_v2.hooks',
+    'carousel_ranking_v2.pipelines.data_engineering.nodes',
+    'carousel_ranking_v2.pipelines.data_preprocessing.nodes',
+    'carousel_ranking_v2.pipelines.event_ranking.nodes',
+    'carousel_ranking_v2.pipelines.user_segmentation.nodes',
+])
+def test_module_imports(module):
+    importlib.import_module(module)
+
+
+def test_days_from_strings_annotation_is_a_date():
+    from datetime import date
+
+    from carousel_ranking_v2.extras.df import vaex as vx
+
+    assert vx.days_from_strings.__annotations__['fillnaval'] is date
@@ -0,0 +1,28 @@
+import pyarrow as pa
+import sqlalchemy as db
+
+from carousel_ranking_v2.extras.utils.arrow import column_types, to_arrow
+
+
+class TestColumnTypes:
+
+    def test_catalog_dtype_wins_over_sql_type(self):
+        types = column_types(
+            ['event_timestamp', 'merchant_id', 'channels', 'event_id'],
+            dict(event_timestamp=str, merchant_id=None, channels='category'),
+            dict(event_timestamp=db.DateTime(), merchant_id=db.Integer(), channels=db.String())
+        )
+
+        assert types == dict(
+            event_timestamp=pa.string(),
+            merchant_id=pa.int64(),
+            channels=pa.string(),
+            event_id=None
+        )
+
+    def test_all_null_chunk_keeps_the_column_type(self):
+        assert to_arrow([None, None], None, pa.int64()).type == pa.int64()
+        assert to_arrow([None, None]).type == pa.null()
+
+    def test_floats_are_filled(self):
+        assert to_arrow([1.5, None], float, pa.float64()).to_pylist() == [1.5, 0.]
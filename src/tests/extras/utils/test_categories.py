@@ -0,0 +1,89 @@
+import json
+import threading
+
+import pyarrow as pa
+import pytest
+
+from carousel_ranking_v2.extras.utils.categories import CategoryDictionary
+
+
+def decoded(encoded: pa.DictionaryArray) -> list:
+    return encoded.dictionary_decode().to_pylist()
+
+
+class TestCategoryDictionary:
+
+    def test_codes_are_append_only(self, tmp_path):
+        path = str(tmp_path / 'dictionary.json')
+
+        first = CategoryDictionary(path)
+        codes = first.encode('event_type', ['a', 'b', None, 'a'])
+        first.save()
+
+        assert codes.indices.to_pylist() == [0, 1, None, 0]
+
+        second = CategoryDictionary(path)
+        codes = second.encode('event_type', ['c', 'a', 'b'])
+
+        assert codes.indices.to_pylist() == [2, 0, 1]
+        assert decoded(codes) == ['c', 'a', 'b']
+
+    def test_save_merges_with_disk(self, tmp_path):
+        path = str(tmp_path / 'dictionary.json')
+
+        first, second = CategoryDictionary(path), CategoryDictionary(path)
+        first.encode('language', ['en'])
+        first.save()
+        second.encode('language', ['ar'])
+        second.save()
+
+        with open(path) as f:
+            assert json.load(f)['language'] == ['en', 'ar']
+
+        # the writer that lost the race adopts the stored codes
+        assert second.encode('language', ['ar', 'en']).indices.to_pylist() == [1, 0]
+
+    def test_shared_instance_per_path(self, tmp_path):
+        path = tmp_path / 'dictionary.json'
+
+        assert CategoryDictionary.shared(str(path)) is CategoryDictionary.shared(str(path))
+
+    def test_concurrent_encode_and_save(self, tmp_path):
+        path = str(tmp_path / 'dictionary.json')
+        dictionary = CategoryDictionary.shared(path)
+        results, errors = dict(), list()
+
+        def work(i):
+            try:
+                values = [f'v{i}', f'v{i + 1}', 'common']
+                for _ in range(20):
+                    results[i] = (values, dictionary.encode('col', values))
+                    dictionary.save()
+            except Exception as exc:
+                errors.append(exc)
+
+        threads = [threading.Thread(target=work, args=(i,)) for i in range(8)]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+
+        assert not errors
+
+        with open(path) as f:
+            stored = json.load(f)['col']
+
+        assert len(stored) == len(set(stored)) == 10
+
+        for values, encoded in results.values():
+            assert decoded(encoded) == values
+            assert [stored[i] for i in encoded.indices.to_pylist()] == values
+
+        assert not list(tmp_path.glob('*.tmp'))
+
+
+@pytest.fixture(autouse=True)
+def _isolated_registry():
+    CategoryDictionary._shared.clear()
+    yield
+    CategoryDictionary._shared.clear()
@@ -0,0 +1,24 @@
+import os
+import time
+
+from carousel_ranking_v2.extras.utils.checkpoint import ChunkManifest, expire_manifests
+
+
+class TestExpireManifests:
+
+    def test_idle_manifests_of_past_keys_are_removed(self, tmp_path):
+        root = str(tmp_path)
+        stale, active, current = [ ChunkManifest(root, k) for k in ('stale', 'active', 'current') ]
+
+        for manifest in (stale, active, current):
+            manifest.finish()
+
+        past = time.time() - 7200
+        os.utime(os.path.join(stale.path, 'manifest.json'), (past, past))
+        os.utime(os.path.join(current.path, 'manifest.json'), (past, past))
+
+        assert expire_manifests(root, ttl=3600, keep='current') == ['stale']
+        assert sorted(os.listdir(root)) == ['active', 'current']
+
+    def test_missing_root(self, tmp_path):
+        assert expire_manifests(str(tmp_path / 'missing'), ttl=0) == []
@@ -0,0 +1,46 @@
+import time
+
+import pyarrow as pa
+import sqlalchemy as db
+
+from carousel_ranking_v2.extras.utils.extract import fetch_parallel
+
+
+def sqlite_engine(path):
+    engine = db.create_engine(f'sqlite:///{path}')
+
+    @db.event.listens_for(engine, 'connect')
+    def connect(dbapi_conn, record):
+        dbapi_conn.create_function('pause', 2, lambda v, delay: time.sleep(delay) or v)
+
+    with engine.begin() as conn:
+        conn.execute(db.text('CREATE TABLE t (id INTEGER, v TEXT)'))
+        conn.execute(db.text('INSERT INTO t VALUES (:id, :v)'), [ dict(id=i, v=f'v{i}') for i in range(30) ])
+
+    return engine
+
+
+def partition_queries(slow):
+    return [ db.text(f'SELECT id, pause(v, {0.02 if i == slow else 0}) AS v FROM t '
+                     f'WHERE id >= {i * 10} AND id < {(i + 1) * 10} ORDER BY id')
+             for i in range(3) ]
+
+
+class TestFetchParallel:
+
+    def test_rows_keep_partition_order_whatever_finishes_first(self, tmp_path, monkeypatch):
+        monkeypatch.chdir(tmp_path)
+        engine = sqlite_engine(tmp_path / 'source.db')
+
+        for slow in (0, 2):
+            df = fetch_parallel(
+                engine.connect,
+                partition_queries(slow),
+                ['id', 'v'],
+                chunksize=4,
+                builder='arrow',
+                types=dict(id=pa.int64(), v=pa.string())
+            )
+
+            assert df['id'].tolist() == list(range(30))
+            assert df['v'].tolist() == [ f'v{i}' for i in range(30) ]
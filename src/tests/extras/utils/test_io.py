@@ -0,0 +1,52 @@
+import threading
+
+import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
+
+from carousel_ranking_v2.extras.utils.io import ParquetSpool
+
+
+class TestParquetSpool:
+
+    def test_all_null_first_chunk_takes_the_later_type(self, tmp_path):
+        spool = ParquetSpool(str(tmp_path / 'spool.parquet'))
+        spool.write(pa.RecordBatch.from_arrays([pa.array([None, None])], names=['merchant_id']))
+        spool.write(pa.RecordBatch.from_arrays([pa.array([1, 2])], names=['merchant_id']))
+
+        table = pq.read_table(spool.close())
+
+        assert table.schema.field('merchant_id').type == pa.int64()
+        assert table['merchant_id'].to_pylist() == [None, None, 1, 2]
+
+    def test_declared_types_apply_to_pandas_chunks(self, tmp_path):
+        spool = ParquetSpool(str(tmp_path / 'spool.parquet'), types=dict(merchant_id=pa.int64()))
+        spool.write(pd.DataFrame(dict(merchant_id=[None, None])))
+        spool.write(pd.DataFrame(dict(merchant_id=[3.0, float('nan')])))
+
+        table = pq.read_table(spool.close())
+
+        assert table['merchant_id'].to_pylist() == [None, None, 3, None]
+
+    def test_unresolved_columns_fall_back_to_string(self, tmp_path):
+        spool = ParquetSpool(str(tmp_path / 'spool.parquet'))
+        spool.write(pa.RecordBatch.from_arrays([pa.array([None])], names=['x']))
+
+        assert pq.read_table(spool.close()).schema.field('x').type == pa.string()
+
+    def test_shared_between_threads(self, tmp_path):
+        spool = ParquetSpool(str(tmp_path / 'spool.parquet'), types=dict(x=pa.int64()))
+
+        def work(i):
+            for j in range(10):
+                spool.write(pa.RecordBatch.from_arrays([pa.array([i * 100 + j])], names=['x']))
+
+        threads = [threading.Thread(target=work, args=(i,)) for i in range(4)]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+
+        values = pq.read_table(spool.close())['x'].to_pylist()
+
+        assert sorted(values) == sorted(i * 100 + j for i in range(4) for j in range(10))
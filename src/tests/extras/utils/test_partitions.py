@@ -0,0 +1,40 @@
+import os
+
+import pytest
+import vaex
+
+from carousel_ranking_v2.extras.utils.partitions import DayPartitionStore
+
+
+def _events(*stamps):
+    return vaex.from_arrays(event_timestamp=list(stamps), x=list(range(len(stamps))))
+
+
+class TestDayPartitionStore:
+
+    def test_append_commits_parts_and_watermark(self, tmp_path):
+        store = DayPartitionStore(str(tmp_path), column='event_timestamp', period=30)
+        store.append(_events('2026-10-01 10:00:00', '2026-10-02 09:00:00', '2026-10-01 23:00:00'))
+
+        assert store.days() == ['2026-10-01', '2026-10-02']
+        assert store.watermark() == '2026-10-02 09:00:00'
+        assert len(store.open()) == 3
+
+    def test_parts_of_an_interrupted_append_are_invisible(self, tmp_path):
+        store = DayPartitionStore(str(tmp_path), column='event_timestamp', period=30)
+        store.append(_events('2026-10-01 10:00:00'))
+
+        # published part without a watermark naming its stamp
+        daydir = os.path.join(str(tmp_path), 'day=2026-10-01')
+        _events('2026-10-01 11:00:00').export_parquet(os.path.join(daydir, 'part-99999999999999999999.parquet'))
+
+        assert len(store.open()) == 1
+        assert store.watermark() == '2026-10-01 10:00:00'
+
+    def test_open_on_an_empty_store_raises(self, tmp_path):
+        store = DayPartitionStore(str(tmp_path), column='event_timestamp', period=30)
+
+        assert store.watermark() is None
+
+        with pytest.raises(FileNotFoundError):
+            store.open()
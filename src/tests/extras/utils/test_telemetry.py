@@ -0,0 +1,34 @@
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import vaex
+
+from carousel_ranking_v2.extras.utils.telemetry import RSSSampler, data_size
+
+
+class TestDataSize:
+
+    def test_frames_and_tables(self):
+        df = pd.DataFrame(dict(x=np.arange(3)))
+        table = pa.table(dict(x=np.arange(4)))
+
+        assert data_size(df) == (3, int(df.memory_usage(index=True).sum()))
+        assert data_size(table) == (4, table.nbytes)
+        assert data_size(dict(a=1, b=2)) == (2, None)
+        assert data_size(object()) == (None, None)
+
+    def test_filtered_vaex_frames_leave_bytes_out(self):
+        df = vaex.from_arrays(x=np.arange(10))
+
+        assert data_size(df) == (10, df.byte_size())
+        assert data_size(df[df.x > 4]) == (10, None)
+
+
+class TestRSSSampler:
+
+    def test_peak_covers_allocations_inside_the_block(self):
+        with RSSSampler(interval=0.001) as sampler:
+            before = sampler.rss()
+            block = np.ones(2 ** 25, dtype=np.uint8)
+
+        assert sampler.peak >= before + block.nbytes // 2
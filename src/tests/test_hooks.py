@@ -0,0 +1,54 @@
+import json
+
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+from kedro.pipeline import node
+from mlflow.tracking import MlflowClient
+
+from carousel_ranking_v2.hooks import TelemetryHooks
+
+
+def double(x):
+    return pa.table(dict(x=x['x'] * 2))
+
+
+class TestTelemetryHooks:
+
+    def test_one_json_line_and_metrics_per_node(self, tmp_path):
+        path = tmp_path / 'logs' / 'telemetry.jsonl'
+        hooks = TelemetryHooks(path=str(path), tracking_uri=str(tmp_path / 'mlruns'), interval=0.001)
+        step = node(double, 'events', 'doubled', name='double')
+
+        hooks.before_pipeline_run(run_params=dict(run_id='run', pipeline_name='__default__'))
+        run_id = hooks._mlflow_run.info.run_id
+
+        inputs = dict(events=pd.DataFrame(dict(x=np.arange(3))))
+        hooks.before_node_run(node=step, inputs=inputs)
+        outputs = dict(doubled=double(inputs['events']))
+        hooks.after_node_run(node=step, outputs=outputs)
+        hooks.after_pipeline_run()
+
+        record, = [ json.loads(line) for line in path.read_text().splitlines() ]
+
+        assert record['node'] == 'double' and record['run_id'] == 'run'
+        assert record['inputs'] == dict(events=dict(rows=3, bytes=int(inputs['events'].memory_usage(index=True).sum())))
+        assert record['outputs'] == dict(doubled=dict(rows=3, bytes=outputs['doubled'].nbytes))
+        assert record['wall_time'] >= 0 and record['peak_rss_mb'] > 0
+
+        run = MlflowClient(tracking_uri=str(tmp_path / 'mlruns')).get_run(run_id)
+
+        assert run.info.status == 'FINISHED'
+        assert run.data.metrics['double.output_rows'] == 3
+        assert run.data.metrics['double.input_bytes'] == record['inputs']['events']['bytes']
+
+    def test_failed_nodes_write_nothing(self, tmp_path):
+        path = tmp_path / 'telemetry.jsonl'
+        hooks = TelemetryHooks(path=str(path), tracking_uri=str(tmp_path / 'mlruns'))
+        step = node(double, 'events', 'doubled', name='double')
+
+        hooks.before_node_run(node=step, inputs=dict(events=None))
+        hooks.on_node_error(node=step)
+        hooks.after_node_run(node=step, outputs=dict())
+
+        assert not path.exists()